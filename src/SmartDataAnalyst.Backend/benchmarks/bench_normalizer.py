@@ -0,0 +1,62 @@
+"""
+Compare the vectorized normalizer (serial and thread-pool) with the
+original per-value engine on a wide frame.
+
+    python -m benchmarks.bench_normalizer [rows] [columns]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from tests.legacy_normalizer import normalize_dataframe as legacy_normalize
+from utils.normalizer import normalize_dataframe
+
+
+def make_wide_frame(rows: int, columns: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(columns):
+        kind = i % 5
+        if kind == 0:
+            values = rng.integers(0, 1_000_000, rows).astype(str)
+        elif kind == 1:
+            values = np.char.mod("%.2f", rng.normal(1000, 300, rows))
+        elif kind == 2:
+            values = rng.choice(["Image Generation", " Chatbot ", "Code", "", "  "], rows)
+        elif kind == 3:
+            values = rng.choice(["2021-01-05", "2022-07-19", "2023-11-30"], rows)
+        else:
+            values = rng.random(rows)
+        data[f"col_{i}"] = values
+    return pd.DataFrame(data)
+
+
+def best_of(fn, df: pd.DataFrame, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    df = make_wide_frame(rows, columns)
+
+    legacy = best_of(legacy_normalize, df)
+    vectorized = best_of(lambda d: normalize_dataframe(d, parallel=False), df)
+    parallel = best_of(lambda d: normalize_dataframe(d, parallel=True), df)
+
+    print(f"frame: {rows} rows x {columns} columns")
+    print(f"legacy:     {legacy:.3f}s")
+    print(f"vectorized: {vectorized:.3f}s")
+    print(f"parallel:   {parallel:.3f}s")
+    print(f"speedup:    {legacy / vectorized:.1f}x serial, {legacy / parallel:.1f}x parallel")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compare the agent's two backends for "rows" plans: pandas (load the
+frame, query it, copy the matching rows, then project) and the lazy
+query plan (push the filter into the scan, read only the columns the
+result needs, materialize only the result).
+
+    python -m benchmarks.bench_query_plan [rows]
+
+The table is ordered by release year, so year filters also let the
+zone maps skip record batches.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from services.columnar_store import build_zone_map, config, convert_to_columnar, save_schema
+from services.dataset_cache import dataset_cache
+from services.lazy_dataset import LazyDataset
+from services.query_plan import QueryPlan
+
+PLANS = {
+    "filter + project": QueryPlan().filter("`Release Year` == 2022").select(["Model Name"]),
+    "filter, repeated filter, project": QueryPlan()
+        .filter("`Parameters (Billions)` > 990")
+        .select(["Model Name", "Parameters (Billions)"])
+        .filter("`Parameters (Billions)` > 990"),
+    "filter + top 10": QueryPlan()
+        .filter("`Release Year` >= 2020")
+        .sort(["Parameters (Billions)"], ascending=False)
+        .limit(10)
+        .select(["Model Name", "Parameters (Billions)"]),
+    "filter + groupby": QueryPlan()
+        .filter("`Release Year` >= 2015")
+        .groupby(["Developer"], {"Parameters (Billions)": "mean"}),
+}
+
+
+def write_dataset(path: str, rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    developers = np.array(["OpenAI", "Google", "Meta", "Anthropic", "Mistral", "Other"])
+    table = pa.table({
+        "Model Name": pa.array([f"model-{i}" for i in range(rows)]),
+        "Developer": developers[rng.integers(0, len(developers), rows)],
+        "Primary Use Case": np.array(["Chat", "Code", "Image Generation"])[rng.integers(0, 3, rows)],
+        "Release Year": np.sort(rng.integers(2000, 2025, rows)),
+        "Parameters (Billions)": rng.uniform(0, 1000, rows),
+        "Context Length": rng.integers(1_000, 1_000_000, rows),
+    })
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=config.batch_rows)
+    convert_to_columnar(path)
+    save_schema(path, {
+        "Model Name": "text", "Developer": "text", "Primary Use Case": "text",
+        "Release Year": "int", "Parameters (Billions)": "float", "Context Length": "int",
+    })
+    build_zone_map(path)
+
+
+def best_of(fn, repeat: int = 3) -> tuple[float, int]:
+    timings, rows = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(fn())
+        timings.append(time.perf_counter() - start)
+    return min(timings), rows
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "models.arrow")
+        write_dataset(path, rows)
+        dataset = LazyDataset([path])
+        print(f"table: {rows} rows, {len(dataset.columns)} columns")
+
+        # Both backends read through the (warm) dataset cache
+        dataset.load()
+        for name, plan in PLANS.items():
+            eager, matched = best_of(lambda: plan.collect_eager(dataset.load()))
+            lazy, lazy_matched = best_of(lambda: plan.collect(dataset))
+            assert matched == lazy_matched
+            print(f"{name}  ({matched} rows)")
+            print(f"  pandas: {eager:.3f}s  lazy plan: {lazy:.3f}s  ({eager / lazy:.1f}x)")
+        print(f"cache: {dataset_cache.stats()['current_bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare rows_filter queries that scan every record batch with queries
+that first skip batches ruled out by the zone map.
+
+    python -m benchmarks.bench_zone_maps [rows]
+
+The table is ordered by release year (as data appended over time is), so
+year filters prune well; parameter counts are random, so filters on them
+show the cost of a zone map that cannot prune.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from services.columnar_store import build_zone_map, config, convert_to_columnar, read_columnar_batches, save_schema
+from utils.pruning import compile_filter
+
+FILTERS = [
+    "`Release Year` == 2022",
+    "`Release Year` >= 2019 and `Parameters (Billions)` > 900",
+    "`Parameters (Billions)` > 999.9",
+]
+COLUMNS = ["Release Year", "Parameters (Billions)"]
+
+
+def write_dataset(path: str, rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    table = pa.table({
+        "Model Id": np.arange(rows),
+        "Release Year": np.sort(rng.integers(2000, 2025, rows)),
+        "Parameters (Billions)": rng.uniform(0, 1000, rows),
+    })
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=config.batch_rows)
+    convert_to_columnar(path)
+    save_schema(path, {"Model Id": "int", "Release Year": "int", "Parameters (Billions)": "float"})
+
+
+def best_of(fn, repeat: int = 3) -> tuple[float, int]:
+    timings, rows = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(fn())
+        timings.append(time.perf_counter() - start)
+    return min(timings), rows
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "models.arrow")
+        write_dataset(path, rows)
+
+        start = time.perf_counter()
+        zones = build_zone_map(path)
+        print(f"table: {rows} rows in {len(zones)} record batches")
+        print(f"zone map build: {time.perf_counter() - start:.3f}s")
+
+        every_batch = list(range(len(zones)))
+        for expr in FILTERS:
+            may_match = compile_filter(expr)
+            scan, matched = best_of(lambda: read_columnar_batches(path, every_batch, COLUMNS).query(expr))
+            pruned, pruned_matched = best_of(lambda: read_columnar_batches(
+                path, [i for i, zone in enumerate(zones) if may_match(zone["stats"])], COLUMNS
+            ).query(expr))
+            assert matched == pruned_matched
+            kept = sum(1 for zone in zones if may_match(zone["stats"]))
+            print(f"{expr}  ({matched} rows, {kept}/{len(zones)} batches read)")
+            print(f"  full scan: {scan:.3f}s  zone maps: {pruned:.3f}s  ({scan / pruned:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,34 +4,28 @@ import time
 import asyncio
 import json
 import re
-import io
-import contextlib
 from string import Template
 import textwrap
+import uuid
 
 import pandas as pd
 from typing import Dict, Any, Tuple
 from .llm_client import ask_llm           # existing LLM wrapper
 from utils.json_repair import repair_json  # your repair helper
 from sdcmm.sdcmm import SDCM              # new SDCM module (ChromaDB + SQLite)
-from utils.normalizer import normalize_dataframe
-
-
-# safe builtin subset for exec
-_SAFE_BUILTINS = {
-    "len": len,
-    "min": min,
-    "max": max,
-    "sum": sum,
-    "list": list,
-    "dict": dict,
-    "set": set,
-    "float": float,
-    "int": int,
-    "str": str,
-    "bool": bool,
-    "range": range,
-}
+from utils.normalizer import normalize_dataframe, is_normalized
+from utils.column_refs import plan_columns
+from services.lazy_dataset import LazyDataset
+from services import sql_engine
+from services.query_plan import QueryPlan
+from services.code_sandbox import code_sandbox
+from services.answer_cache import answer_cache
+from services.plan_cache import plan_cache, schema_fingerprint
+
+
+# Answers that report a failure are never cached
+_FAILED_ANSWERS = ("Error ", "Could not ", "No rows could be generated", "No code or answer provided")
+
 
 class Agent_v16(Agent_v13):
     """
@@ -44,13 +38,17 @@ class Agent_v16(Agent_v13):
       - same LLM prompt + JSON action flow (action/code/rows/target_columns)
     """
 
-    def __init__(self, filename: str, *args, **kwargs):
+    def __init__(self, filename: str, *args, version_id: str | None = None, **kwargs):
         super().__init__(*args, **kwargs)
         self.filename = filename
+        # Dataset version (content hash) the agent answers about; keys the answer cache
+        self.version_id = version_id
         self.sdcm = SDCM()  # new SDCM instance (ChromaDB + SQLite)
         # Keep last rows / last result semantics
         self._last_context_rows = None
         self._last_result = None
+        # Sandbox job of the code being run (see run_code)
+        self._code_job = None
 
         # status tracking
         self.status = "active"
@@ -141,54 +139,145 @@ class Agent_v16(Agent_v13):
     # -------------------------
     # analyze_query: main flow (keeps JSON/action logic)
     # -------------------------
-    async def analyze_query(self, df: pd.DataFrame, question: str, use_memory: bool = True) -> str:
+    async def analyze_query(self, df: pd.DataFrame | LazyDataset, question: str, use_memory: bool = True) -> str:
         """
         Entry point similar to v15: same prompt and JSON 'action' flow retained.
         Integrates SDCM for semantic memory (retrieve & store).
+        `df` may be a LazyDataset: then only the preview is read up front and
+        the plan decides which columns are loaded. A question already
+        answered for the same dataset version is answered from the answer
+        cache, unless it refers to previous context; a paraphrase of one
+        asked about a dataset with the same schema reuses its cached plan.
         """
+        cache_key = self.answer_cache_key(df, question)
+        if cache_key is not None:
+            cached = answer_cache.get(cache_key)
+            if cached is not None:
+                print(f"[Agent_v16] Answer cache hit ({cached.hits}): {question}")
+                if cached.context_rows is not None:
+                    self._last_context_rows = cached.context_rows
+                self._last_result = cached.answer
+                return cached.answer
+
+        context_rows = self._last_context_rows
+        output = await self._analyze_query(df, question, use_memory)
+        if cache_key is not None and isinstance(output, str) and not output.startswith(_FAILED_ANSWERS):
+            new_rows = self._last_context_rows if self._last_context_rows is not context_rows else None
+            answer_cache.put(cache_key, output, new_rows)
+        return output
 
+    def answer_cache_key(self, df: pd.DataFrame | LazyDataset, question: str) -> tuple | None:
+        """Answer cache key, or None when the answer must not be cached."""
+        if self.version_id is None or not isinstance(df, LazyDataset) or self.refers_to_previous_context(question):
+            return None
+        return answer_cache.key(self.version_id, question, rows_filter=df.rows_filter, backend=df.backend)
+
+    async def _analyze_query(self, df: pd.DataFrame | LazyDataset, question: str, use_memory: bool = True) -> str:
         await self._set_status("analyzing")
         # slight delay to keep parity with v15 behaviour
         await asyncio.sleep(2)
 
-        # automatic cleaning
-        df = normalize_dataframe(df)
+        dataset = df if isinstance(df, LazyDataset) else None
+        if dataset is not None:
+            preview = dataset.head(5).to_csv(index=False)
+        else:
+            # automatic cleaning (frames from the normalized dataset cache
+            # already had their stored schema applied)
+            if is_normalized(df):
+                df = df.copy()
+            else:
+                df = normalize_dataframe(df)
 
-        preview = df.head(5).to_csv(index=False)
+            preview = df.head(5).to_csv(index=False)
 
         # --- STEP 1: Collect short-term memory (use existing get_memory_context if present)
         combined_context, reuse_rows = await self.get_context(use_memory,question)
 
-        # keep original large prompt text and JSON rules (unchanged)
-        prompt = await self.prepare_prompt(preview, question, combined_context)
-
-        # Step: Call LLM
-        try:
-            raw_llm = await ask_llm(prompt)
-            # print(f"raw_llm: {raw_llm}")
-        except Exception as e:
-            await self._set_status("idle")
-            return f"Error calling LLM: {e}"
+        # A plan cached for a paraphrase of the question, on the same schema,
+        # is run again without asking the LLM
+        use_plan_cache = not reuse_rows and not self.refers_to_previous_context(question)
+        fingerprint, plan_vector, json_obj = None, None, None
+        if use_plan_cache:
+            fingerprint = schema_fingerprint(df)
+            json_obj, plan_vector = await asyncio.to_thread(plan_cache.lookup, question, fingerprint)
+        cached_plan = json_obj is not None
 
-        # Try to parse a JSON object out of LLM raw output (robust extraction)
-        json_obj = await self.extract_json_from_llm(raw_llm)
+        if not cached_plan:
+            # keep original large prompt text and JSON rules (unchanged)
+            prompt = await self.prepare_prompt(preview, question, combined_context)
 
-        # fallback behavior: if JSON not found, try to repair and parse with repair_json
-        if not json_obj:
+            # Step: Call LLM
             try:
-                parsed, cleaned, explanation = await repair_json(raw_llm)
-                json_obj = parsed
-            except Exception:
-                json_obj = None
+                raw_llm = await ask_llm(prompt)
+                # print(f"raw_llm: {raw_llm}")
+            except Exception as e:
+                await self._set_status("idle")
+                return f"Error calling LLM: {e}"
+
+            # Try to parse a JSON object out of LLM raw output (robust extraction)
+            json_obj = await self.extract_json_from_llm(raw_llm)
+
+            # fallback behavior: if JSON not found, try to repair and parse with repair_json
+            if not json_obj:
+                try:
+                    parsed, cleaned, explanation = await repair_json(raw_llm)
+                    json_obj = parsed
+                except Exception:
+                    json_obj = None
 
         # If still no json and LLM returned code — treat as raw code path (legacy fallback)
         if not json_obj:
+            if dataset is not None:
+                df = dataset.load()
             output = await self.process_llm_nonjson(json_obj, question, reuse_rows, df)
             return output
-        
-        output = await self.process_llm_json(json_obj, question, reuse_rows, df) 
+
+        output = await self.process_plan(json_obj, question, reuse_rows, df)
+        if (use_plan_cache and not cached_plan and isinstance(output, str)
+                and not output.startswith(_FAILED_ANSWERS)):
+            await asyncio.to_thread(plan_cache.add, question, fingerprint, json_obj, plan_vector)
+        return output
+
+    async def process_plan(self, json_obj: Dict[str, Any], question: str, reuse_rows: bool,
+                           df: pd.DataFrame | LazyDataset) -> str:
+        """Run a JSON plan, whether it came from the LLM or the plan cache."""
+        dataset = df if isinstance(df, LazyDataset) else None
+        if json_obj.get("action") == "sql":
+            return await self.process_llm_sql(json_obj, question, df)
+
+        if dataset is not None and dataset.backend == "lazy" and not reuse_rows:
+            output = await self.process_llm_plan(json_obj, question, dataset)
+            if output is not None:
+                return output
+
+        if dataset is not None:
+            df = self.load_plan_columns(dataset, json_obj)
+        output = await self.process_llm_json(json_obj, question, reuse_rows, df)
         return output
 
+    def load_plan_columns(self, dataset: LazyDataset, json_obj: Dict[str, Any]) -> pd.DataFrame:
+        """
+        Load only the columns the plan refers to (rows_filter, target_columns,
+        names in its code); everything when that cannot be told. For "rows"
+        plans, also only the record batches that may match rows_filter.
+        """
+        try:
+            code = json_obj.get("code") or ""
+            if json_obj.get("action") in ("code", "answer") and code:
+                code = self.prepare_code(code)
+            columns = plan_columns(json_obj, dataset.columns, code=code)
+        except Exception:
+            columns = None
+        if columns is not None:
+            print(f"[Agent_v16] Loading {len(columns)}/{len(dataset.columns)} columns: {columns}")
+
+        # "rows" plans only ever query df with rows_filter, so record
+        # batches the zone maps rule out need not be read at all
+        rows_filter = json_obj.get("rows_filter")
+        if json_obj.get("action") != "rows" or not isinstance(rows_filter, str):
+            rows_filter = None
+        return dataset.load(columns, rows_filter=rows_filter)
+
     async def get_context(self, use_memory:bool, question: str) -> Tuple[str, bool]:
         stm_context = ""
         try:
@@ -241,6 +330,7 @@ class Agent_v16(Agent_v13):
         (e.g., "company == 'Company A'") that can be used to filter df.
         - target_columns: a list of column names that the user is asking for.
         - explain: (optional) short explanation (1-2 sentences).
+        $sql_rules
         Rules:
         - If the user asks about a specific columns, include only those columns.
         - If the user asks about multiple attributes, return all relevant columns.
@@ -301,10 +391,18 @@ class Agent_v16(Agent_v13):
         Output strictly parseable JSON.
         """))
 
+        sql_rules = ""
+        if sql_engine.is_available():
+            sql_rules = (
+                'action may also be "sql" for aggregations over many rows: then put one '
+                'SQL SELECT statement (DuckDB dialect) over the table `df` in a key named "sql".'
+            )
+
         prompt = prompt_template.substitute(
             preview = preview,
             question = question,
-            combined_context = combined_context
+            combined_context = combined_context,
+            sql_rules = sql_rules
         )
         return prompt
 
@@ -321,6 +419,18 @@ class Agent_v16(Agent_v13):
             json_obj = None
             return json_obj
 
+    async def run_code(self, code: str, df: pd.DataFrame, context_var: str):
+        """Run generated code in the sandbox pool; cancel_code() stops it."""
+        self._code_job = f"{self.filename}:{uuid.uuid4().hex}"
+        try:
+            return await code_sandbox.run(code, df, context_var, job_id=self._code_job)
+        finally:
+            self._code_job = None
+
+    def cancel_code(self) -> bool:
+        """Stop the generated code this agent is running, if any."""
+        return self._code_job is not None and code_sandbox.cancel(self._code_job)
+
     async def process_llm_nonjson(self, raw:str, question: str, reuse_rows: bool, df: pd.DataFrame) -> str:
         # attempt to treat the whole response as python code
         try:
@@ -329,19 +439,15 @@ class Agent_v16(Agent_v13):
             code = ""
 
         if code:
-            exec_env = {"df": df, "pd": pd}
             try:
-                exec_globals = {"__builtins__": _SAFE_BUILTINS, "pd": pd}
                 cleaned_code = self.prepare_code(code)
-                with contextlib.redirect_stdout(io.StringIO()) as _tmp_out:
-                    exec(cleaned_code, exec_globals, exec_env)
+                outcome = await self.run_code(cleaned_code, df, "df")
 
-                if "result" in exec_env:
-                    result_value = exec_env["result"]
-                    result_str = str(result_value)
+                if outcome.result is not None:
+                    result_str = outcome.result
                 else:
-                    if "df" in exec_env and isinstance(exec_env["df"], pd.DataFrame):
-                        self._last_context_rows = exec_env["df"].copy()
+                    if outcome.frame is not None:
+                        self._last_context_rows = outcome.frame
                         result_str = f"Returned {len(self._last_context_rows)} rows (preview attached)."
                     else:
                         result_str = "Code executed; no `result` variable found."
@@ -368,6 +474,63 @@ class Agent_v16(Agent_v13):
         await self._set_status("idle")
         return "Could not parse LLM response."
 
+    async def process_llm_sql(self, json_obj: Dict[str, Any], question: str, source) -> str:
+        """
+        ACTION: sql — run the plan's SELECT on the embedded SQL engine over
+        the stored dataset (see services.sql_engine) instead of pandas code.
+        """
+        sql = self.clean_code_block(json_obj.get("sql") or json_obj.get("code") or "")
+        try:
+            result_df = await asyncio.to_thread(sql_engine.run_sql, source, sql)
+        except sql_engine.SqlError as e:
+            try:
+                self.sdcm.add_memory(f"Q: {question}\nA: Error executing SQL: {e}", {"file_name": self.filename})
+            except Exception:
+                pass
+            await self._set_status("idle")
+            return f"Error executing SQL: {e}"
+
+        if result_df.shape == (1, 1):
+            result_str = str(result_df.iat[0, 0])
+        else:
+            self._last_context_rows = result_df.copy()
+            result_str = str(result_df)
+
+        try:
+            self.sdcm.add_memory(f"Q: {question}\nA: {result_str}", {"file_name": self.filename})
+        except Exception:
+            pass
+
+        await self._set_status("idle")
+        self._last_result = result_str
+        return result_str
+
+    async def process_llm_plan(self, json_obj: Dict[str, Any], question: str, dataset: LazyDataset) -> str | None:
+        """
+        ACTION: rows on the "lazy" backend — rows_filter and target_columns
+        become a query plan (services.query_plan) that reads only the
+        matching rows of the columns it needs; only its final result is
+        materialized and kept as context rows. None when the plan does not
+        suit it, so the pandas path runs instead.
+        """
+        plan = QueryPlan.from_llm_plan(json_obj)
+        if plan is None or not json_obj.get("rows_filter"):
+            return None
+        try:
+            result_df = await asyncio.to_thread(plan.collect, dataset)
+        except Exception as e:
+            print(f"[Agent_v16] Lazy plan failed, using pandas: {e}")
+            return None
+
+        self._last_context_rows = result_df
+        preview_rows = result_df.head(50).to_csv(index=False)
+        try:
+            self.sdcm.add_memory(f"Q: {question}\nA: Provided rows ({len(result_df)}).", {"file_name": self.filename})
+        except Exception:
+            pass
+        await self._set_status("idle")
+        return preview_rows
+
     async def process_llm_json(self, json_obj: Dict[str, Any], question: str, reuse_rows: bool, df: pd.DataFrame)-> str:
         # --- Now we have a JSON object from the LLM
         action = json_obj.get("action")
@@ -445,20 +608,16 @@ class Agent_v16(Agent_v13):
                 await self._set_status("idle")
                 return ans
 
-            # execute code safely
-            exec_env = {"df": df, "pd": pd}
+            # execute code safely (out of process, see services.code_sandbox)
             try:
-                exec_globals = {"__builtins__": _SAFE_BUILTINS, "pd": pd}
                 cleaned_code = self.prepare_code(code)
-                with contextlib.redirect_stdout(io.StringIO()) as _tmp_out:
-                    exec(cleaned_code, exec_globals, exec_env)
+                outcome = await self.run_code(cleaned_code, df, "filtered_df")
 
-                if "result" in exec_env:
-                    result_value = exec_env["result"]
-                    result_str = str(result_value)
+                if outcome.result is not None:
+                    result_str = outcome.result
                 else:
-                    if "filtered_df" in exec_env and isinstance(exec_env["filtered_df"], pd.DataFrame):
-                        self._last_context_rows = exec_env["filtered_df"].copy()
+                    if outcome.frame is not None:
+                        self._last_context_rows = outcome.frame
                         result_str = f"Returned {len(self._last_context_rows)} rows (preview attached)."
                     else:
                         result_str = "Code executed; no `result` variable found."
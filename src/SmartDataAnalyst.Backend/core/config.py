@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass
 
 @dataclass
@@ -21,4 +22,193 @@ MODEL_BUDGETS = {
     "gpt-4-turbo": ModelConfig(model_name="gpt-4-turbo", max_tokens=120000),
     "gpt-3.5-turbo": ModelConfig(model_name="gpt-3.5-turbo", max_tokens=16000),
     "gpt-4o-mini": ModelConfig(model_name="gpt-4o-mini",max_tokens=32000),
-}
\ No newline at end of file
+}
+
+@dataclass
+class DatasetCacheConfig:
+    """
+    Limits for the process-wide cache of parsed DataFrames.
+    """
+    max_bytes: int = int(os.getenv("DATASET_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+
+
+@dataclass
+class ColumnarStoreConfig:
+    """
+    Layout of the Arrow IPC copy written next to every uploaded CSV.
+    """
+    batch_rows: int = int(os.getenv("COLUMNAR_BATCH_ROWS", 65536))
+
+
+@dataclass
+class DatasetRegistryConfig:
+    """
+    Each dataset keeps its current version plus the keep_versions - 1 most
+    recent superseded ones (uploads, appends); older versions are dropped
+    from the manifest and their files deleted. 0 keeps every version.
+    """
+    keep_versions: int = int(os.getenv("DATASET_KEEP_VERSIONS", 3))
+
+
+@dataclass
+class UploadConfig:
+    """
+    Streaming upload limits. max_bytes = 0 disables the size check.
+    """
+    chunk_bytes: int = int(os.getenv("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+    max_bytes: int = int(os.getenv("MAX_UPLOAD_BYTES", 2 * 1024 * 1024 * 1024))
+    sample_bytes: int = 65536
+
+
+@dataclass
+class IngestConfig:
+    """
+    Uploads of at least chunked_threshold_bytes are parsed in chunk_rows
+    batches so memory stays bounded by one chunk.
+    """
+    chunk_rows: int = int(os.getenv("INGEST_CHUNK_ROWS", 100000))
+    chunked_threshold_bytes: int = int(os.getenv("INGEST_CHUNKED_THRESHOLD_BYTES", 256 * 1024 * 1024))
+
+
+@dataclass
+class NormalizerConfig:
+    """
+    Frames with at least parallel_min_columns columns are normalized by a
+    thread pool of max_workers threads (0 = one per available core).
+    """
+    parallel_min_columns: int = int(os.getenv("NORMALIZE_PARALLEL_MIN_COLUMNS", 64))
+    max_workers: int = int(os.getenv("NORMALIZE_MAX_WORKERS", 0))
+
+
+@dataclass
+class CompactionConfig:
+    """
+    Text columns of cached frames are stored as Arrow-backed strings.
+    Numeric dtypes are never narrowed: agent code computes on them.
+    """
+    enabled: bool = os.getenv("COMPACT_DTYPES", "1") != "0"
+
+
+@dataclass
+class ShardConfig:
+    """
+    Shards of a multi-file dataset are loaded concurrently by max_workers
+    threads (0 = one per available core).
+    """
+    max_workers: int = int(os.getenv("SHARD_LOAD_WORKERS", 0))
+
+
+@dataclass
+class IngestJobConfig:
+    """
+    Upload ingestion runs in a pool of max_workers processes. Uploads of
+    at least background_min_bytes return a job id right away; smaller ones
+    wait for their job so the response still carries the summary.
+    """
+    max_workers: int = int(os.getenv("INGEST_JOB_WORKERS", 2))
+    start_method: str = os.getenv("INGEST_JOB_START_METHOD", "spawn")
+    background_min_bytes: int = int(os.getenv("INGEST_BACKGROUND_MIN_BYTES", 8 * 1024 * 1024))
+
+
+@dataclass
+class SecondaryIndexConfig:
+    """
+    A hash (==, in) or sorted (<, >, ...) index is built on a column once
+    it has been filtered that way min_filter_count times. Indexes of all
+    datasets share a max_bytes budget (least recently used dropped first).
+    """
+    enabled: bool = os.getenv("SECONDARY_INDEXES", "1") != "0"
+    min_filter_count: int = int(os.getenv("INDEX_MIN_FILTER_COUNT", 3))
+    max_bytes: int = int(os.getenv("INDEX_MAX_BYTES", 256 * 1024 * 1024))
+
+
+@dataclass
+class SqlConfig:
+    """
+    The agent's "sql" action runs on embedded DuckDB (optional package).
+    threads=0 lets DuckDB use every core; memory_limit (e.g. "2GB", empty
+    = DuckDB default) makes large aggregations spill to temp_directory.
+    Results are cut off after max_rows rows.
+    """
+    enabled: bool = os.getenv("SQL_ACTION", "1") != "0"
+    threads: int = int(os.getenv("SQL_THREADS", 0))
+    memory_limit: str = os.getenv("SQL_MEMORY_LIMIT", "")
+    temp_directory: str = os.getenv("SQL_TEMP_DIRECTORY", "data/sql_tmp")
+    max_rows: int = int(os.getenv("SQL_MAX_ROWS", 10000))
+
+
+@dataclass
+class QueryPlanConfig:
+    """
+    Backend for the agent's "rows" plans unless a dataset chooses its own:
+    "pandas" runs rows_filter eagerly on the loaded frame, "lazy" builds
+    a query plan and materializes only its final result.
+    """
+    default_backend: str = os.getenv("QUERY_BACKEND", "pandas")
+
+
+@dataclass
+class SandboxConfig:
+    """
+    LLM-generated code runs in a pool of `workers` warm processes, never
+    on the event loop. A run is killed (and its worker replaced) after
+    timeout_seconds; memory_limit_bytes caps each worker's heap (0 = no
+    limit). SANDBOX=0 runs the code in a thread of the server instead.
+    Each worker keeps up to worker_cache_bytes of datasets resident; a
+    job waits up to affinity_wait_seconds for the busy worker holding
+    its dataset before another worker loads it, and fails after
+    acquire_timeout_seconds without any free worker (the run timeout
+    starts once it has one).
+    """
+    enabled: bool = os.getenv("SANDBOX", "1") != "0"
+    workers: int = int(os.getenv("SANDBOX_WORKERS", 2))
+    start_method: str = os.getenv("SANDBOX_START_METHOD", "spawn")
+    timeout_seconds: float = float(os.getenv("SANDBOX_TIMEOUT_SECONDS", 60))
+    memory_limit_bytes: int = int(os.getenv("SANDBOX_MEMORY_LIMIT", 2 * 1024 * 1024 * 1024))
+    worker_cache_bytes: int = int(os.getenv("SANDBOX_WORKER_CACHE_BYTES", 512 * 1024 * 1024))
+    affinity_wait_seconds: float = float(os.getenv("SANDBOX_AFFINITY_WAIT_SECONDS", 2))
+    acquire_timeout_seconds: float = float(os.getenv("SANDBOX_ACQUIRE_TIMEOUT_SECONDS", 30))
+
+
+@dataclass
+class AnswerCacheConfig:
+    """
+    Answers to questions already asked about the same dataset version are
+    served from memory for ttl_seconds, at most max_entries answers and
+    max_bytes (answer text plus the context rows kept for follow-ups).
+    """
+    enabled: bool = os.getenv("ANSWER_CACHE", "1") != "0"
+    ttl_seconds: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+    max_entries: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+    max_bytes: int = int(os.getenv("ANSWER_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+@dataclass
+class PlanCacheConfig:
+    """
+    JSON plans the LLM returned are reused, without asking it again, for a
+    new question whose embedding (embedding_model) has cosine similarity
+    of at least similarity_threshold with a cached question asked about a
+    dataset with the same schema. At most max_entries plans are kept.
+    """
+    enabled: bool = os.getenv("PLAN_CACHE", "1") != "0"
+    similarity_threshold: float = float(os.getenv("PLAN_CACHE_THRESHOLD", 0.92))
+    max_entries: int = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", 2000))
+    embedding_model: str = os.getenv("PLAN_CACHE_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+
+@dataclass
+class LLMCacheConfig:
+    """
+    LLM responses are stored in an SQLite file under path, keyed by a hash
+    of the whole request (model, messages and sampling parameters). Off by
+    default: the model is always called. Mode "record" answers repeated
+    requests from the file and records new ones, "replay" only answers
+    from the file and never calls the model (offline benchmarks). The
+    least recently used responses go first once max_entries or max_bytes
+    is exceeded.
+    """
+    mode: str = os.getenv("LLM_CACHE_MODE", "off")
+    path: str = os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.sqlite3"))
+    max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+    max_bytes: int = int(os.getenv("LLM_CACHE_MAX_BYTES", 128 * 1024 * 1024))
@@ -1,6 +1,8 @@
+import asyncio
 import os
 from openai import AzureOpenAI
 from dotenv import load_dotenv
+from services.llm_cache import llm_cache
 
 
 # load environment variables from .env
@@ -26,6 +28,8 @@ async def get_client():
 async def ask_llm(prompt: str) -> str:
     """
     Sends a prompt to Azure OpenAI and returns the text output.
+    With LLM_CACHE_MODE=record or replay, identical requests are answered
+    from the LLM response cache (off by default).
     """
     SYSTEM_PROMPT = """
     You are SmartDataAnalyst, an advanced reasoning agent that works on tabular data.
@@ -49,9 +53,7 @@ async def ask_llm(prompt: str) -> str:
     - Ensure python code is syntactically correct and users `df` as the dataframe variable.
     """
 
-    client = await get_client()
-
-    response = client.chat.completions.create(
+    request = dict(
         # model=AZURE_OPENAI_DEPLOYMENT_NAME,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -62,5 +64,16 @@ async def ask_llm(prompt: str) -> str:
         top_p=1.0,
         model=AZURE_OPENAI_DEPLOYMENT_NAME
     )
+    key = llm_cache.key(request)
+    # SQLite reads/writes stay off the event loop
+    cached = await asyncio.to_thread(llm_cache.get, key)
+    if cached is not None:
+        return cached
+
+    client = await get_client()
+
+    response = client.chat.completions.create(**request)
 
-    return response.choices[0].message.content
\ No newline at end of file
+    content = response.choices[0].message.content
+    await asyncio.to_thread(llm_cache.put, key, content)
+    return content
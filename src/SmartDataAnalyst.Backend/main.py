@@ -5,6 +5,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers import data_analysis, history_router, dashboard_router
 from database.database import init_db
+from services.ingest_jobs import ingest_jobs
+from services.code_sandbox import code_sandbox
+from services.llm_cache import llm_cache
 from dotenv import load_dotenv
 
 load_dotenv() # loads .env file
@@ -19,6 +22,13 @@ app = FastAPI(title="SmartDataAnalyst API", version="1.0")
 async def on_startup():
     await init_db()
 
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    ingest_jobs.shutdown()
+    code_sandbox.shutdown()
+    llm_cache.close()
+
 frontend_origin= os.getenv("FRONTEND_ORIGIN","http://localhost:5173")
 
 origins = [
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from services.dashboard_service import generate_dataset_summary
+from services.dataset_registry import dataset_registry
 
 router = APIRouter(prefix="/api/dashboard", tags=['Analysis Dashboard'])
 
@@ -10,7 +11,10 @@ class SummaryRequest(BaseModel):
 
 @router.post("/summary")
 def get_summary(request: SummaryRequest):
-    csv_path = f"data/{request.file_id}"
+    version = dataset_registry.resolve(request.file_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="File not found")
+    csv_path = version.path
     print(f"csv_path: {csv_path}")
     try:
         data = generate_dataset_summary(csv_path)
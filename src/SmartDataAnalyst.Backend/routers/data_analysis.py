@@ -1,13 +1,28 @@
 from fastapi import APIRouter, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
-import pandas as pd
 import os
-import chardet
 # from core.agent import analyze_query
 from core.agent_v16 import Agent_v16
 import asyncio
 from datetime import datetime
 from services.history_service import HistoryService
+from services.dataset_cache import dataset_cache
+from services.dataset_registry import VersionConflictError, dataset_registry
+from services.upload_service import stream_upload_to_disk, UploadTooLargeError
+from utils.compression import CompressionError
+from services.append_service import append_rows, AppendValidationError
+from services.readers import UnsupportedFormatError, check_readable
+from services.sharded_dataset import sharded_registry, shard_filename, open_sharded, ShardMismatchError
+from services.lazy_dataset import LazyDataset
+from services.secondary_indexes import secondary_indexes
+from services.query_plan import query_backends
+from services.code_sandbox import code_sandbox
+from services.answer_cache import answer_cache
+from services.plan_cache import plan_cache
+from services.llm_cache import llm_cache
+from typing import List, Optional
+from services.ingest_jobs import ingest_jobs
+from core.config import IngestConfig, IngestJobConfig
 from database.database import get_session
 import json
 
@@ -24,13 +39,16 @@ STATUS_HISTORY = {} # {filename: [{status,time}, ...]}
 AGENTS = {}
 AGENT_STATUSES = {}
 
+ingest_config = IngestConfig()
+job_config = IngestJobConfig()
 
-async def notify_status(filename: str, status: str):
+
+async def notify_status(filename: str, status: str, **details):
     """Notify all connected WebSocket clients of staus change"""
     if filename in active_connections:
         for ws in list(active_connections[filename]):
             try:
-                await ws.send_json({"status": status})
+                await ws.send_json({"status": status, **details})
             except Exception:
                 active_connections[filename].remove(ws)
 
@@ -45,10 +63,45 @@ def record_status(filename: str, status: str):
     })
     
 
-def get_agent_for_file(filename):
-    if filename not in AGENTS:
-        agent = Agent_v16(filename)
-        AGENTS[filename] = agent
+def current_version_id(filename):
+    """Version of a single upload, or of the shard set of a sharded dataset."""
+    if sharded_registry.exists(filename):
+        return sharded_registry.version_id(filename)
+    version = dataset_registry.resolve(filename)
+    return version.version_id if version else None
+
+
+def open_dataset(filename, rows_filter=None):
+    """
+    (LazyDataset, version_id) of an upload or sharded dataset, or None
+    when it does not exist. The agent reads only the columns its plan
+    refers to. Sharded datasets skip shards that cannot match rows_filter;
+    the filter is evaluated right away, so a bad filter fails here.
+    """
+    if sharded_registry.exists(filename):
+        dataset = open_sharded(sharded_registry, filename, rows_filter)
+        dataset.backend = query_backends.get(filename)
+        return dataset, sharded_registry.version_id(filename)
+
+    version = dataset_registry.resolve(filename)
+    if not version or not os.path.exists(version.path):
+        return None
+    dataset = LazyDataset([version.path], rows_filter=rows_filter, backend=query_backends.get(filename))
+    return dataset, version.version_id
+
+
+def get_agent_for_file(filename, version_id=None):
+    """
+    One agent per dataset version: a changed re-upload gets a fresh agent
+    instead of silently swapping the data under a live one.
+    """
+    if version_id is None:
+        version_id = current_version_id(filename)
+
+    key = (filename, version_id)
+    if key not in AGENTS:
+        agent = Agent_v16(filename, version_id=version_id)
+        AGENTS[key] = agent
 
         def handle_status_change(filename, new_status):
             AGENT_STATUSES[filename] = new_status
@@ -56,53 +109,244 @@ def get_agent_for_file(filename):
         
         agent.on_status_change = handle_status_change
         # AGENT_STATUSES[filename] = agent.get_status()
-    return AGENTS[filename]
+    return AGENTS[key]
+
+
+def submit_ingest(filename, version, upload):
+    """
+    Ingest a stored upload in the background process pool. Progress goes
+    out over /ws/agent-status; when the job is done the version summary is
+    stored, the version becomes current and the upload is written to
+    history. A failed job discards the pending version.
+    """
+    async def on_progress(job):
+        await notify_status(filename, "ingesting", **job.to_dict())
+
+    async def on_done(job):
+        record_status(filename, job.status)
+        if job.status == "done":
+            dataset_registry.update_info(version, job.result)
+            dataset_registry.activate(version)
+            profile, columns = job.result["profile"], job.result["columns"]
+            async for db in get_session():
+                await history_service.add_entry(
+                    db,
+                    # event_type="upload",
+                    file_name=filename,
+                    question="Uploaded file",
+                    answer=f"File uploaded with {profile['rows']} rows abd {len(columns)} columns"
+                )
+        elif job.status == "failed":
+            dataset_registry.discard(version)
+        await notify_status(filename, job.status, **job.to_dict())
+
+    return ingest_jobs.submit(
+        filename, version.version_id, version.path, upload.dialect, upload.raw_size,
+        ingest_config, on_progress=on_progress, on_done=on_done
+    )
 
 
 @router.post("/upload")
 async def upload_csv(file: UploadFile = File(...)):
-    filepath = os.path.join(UPLOAD_DIR, file.filename)
-    with open(filepath, "wb") as f:
-        f.write(await file.read())
-
-    with open(filepath, "rb") as raw:
-        result = chardet.detect(raw.read(50000))
-        encoding = result["encoding"] or "utf-8"
-    
+    staged_path = dataset_registry.staging_path(file.filename)
+    try:
+        upload = await stream_upload_to_disk(file, staged_path)
+    except UploadTooLargeError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except CompressionError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     try:
-        df = pd.read_csv(filepath, encoding=encoding)
-    except pd.errors.ParserError:
-        df = pd.read_csv(filepath, encoding=encoding, sep=";")
+        check_readable(staged_path)
+    except UnsupportedFormatError as e:
+        os.remove(staged_path)
+        return JSONResponse(status_code=415, content={"error": str(e)})
+
+    # Becomes current only once ingested
+    registered = dataset_registry.register(file.filename, staged_path, upload.sha256, upload.size, activate=False)
+    version = registered.version
+    response = {
+        "filename": file.filename,
+        "size": upload.size,
+        "sha256": upload.sha256,
+        "version_id": version.version_id,
+        "deduplicated": not registered.is_new_content
+    }
+
+    if registered.is_new_content or not version.info:
+        job, done = submit_ingest(file.filename, version, upload)
+        response["job_id"] = job.job_id
+
+        if upload.raw_size >= job_config.background_min_bytes:
+            # Large upload: answer now, the client follows the job
+            return {**response, "status": job.status, "columns": [], "preview": [], "profile": None}
+
+        await done
+        if job.status == "failed":
+            return JSONResponse(status_code=422, content={"error": job.error, "job_id": job.job_id})
+        columns, preview, profile = job.result["columns"], job.result["preview"], job.result["profile"]
+    else:
+        columns, preview, profile = version.info["columns"], version.info["preview"], version.info["profile"]
+
+        # Save history entry for upload (identical re-uploads are a no-op)
+        if not registered.is_unchanged:
+            async for db in get_session():
+                await history_service.add_entry(
+                    db,
+                    # event_type="upload",
+                    file_name=file.filename,
+                    question="Uploaded file",
+                    answer=f"File uploaded with {profile['rows']} rows abd {len(columns)} columns"
+                )
 
-    df = df.dropna(how="all", axis=0)    
-    df = df.loc[:, ~df.columns.str.contains("^Unnamed")]
-    
     # df = pd.read_csv(filepath)
-    preview = df.head().to_dict(orient="records")
     print(preview)
 
-    # Save history entry for upload
+    return {**response, "status": "done", "columns": columns, "preview": preview, "profile": profile}
+
+
+@router.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Progress of a background ingestion job, with the summary once done"""
+    job = ingest_jobs.get(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return {**job.to_dict(), "result": job.result if job.status == "done" else None}
+
+
+@router.post("/upload-shards")
+async def upload_shards(dataset: str = Form(...), files: List[UploadFile] = File(...)):
+    """
+    Add part files to a sharded dataset, addressed afterwards by `dataset`
+    as one table. Re-uploading a part with the same name replaces it.
+    """
+    stored, errors, pending = [], [], []
+    for file in files:
+        filename = shard_filename(dataset, file.filename)
+        staged_path = dataset_registry.staging_path(file.filename)
+        try:
+            upload = await stream_upload_to_disk(file, staged_path)
+        except (UploadTooLargeError, CompressionError) as e:
+            errors.append({"shard": file.filename, "error": str(e)})
+            continue
+        try:
+            check_readable(staged_path)
+        except UnsupportedFormatError as e:
+            os.remove(staged_path)
+            errors.append({"shard": file.filename, "error": str(e)})
+            continue
+
+        registered = dataset_registry.register(filename, staged_path, upload.sha256, upload.size, activate=False)
+        version = registered.version
+        job = None
+        if registered.is_new_content or not version.info:
+            # Shards ingest concurrently across the process pool
+            job, done = ingest_jobs.submit(
+                filename, version.version_id, version.path, upload.dialect, upload.raw_size, ingest_config
+            )
+            pending.append(done)
+        stored.append((file.filename, version, job))
+
+    await asyncio.gather(*pending)
+
+    shards = []
+    for name, version, job in stored:
+        if job is not None:
+            if job.status == "failed":
+                dataset_registry.discard(version)
+                errors.append({"shard": name, "error": job.error})
+                continue
+            dataset_registry.update_info(version, job.result)
+        try:
+            shard = await asyncio.to_thread(sharded_registry.add_shard, dataset, name, version)
+        except ShardMismatchError as e:
+            dataset_registry.discard(version)
+            errors.append({"shard": name, "error": str(e)})
+            continue
+        dataset_registry.activate(version)
+        shards.append({"name": shard.name, "version_id": shard.version_id, "rows": shard.rows})
+
+    all_shards = sharded_registry.shards(dataset)
+    total_rows = sum(s.rows for s in all_shards)
+
+    if shards:
+        async for db in get_session():
+            await history_service.add_entry(
+                db,
+                file_name=dataset,
+                question="Uploaded shards",
+                answer=f"Added {len(shards)} shards, dataset now has {len(all_shards)} shards and {total_rows} rows"
+            )
+
+    return {
+        "dataset": dataset,
+        "shards": shards,
+        "errors": errors,
+        "total_shards": len(all_shards),
+        "total_rows": total_rows,
+        "columns": all_shards[0].columns if all_shards else [],
+        "version_id": sharded_registry.version_id(dataset)
+    }
+
+
+@router.post("/append")
+async def append_csv(filename: str = Form(...), file: UploadFile = File(...)):
+    """
+    Append new rows to an uploaded dataset. Only the new rows are parsed;
+    they must have the dataset's columns and fit its stored column types.
+    """
+    version = dataset_registry.resolve(filename)
+    if not version or not os.path.exists(version.path):
+        return JSONResponse(status_code=404, content={"error": "File not found"})
+
+    staged_path = dataset_registry.staging_path(filename)
+    try:
+        upload = await stream_upload_to_disk(file, staged_path)
+        result = await asyncio.to_thread(append_rows, dataset_registry, version, staged_path, upload.dialect)
+    except UploadTooLargeError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except CompressionError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except AppendValidationError as e:
+        return JSONResponse(status_code=422, content={"error": str(e)})
+    except VersionConflictError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+
+    profile = result.version.info.get("profile", {})
+    print(f"[Append] {filename}: +{result.appended_rows} rows, cache extended: {result.cache_kinds}")
+
+    # Save history entry for append
     async for db in get_session():
         await history_service.add_entry(
             db,
-            # event_type="upload",
-            file_name=file.filename,
-            question="Uploaded file",
-            answer=f"File uploaded with {len(df)} rows abd {len(df.columns)} columns"
+            file_name=filename,
+            question="Appended rows",
+            answer=f"Appended {result.appended_rows} rows, dataset now has {profile.get('rows')} rows"
         )
 
-    return {"filename": file.filename, "columns": list(df.columns), "preview": preview}
+    return {
+        "filename": filename,
+        "appended_rows": result.appended_rows,
+        "profile": profile,
+        "version_id": result.version.version_id,
+        "previous_version_id": result.previous_version_id
+    }
 
 
 @router.post("/query")
-async def query_data(filename: str = Form(...), question: str = Form(...)):
-    filepath = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.exists(filepath):
+async def query_data(filename: str = Form(...), question: str = Form(...), rows_filter: Optional[str] = Form(None)):
+    try:
+        loaded = open_dataset(filename, rows_filter)
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"error": f"failed to apply rows_filter: {rows_filter}", "details": str(e)})
+    if loaded is None:
         return JSONResponse(status_code=404, content={"error": "File not found"})
 
-    df = pd.read_csv(filepath)
+    dataset, version_id = loaded
     # agent = Agent_v13()
-    agent = get_agent_for_file(filename)
+    agent = get_agent_for_file(filename, version_id)
 
     if not agent:
         return JSONResponse(status_code=400, content={"error": "Agent not initialized"})
@@ -117,11 +361,11 @@ async def query_data(filename: str = Form(...), question: str = Form(...)):
         if asyncio.iscoroutinefunction(agent.analyze_query):
             print("coroutine")
             # asyncio.run(agent.analyze_query(df, question))
-            answer = await agent.analyze_query(df, question)
+            answer = await agent.analyze_query(dataset, question)
         else:
             print("non coroutine")
             loop = asyncio.get_event_loop()
-            answer = await loop.run_in_execute(None, agent.analyze_query, df, question)
+            answer = await loop.run_in_execute(None, agent.analyze_query, dataset, question)
         
         agent.last_activity_time = asyncio.get_event_loop().time()
         
@@ -155,18 +399,21 @@ async def query_data(filename: str = Form(...), question: str = Form(...)):
 
 
 @router.post("/ask-followup")
-async def ask_followup(filename: str = Form(...), question: str = Form(...)):
+async def ask_followup(filename: str = Form(...), question: str = Form(...), rows_filter: Optional[str] = Form(None)):
     """
     Continue the conversation with context memory.
     """
-    filepath = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.exists(filepath):
+    try:
+        loaded = open_dataset(filename, rows_filter)
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"error": f"failed to apply rows_filter: {rows_filter}", "details": str(e)})
+    if loaded is None:
         return JSONResponse(status_code=404, content={"error": "File not found"})
 
-    df = pd.read_csv(filepath)
+    dataset, version_id = loaded
     # agent = Agent_v13()
-    agent = get_agent_for_file(filename)
-    answer = await agent.ask_followup(df, question)
+    agent = get_agent_for_file(filename, version_id)
+    answer = await agent.ask_followup(dataset, question)
 
     # Save History
     async for db in get_session():
@@ -201,6 +448,34 @@ async def get_agent_status(filename: str):
     print(f"Status: {status}")
     return {"status": status}
 
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """Hit/miss counters and memory usage of the shared dataset cache, secondary indexes, answer, plan and LLM response caches"""
+    return {**dataset_cache.stats(), "secondary_indexes": secondary_indexes.stats(), "answers": answer_cache.stats(),
+            "plans": plan_cache.stats(), "llm": llm_cache.stats()}
+
+@router.post("/cancel-query")
+async def cancel_query(filename: str = Form(...)):
+    """Stop the generated code running for a dataset's question (its sandbox worker is killed)"""
+    cancelled = [agent.cancel_code() for (name, _), agent in AGENTS.items() if name == filename]
+    return {"cancelled": any(cancelled)}
+
+@router.get("/sandbox-stats")
+async def get_sandbox_stats():
+    """Runs, failures, dataset affinity hit rate and resident bytes of the code sandbox workers"""
+    return code_sandbox.stats()
+
+@router.post("/query-backend")
+async def set_query_backend(filename: str = Form(...), backend: str = Form(...)):
+    """Choose how the agent runs "rows" plans for a dataset: "pandas" (eager) or "lazy" (query plan)"""
+    if not sharded_registry.exists(filename) and not dataset_registry.resolve(filename):
+        return JSONResponse(status_code=404, content={"error": "File not found"})
+    try:
+        query_backends.set(filename, backend)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"filename": filename, "backend": backend}
+
 @router.get("/agent-status-history")
 async def get_status_history(filename: str):
     return STATUS_HISTORY.get(filename, [])
@@ -0,0 +1,144 @@
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from core.config import AnswerCacheConfig
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _keeps_meaning(text: str, i: int) -> bool:
+    """Punctuation that changes a number: "-5", "5%", "1.5" and "1,000"."""
+    ch = text[i]
+    after = text[i + 1] if i + 1 < len(text) else ""
+    if ch == "%":
+        return True
+    if ch == "-":
+        return after.isdigit()
+    if ch in ".,":
+        return i > 0 and text[i - 1].isdigit() and after.isdigit()
+    return False
+
+
+def canonical_question(question: str) -> str:
+    """
+    Question with case, whitespace and punctuation folded: "Top 5 models?"
+    -> "top 5 models". Signs, percent signs and decimal/thousands
+    separators stay, so "-5" and "5", or "5%" and "5", remain different.
+    """
+    text = unicodedata.normalize("NFKC", question or "").casefold()
+    text = "".join(
+        " " if unicodedata.category(ch).startswith("P") and not _keeps_meaning(text, i) else ch
+        for i, ch in enumerate(text)
+    )
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    # Rows the answer left as context, restored for follow-up questions
+    context_rows: pd.DataFrame | None
+    size: int
+    created_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+class AnswerCache:
+    """
+    Process-wide LRU cache of agent answers, keyed by dataset version
+    (content hash), the agent's rows_filter and query backend, and the
+    canonical question. Entries expire after ttl_seconds; the least
+    recently used go first once max_entries or max_bytes is exceeded.
+    """
+
+    def __init__(self, config: AnswerCacheConfig | None = None):
+        self.config = config or AnswerCacheConfig()
+        self._entries: "OrderedDict[tuple, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(version_id: str, question: str, rows_filter: str | None = None, backend: str | None = None) -> tuple:
+        return (version_id, rows_filter or "", backend or "", canonical_question(question))
+
+    def get(self, key: tuple) -> CachedAnswer | None:
+        if not self.config.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.config.ttl_seconds:
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, answer: str, context_rows: pd.DataFrame | None = None):
+        if not self.config.enabled:
+            return
+        size = sys.getsizeof(answer)
+        if context_rows is not None:
+            size += int(context_rows.memory_usage(deep=True).sum())
+        if size > self.config.max_bytes:
+            return
+
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = CachedAnswer(answer=answer, context_rows=context_rows, size=size)
+            self.current_bytes += size
+            while self._entries and (len(self._entries) > self.config.max_entries
+                                     or self.current_bytes > self.config.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.config.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "answers": [
+                    {
+                        "version_id": key[0],
+                        "rows_filter": key[1] or None,
+                        "question": key[3],
+                        "hits": entry.hits,
+                        "bytes": entry.size,
+                        "age_seconds": round(time.monotonic() - entry.created_at, 1),
+                    }
+                    for key, entry in self._entries.items()
+                ],
+            }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+
+from services.columnar_store import (
+    append_columnar, build_schema, conform_to_columnar, extend_zone_map, is_columnar_fresh, load_dialect,
+    load_schema, read_csv_file, save_dialect, save_schema
+)
+from services.dataset_cache import dataset_cache
+from services.dataset_registry import DatasetRegistry, DatasetVersion, VersionConflictError, version_id_for
+from services.ingest_service import DatasetProfile
+from services.readers import DEFAULT_FORMAT, detect_format
+from utils.compression import compress
+from utils.csv_dialect import CsvDialect
+from utils.normalizer import apply_schema, schema_violations
+
+
+class AppendValidationError(Exception):
+    """The appended rows do not match the dataset's stored schema."""
+
+
+@dataclass
+class AppendResult:
+    version: DatasetVersion
+    appended_rows: int
+    # Cached frame kinds carried over to the new version without a reload
+    cache_kinds: list
+    # The version the rows were appended to
+    previous_version_id: str = ""
+
+
+# filename -> lock held for a whole append, so concurrent appends to one
+# dataset build on each other instead of on the same parent version
+_append_locks: dict = {}
+_append_locks_guard = threading.Lock()
+
+
+def _append_lock(filename: str) -> threading.Lock:
+    with _append_locks_guard:
+        return _append_locks.setdefault(filename, threading.Lock())
+
+
+def _csv_encoding(dialect: CsvDialect) -> str:
+    # The BOM already sits at the start of the existing file
+    return "utf-8" if dialect.encoding == "utf-8-sig" else dialect.encoding
+
+
+def _validate(rows: pd.DataFrame, columns: list, schema: dict):
+    missing = [c for c in columns if c not in rows.columns]
+    extra = [c for c in rows.columns if c not in columns]
+    if missing or extra:
+        raise AppendValidationError(f"Column mismatch (missing: {missing}, unexpected: {extra})")
+    if rows.empty:
+        raise AppendValidationError("No rows to append")
+
+    violations = schema_violations(rows, schema)
+    if violations:
+        details = "; ".join(f"{col}: {values}" for col, values in violations.items())
+        raise AppendValidationError(f"Values do not match the stored column types ({details})")
+
+
+def _write_appended_csv(src_path: str, dst_path: str, rows: pd.DataFrame, dialect: CsvDialect) -> tuple[str, int]:
+    """
+    Copy the existing CSV and append `rows` in its dialect, hashing the
+    result on the way. Compressed files get the rows as one more
+    member/frame of the same format. Returns (sha256, size).
+    """
+    digest = hashlib.sha256()
+    last = b"\n"
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+            last = chunk[-1:]
+
+        tail = rows.to_csv(
+            header=False,
+            index=False,
+            sep=dialect.delimiter,
+            quotechar=dialect.quotechar,
+            decimal=dialect.decimal,
+        ).encode(_csv_encoding(dialect))
+        if dialect.compression:
+            # The last plain byte is unknown; a blank line is skipped on read
+            tail = compress(b"\n" + tail, dialect.compression)
+        elif last not in (b"\n", b"\r"):
+            tail = b"\n" + tail
+        digest.update(tail)
+        dst.write(tail)
+
+    return digest.hexdigest(), os.path.getsize(dst_path)
+
+
+def append_rows(registry: DatasetRegistry, version: DatasetVersion, rows_path: str, rows_dialect: CsvDialect) -> AppendResult:
+    """
+    Append the rows in `rows_path` to the dataset as a new version.
+
+    Appends to one filename run one at a time, each on top of the current
+    version (which may be newer than `version` when another append got
+    there first). The new version only becomes current if nothing else,
+    e.g. a re-upload, replaced the parent meanwhile; otherwise
+    VersionConflictError is raised and the rows are not applied.
+
+    Only the new rows are parsed: the CSV is extended byte-wise, the Arrow
+    copy reuses the existing record batches, the schema sidecar is carried
+    over, cached frames are extended in memory and the profile is updated
+    from the new rows alone.
+    """
+    with _append_lock(version.filename):
+        version = registry.resolve(version.filename) or version
+        return _append_to(registry, version, rows_path, rows_dialect)
+
+
+def _append_to(registry: DatasetRegistry, version: DatasetVersion, rows_path: str, rows_dialect: CsvDialect) -> AppendResult:
+    path = version.path
+    if detect_format(path) != DEFAULT_FORMAT:
+        raise AppendValidationError("Appending is only supported for CSV datasets")
+    if not is_columnar_fresh(path):
+        raise AppendValidationError("Dataset has no columnar copy yet; re-upload it first")
+
+    dialect = load_dialect(path)
+    schema = load_schema(path) or build_schema(path)
+    columns = list(version.info.get("columns") or schema)
+
+    rows = read_csv_file(rows_path, dialect=rows_dialect)
+    _validate(rows, columns, schema)
+    rows = rows[columns]
+    try:
+        table = conform_to_columnar(path, rows)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise AppendValidationError(f"Values do not match the stored column types ({e})")
+
+    staged_path = registry.staging_path(version.filename)
+    try:
+        sha256, size = _write_appended_csv(path, staged_path, rows, dialect)
+        new_path = registry.object_path(version_id_for(sha256), version.filename)
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        os.replace(staged_path, new_path)
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+
+    # Sidecars are written after the CSV so they count as fresh
+    append_columnar(path, new_path, table)
+    save_dialect(new_path, dialect)
+    save_schema(new_path, schema)
+    extend_zone_map(path, new_path)
+
+    # Same dtypes as a load of the Arrow copy
+    rows = table.to_pandas(split_blocks=True)
+
+    def rows_for(kind: str) -> pd.DataFrame:
+        return apply_schema(rows, schema) if kind == "normalized" else rows
+
+    cache_kinds = dataset_cache.extend(path, new_path, rows_for)
+
+    info = dict(version.info)
+    if "profile" in info:
+        profile = DatasetProfile.from_dict(info["profile"])
+        profile.update(rows)
+        info["profile"] = profile.to_dict()
+
+    try:
+        new_version = registry.add_version(version.filename, new_path, sha256, size, info,
+                                           parent_version_id=version.version_id)
+    except VersionConflictError:
+        dataset_cache.invalidate(new_path)
+        if registry.resolve(version.filename, version_id_for(sha256)) is None:
+            shutil.rmtree(os.path.dirname(new_path), ignore_errors=True)
+        raise
+    return AppendResult(version=new_version, appended_rows=len(rows), cache_kinds=cache_kinds,
+                        previous_version_id=version.version_id)
@@ -0,0 +1,484 @@
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import pickle
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+import pandas as pd
+import pyarrow as pa
+
+from core.config import SandboxConfig
+from services.dataset_cache import dataset_cache
+from services.lazy_dataset import SOURCE_ATTR, LazyDataset
+from services.secondary_indexes import secondary_indexes
+
+# safe builtin subset for exec
+SAFE_BUILTINS = {
+    "len": len,
+    "min": min,
+    "max": max,
+    "sum": sum,
+    "list": list,
+    "dict": dict,
+    "set": set,
+    "float": float,
+    "int": int,
+    "str": str,
+    "bool": bool,
+    "range": range,
+}
+
+# How a frame travels between processes
+ARROW = "arrow"
+PICKLE = "pickle"
+
+_IPC_OPTIONS = pa.ipc.IpcWriteOptions(compression="lz4" if pa.Codec.is_available("lz4") else None)
+_ACQUIRE_POLL_SECONDS = 0.05
+_SPAWN_RETRIES = 3
+_SPAWN_BACKOFF_SECONDS = 1.0
+
+
+class SandboxError(Exception):
+    """Raised when generated code cannot finish: timeout, cancellation, crashed worker."""
+
+
+class CodeError(Exception):
+    """Raised with the message of an exception the generated code raised."""
+
+
+@dataclass
+class CodeResult:
+    """
+    Outcome of one run: str() of the code's `result` variable (None when
+    it set none) and the frame left in the context variable (None when it
+    holds no frame).
+    """
+    result: str | None = None
+    frame: pd.DataFrame | None = None
+
+
+# -------------------------
+# Frame transport
+# -------------------------
+def encode_frame(df: pd.DataFrame) -> tuple[str, pa.Buffer | bytes]:
+    """Arrow IPC stream of a frame (pickle for frames Arrow cannot hold, e.g. mixed object columns)."""
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowException, TypeError, ValueError):
+        return PICKLE, pickle.dumps(df, protocol=5)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=_IPC_OPTIONS) as writer:
+        writer.write_table(table)
+    return ARROW, sink.getvalue()
+
+
+def decode_frame(kind: str, data) -> pd.DataFrame:
+    if kind == PICKLE:
+        return pickle.loads(data)
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
+
+
+def _share_frame(df: pd.DataFrame) -> tuple[SharedMemory, dict]:
+    """Copy a frame into a shared memory block; the worker maps it instead of unpickling a message."""
+    kind, data = encode_frame(df)
+    shm = SharedMemory(create=True, size=max(len(data), 1))
+    shm.buf[:len(data)] = memoryview(data).cast("B")
+    return shm, {"shm": shm.name, "size": len(data), "kind": kind}
+
+
+def _attach_frame(ref: dict) -> pd.DataFrame:
+    # Workers share the server's resource tracker, so attaching here
+    # leaves unlinking the block to the server
+    shm = SharedMemory(name=ref["shm"])
+    try:
+        # One copy of the (compressed) stream, so no column of the frame
+        # points into the block once it is unmapped
+        data = bytes(shm.buf[:ref["size"]])
+    finally:
+        shm.close()
+    return decode_frame(ref["kind"], data)
+
+
+# -------------------------
+# Execution (worker side)
+# -------------------------
+def execute(code: str, df: pd.DataFrame, context_var: str) -> dict:
+    """
+    Run generated code with `df` and `pd` in scope. The payload carries
+    str(result), the frame left in `context_var` (Arrow IPC bytes; left
+    out when it still is the input frame) or the error message.
+    """
+    exec_env = {"df": df, "pd": pd}
+    exec_globals = {"__builtins__": SAFE_BUILTINS, "pd": pd}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            exec(code, exec_globals, exec_env)
+    except Exception as e:
+        return {"error": str(e) or type(e).__name__}
+
+    payload = {"result": str(exec_env["result"]) if "result" in exec_env else None}
+    frame = exec_env.get(context_var)
+    if isinstance(frame, pd.DataFrame):
+        if frame is df:
+            payload["frame"] = "input"
+        else:
+            kind, data = encode_frame(frame)
+            payload["frame"] = (kind, data.to_pybytes() if isinstance(data, pa.Buffer) else data)
+    return payload
+
+
+def _limit_memory(limit: int):
+    if not limit:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        print(f"[CodeSandbox] Could not limit worker memory: {e}")
+
+
+def frame_source(df: pd.DataFrame) -> dict | None:
+    """
+    How a worker can load `df` itself (see LazyDataset.load), or None
+    when the frame is not, or no longer, exactly such a load.
+    """
+    source = df.attrs.get(SOURCE_ATTR)
+    if not source or source["frame_id"] != id(df) or source["rows"] != len(df) \
+            or source["column_names"] != list(df.columns):
+        return None
+    return source
+
+
+def _load_source(source: dict) -> pd.DataFrame:
+    dataset = LazyDataset(source["paths"], rows_filter=source["rows_filter"])
+    return dataset.load(source["columns"], rows_filter=source["prune_filter"])
+
+
+def _resident() -> dict:
+    """Bytes of each dataset file this worker holds in its dataset cache."""
+    resident = {}
+    for entry in dataset_cache.stats()["datasets"]:
+        resident[entry["path"]] = resident.get(entry["path"], 0) + entry["bytes"]
+    return resident
+
+
+def _worker_main(conn, memory_limit: int, cache_bytes: int):
+    """Worker process: answer jobs from the pipe until it closes."""
+    _limit_memory(memory_limit)
+    # Datasets stay resident in this worker's own cache, least recently
+    # used dropped first; indexes are left to the server
+    dataset_cache.max_bytes = cache_bytes
+    secondary_indexes.config.enabled = False
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if "source" in job:
+            try:
+                df = _load_source(job["source"])
+            except Exception as e:
+                conn.send({"missing": str(e), "resident": _resident()})
+                continue
+        else:
+            df = _attach_frame(job["frame"])
+        payload = execute(job["code"], df, job["context_var"])
+        del df
+        payload["resident"] = _resident()
+        conn.send(payload)
+
+
+# -------------------------
+# Pool (server side)
+# -------------------------
+class _Worker:
+    def __init__(self, ctx, config: SandboxConfig):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, config.memory_limit_bytes, config.worker_cache_bytes),
+            daemon=True, name="code-sandbox"
+        )
+        self.process.start()
+        child_conn.close()
+        self.busy = False
+        self.cancelled = False
+        # Dataset file -> bytes resident in the worker, as it last reported
+        self.resident: dict = {}
+
+    def holds(self, paths: list) -> bool:
+        return all(path in self.resident for path in paths)
+
+    def resident_bytes(self) -> int:
+        return sum(self.resident.values())
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class CodeSandbox:
+    """
+    Runs LLM-generated pandas code in warm worker processes (pandas and
+    pyarrow already imported), so a slow groupby never blocks the event
+    loop, WebSocket status pushes or other users.
+
+    Frames loaded from a LazyDataset are not sent at all: the worker
+    loads the same columns from the memory-mapped Arrow files into its
+    own dataset cache, where they stay resident (LRU, worker_cache_bytes
+    per worker). Each job goes to a worker already holding its dataset,
+    waiting up to affinity_wait_seconds for it when it is busy. Other
+    frames go to the worker as an Arrow IPC stream in shared memory.
+    Results come back as a string plus, for row results, Arrow IPC bytes.
+    A run that exceeds the timeout or is cancelled kills its worker,
+    which is then replaced; failed replacements are retried and the pool
+    is topped up again whenever a job finds it short.
+    """
+
+    def __init__(self, config: SandboxConfig | None = None):
+        self.config = config or SandboxConfig()
+        self._workers: list[_Worker] = []
+        self._running: dict[str, _Worker] = {}
+        self._lock = threading.Lock()
+        self._ctx = None
+        self._started = False
+        # Replacement workers being started in the background
+        self._spawning = 0
+        self.spawn_failures = 0
+        self.last_spawn_error = None
+        self.runs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.crashes = 0
+        self.affinity_hits = 0
+        self.affinity_misses = 0
+        self.frames_shipped = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._started:
+                return
+            self._ctx = multiprocessing.get_context(self.config.start_method)
+            for _ in range(max(1, self.config.workers)):
+                self._workers.append(self._spawn())
+            self._started = True
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.config)
+        try:
+            if worker.conn.recv() == "ready":
+                return worker
+        except EOFError:
+            pass
+        worker.kill()
+        raise SandboxError("Sandbox worker failed to start")
+
+    def _replace(self):
+        try:
+            for attempt in range(_SPAWN_RETRIES):
+                try:
+                    worker = self._spawn()
+                except Exception as e:
+                    self.spawn_failures += 1
+                    self.last_spawn_error = str(e)
+                    print(f"[CodeSandbox] Replacing a worker failed (attempt {attempt + 1}): {e}")
+                    time.sleep(_SPAWN_BACKOFF_SECONDS * (attempt + 1))
+                    continue
+                with self._lock:
+                    if self._started:
+                        self._workers.append(worker)
+                        return
+                worker.kill()
+                return
+        finally:
+            with self._lock:
+                self._spawning -= 1
+
+    def _top_up(self):
+        """Start replacements for missing workers; the caller holds the lock."""
+        missing = max(1, self.config.workers) - len(self._workers) - self._spawning
+        for _ in range(max(0, missing)):
+            self._spawning += 1
+            # Replaced in the background: a new worker takes a moment to import pandas
+            threading.Thread(target=self._replace, name="code-sandbox-spawn", daemon=True).start()
+
+    async def _acquire(self, paths: list) -> _Worker:
+        # Polled rather than waited on in a thread, so a cancelled request
+        # never leaves a thread holding a worker
+        started = time.monotonic()
+        deadline = started + self.config.affinity_wait_seconds
+        while True:
+            if time.monotonic() - started >= self.config.acquire_timeout_seconds:
+                raise SandboxError(
+                    f"No sandbox worker became available within {self.config.acquire_timeout_seconds:g}s"
+                    + (f" (last spawn error: {self.last_spawn_error})" if self.last_spawn_error else ""))
+            with self._lock:
+                if self._started:
+                    self._top_up()
+                holders = [w for w in self._workers if paths and w.holds(paths)]
+                worker = next((w for w in holders if not w.busy), None)
+                if worker is not None:
+                    self.affinity_hits += 1
+                elif not holders or time.monotonic() >= deadline:
+                    # Spread datasets: the idle worker holding the least
+                    idle = [w for w in self._workers if not w.busy]
+                    worker = min(idle, key=_Worker.resident_bytes, default=None)
+                    if worker is not None and paths:
+                        self.affinity_misses += 1
+                if worker is not None:
+                    worker.busy = True
+                    return worker
+            await asyncio.sleep(_ACQUIRE_POLL_SECONDS)
+
+    def _release(self, worker: _Worker):
+        if worker.alive() and not worker.cancelled:
+            with self._lock:
+                worker.busy = False
+            return
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if self._started:
+                self._top_up()
+
+    async def run(self, code: str, df: pd.DataFrame, context_var: str = "df",
+                  job_id: str | None = None, timeout: float | None = None) -> CodeResult:
+        """
+        Run `code` against `df`; `context_var` names the variable whose
+        frame is returned. Raises CodeError when the code fails, and
+        SandboxError on timeout, cancel() or a crashed worker (e.g. over
+        its memory limit).
+        """
+        if not self.config.enabled:
+            payload = await asyncio.to_thread(execute, code, df, context_var)
+            return await asyncio.to_thread(self._result, payload, df)
+
+        await asyncio.to_thread(self._ensure_started)
+        job_id = job_id or uuid.uuid4().hex
+        timeout = timeout or self.config.timeout_seconds
+        source = frame_source(df)
+        worker = await self._acquire(source["paths"] if source else [])
+        # Waiting for a worker does not count against the run's timeout
+        deadline = time.monotonic() + timeout
+        shm = None
+        try:
+            with self._lock:
+                self._running[job_id] = worker
+            job = {"code": code, "context_var": context_var}
+            payload = None
+            if source is not None:
+                payload = await self._send(worker, {**job, "source": source}, deadline, timeout)
+                if payload.get("missing") is not None:
+                    print(f"[CodeSandbox] Worker could not load the dataset, sending the frame: {payload['missing']}")
+                    worker.resident = payload["resident"]
+                    payload = None
+            if payload is None:
+                shm, frame_ref = await asyncio.to_thread(_share_frame, df)
+                self.frames_shipped += 1
+                payload = await self._send(worker, {**job, "frame": frame_ref}, deadline, timeout)
+            worker.resident = payload.pop("resident", worker.resident)
+        except asyncio.CancelledError:
+            worker.kill()
+            self.cancelled += 1
+            raise
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            self._release(worker)
+
+        self.runs += 1
+        return await asyncio.to_thread(self._result, payload, df)
+
+    async def _send(self, worker: _Worker, job: dict, deadline: float, timeout: float) -> dict:
+        worker.conn.send(job)
+        finished = await asyncio.to_thread(worker.conn.poll, max(0.0, deadline - time.monotonic()))
+        if worker.cancelled:
+            self.cancelled += 1
+            raise SandboxError("Code execution was cancelled")
+        if not finished:
+            worker.kill()
+            self.timeouts += 1
+            raise SandboxError(f"Code execution timed out after {timeout:g}s")
+        try:
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            self.crashes += 1
+            raise SandboxError("Code execution stopped: worker exited (out of memory?)")
+
+    def _result(self, payload: dict, df: pd.DataFrame) -> CodeResult:
+        if payload.get("error") is not None:
+            self.errors += 1
+            raise CodeError(payload["error"])
+        frame = payload.get("frame")
+        if frame == "input":
+            frame = df.copy()
+        elif frame is not None:
+            frame = decode_frame(*frame)
+        return CodeResult(result=payload.get("result"), frame=frame)
+
+    def cancel(self, job_id: str) -> bool:
+        """Stop a running job by killing its worker; False when it is not running."""
+        with self._lock:
+            worker = self._running.get(job_id)
+        if worker is None:
+            return False
+        worker.cancelled = True
+        if worker.process.is_alive():
+            worker.process.kill()
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            workers = [
+                {
+                    "pid": w.process.pid,
+                    "busy": w.busy,
+                    "resident_bytes": w.resident_bytes(),
+                    "datasets": sorted(w.resident),
+                }
+                for w in self._workers
+            ]
+            routed = self.affinity_hits + self.affinity_misses
+            return {
+                "enabled": self.config.enabled,
+                "workers": workers,
+                "running": len(self._running),
+                "runs": self.runs,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "cancelled": self.cancelled,
+                "crashes": self.crashes,
+                "spawning": self._spawning,
+                "spawn_failures": self.spawn_failures,
+                "last_spawn_error": self.last_spawn_error,
+                "affinity_hits": self.affinity_hits,
+                "affinity_misses": self.affinity_misses,
+                "hit_rate": self.affinity_hits / routed if routed else None,
+                "frames_shipped": self.frames_shipped,
+                "resident_bytes": sum(w["resident_bytes"] for w in workers),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._workers:
+                worker.kill()
+            self._workers.clear()
+            self._started = False
+
+
+code_sandbox = CodeSandbox()
@@ -0,0 +1,422 @@
+import json
+import os
+import shutil
+from typing import Iterable
+
+import pandas as pd
+import pyarrow as pa
+
+from core.config import ColumnarStoreConfig
+from services.readers import detect_format, frame_to_table, is_arrow_file, open_batches, register_reader
+from utils.csv_dialect import CsvDialect, sniff_file
+from utils.normalizer import apply_schema, normalize_with_schema
+from utils.pruning import column_stats
+
+COLUMNAR_SUFFIX = ".arrow"
+DIALECT_SUFFIX = ".dialect.json"
+SCHEMA_SUFFIX = ".schema.json"
+ZONES_SUFFIX = ".zones.json"
+
+config = ColumnarStoreConfig()
+
+
+def _is_sidecar_fresh(csv_path: str, sidecar_path: str) -> bool:
+    """True when the sidecar exists and is not older than its CSV."""
+    if not os.path.exists(sidecar_path):
+        return False
+    return os.stat(sidecar_path).st_mtime_ns >= os.stat(csv_path).st_mtime_ns
+
+
+def dialect_path(csv_path: str) -> str:
+    """Location of the sniffed dialect sidecar for an uploaded CSV."""
+    return csv_path + DIALECT_SUFFIX
+
+
+def save_dialect(csv_path: str, dialect: CsvDialect):
+    with open(dialect_path(csv_path), "w") as f:
+        json.dump(dialect.to_dict(), f)
+
+
+def load_dialect(csv_path: str) -> CsvDialect:
+    """
+    Return the stored dialect, sniffing (and storing) it on first use.
+    """
+    path = dialect_path(csv_path)
+    if _is_sidecar_fresh(csv_path, path):
+        with open(path) as f:
+            return CsvDialect.from_dict(json.load(f))
+
+    dialect = sniff_file(csv_path)
+    save_dialect(csv_path, dialect)
+    return dialect
+
+
+def read_csv_file(filepath: str, dialect: CsvDialect | None = None) -> pd.DataFrame:
+    """
+    Parse an uploaded CSV the same way for every endpoint:
+    - Uses the stored (or freshly sniffed) dialect; no second guesses.
+    - Drops fully empty rows and pandas 'Unnamed' index columns.
+    """
+    dialect = dialect or load_dialect(filepath)
+    df = pd.read_csv(filepath, **dialect.read_csv_kwargs())
+
+    df = df.dropna(how="all", axis=0)
+    df = df.loc[:, ~df.columns.str.contains("^Unnamed")]
+    return df
+
+
+def columnar_path(csv_path: str) -> str:
+    """Location of the Arrow IPC copy for an uploaded CSV."""
+    return csv_path + COLUMNAR_SUFFIX
+
+
+def is_columnar_fresh(csv_path: str) -> bool:
+    """True when the Arrow copy exists and is not older than its CSV."""
+    return _is_sidecar_fresh(csv_path, columnar_path(csv_path))
+
+
+def schema_path(csv_path: str) -> str:
+    """Location of the normalized column types for an uploaded CSV."""
+    return csv_path + SCHEMA_SUFFIX
+
+
+def save_schema(csv_path: str, schema: dict):
+    with open(schema_path(csv_path), "w") as f:
+        json.dump(schema, f)
+
+
+def load_schema(csv_path: str) -> dict | None:
+    """Stored {column: kind} schema, or None when missing or stale."""
+    path = schema_path(csv_path)
+    if not _is_sidecar_fresh(csv_path, path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_columnar(csv_path: str, df: pd.DataFrame) -> str:
+    """
+    Write `df` as an uncompressed Arrow IPC file next to the CSV.
+    Uncompressed record batches can be memory-mapped without decoding.
+    The file is written to a temp path and renamed so readers never see
+    a half-written copy.
+    """
+    table = frame_to_table(df)
+    arrow_path = columnar_path(csv_path)
+    tmp_path = arrow_path + ".tmp"
+
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=config.batch_rows)
+
+    os.replace(tmp_path, arrow_path)
+    return arrow_path
+
+
+def write_columnar_chunks(csv_path: str, chunks: Iterable[pd.DataFrame], schema: pa.Schema) -> str:
+    """
+    Write an Arrow IPC copy from a stream of DataFrame chunks. Every chunk
+    is converted against the same `schema`, so only one chunk is held in
+    memory at a time.
+    """
+    arrow_path = columnar_path(csv_path)
+    tmp_path = arrow_path + ".tmp"
+
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for chunk in chunks:
+                table = frame_to_table(chunk, schema=schema)
+                writer.write_table(table, max_chunksize=config.batch_rows)
+
+    os.replace(tmp_path, arrow_path)
+    return arrow_path
+
+
+def conform_to_columnar(csv_path: str, df: pd.DataFrame) -> pa.Table:
+    """
+    Convert `df` to a table with the stored Arrow schema of `csv_path`.
+    Raises ArrowInvalid/ArrowTypeError when its values do not fit.
+    """
+    with pa.memory_map(columnar_path(csv_path), "r") as source:
+        schema = pa.ipc.open_file(source).schema
+    return frame_to_table(_conform_to_schema(df, schema), schema=schema)
+
+
+def append_columnar(src_csv_path: str, dst_csv_path: str, table: pa.Table) -> str:
+    """
+    Write the Arrow copy for `dst_csv_path` as the record batches of
+    `src_csv_path` followed by `table` (see conform_to_columnar).
+    Existing batches are streamed from the memory map unchanged, so no
+    CSV is parsed.
+    """
+    source = pa.memory_map(columnar_path(src_csv_path), "r")
+    reader = pa.ipc.open_file(source)
+
+    arrow_path = columnar_path(dst_csv_path)
+    tmp_path = arrow_path + ".tmp"
+
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, reader.schema) as writer:
+            for i in range(reader.num_record_batches):
+                writer.write_batch(reader.get_batch(i))
+            writer.write_table(table, max_chunksize=config.batch_rows)
+
+    os.replace(tmp_path, arrow_path)
+    return arrow_path
+
+
+def _conform_to_schema(df: pd.DataFrame, schema: pa.Schema) -> pd.DataFrame:
+    """Order columns like `schema` and turn values of text columns into str."""
+    df = df[schema.names].copy()
+    for field in schema:
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            col = df[field.name]
+            df[field.name] = col.where(col.isna(), col.astype(str))
+    return df
+
+
+def write_columnar_batches(csv_path: str, batches: pa.RecordBatchReader) -> str:
+    """Write an Arrow IPC copy from a stream of record batches (see readers)."""
+    arrow_path = columnar_path(csv_path)
+    tmp_path = arrow_path + ".tmp"
+
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, batches.schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+
+    os.replace(tmp_path, arrow_path)
+    return arrow_path
+
+
+def link_or_copy(src: str, dst: str):
+    """Hard-link identical artifacts (no extra disk), copy across devices."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def convert_to_columnar(csv_path: str, dialect: CsvDialect | None = None) -> str:
+    """
+    Rebuild the Arrow copy from the uploaded file (source of truth) with
+    the reader for its format. An uploaded Arrow IPC file already is the
+    memory-mappable copy, so it is hard-linked instead of rewritten.
+    """
+    fmt = detect_format(csv_path)
+    if fmt == "csv":
+        return write_columnar(csv_path, read_csv_file(csv_path, dialect=dialect))
+
+    if fmt == "arrow" and is_arrow_file(csv_path):
+        arrow_path = columnar_path(csv_path)
+        if os.path.exists(arrow_path):
+            os.remove(arrow_path)
+        link_or_copy(csv_path, arrow_path)
+        return arrow_path
+
+    return write_columnar_batches(csv_path, open_batches(csv_path, fmt))
+
+
+def read_columnar(csv_path: str) -> pa.Table:
+    """
+    Memory-map the Arrow copy. Column buffers point into the OS page
+    cache, so several worker processes reading the same dataset share
+    physical pages instead of each holding a parsed copy.
+    """
+    source = pa.memory_map(columnar_path(csv_path), "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+def read_columnar_head(csv_path: str, rows: int) -> pa.Table:
+    """First `rows` rows of the Arrow copy, reading only the batches needed."""
+    source = pa.memory_map(columnar_path(csv_path), "r")
+    reader = pa.ipc.open_file(source)
+    batches, total = [], 0
+    for i in range(reader.num_record_batches):
+        if total >= rows:
+            break
+        batch = reader.get_batch(i)
+        batches.append(batch)
+        total += batch.num_rows
+    return pa.Table.from_batches(batches, schema=reader.schema).slice(0, rows)
+
+
+def build_schema(csv_path: str, sample_rows: int = 65536) -> dict:
+    """
+    Infer and store the schema from the head of the Arrow copy. Used for
+    datasets too large to normalize in one piece at upload time.
+    """
+    head = read_columnar_head(csv_path, sample_rows).to_pandas()
+    _, schema = normalize_with_schema(head)
+    save_schema(csv_path, schema)
+    return schema
+
+
+def load_dataset(csv_path: str) -> pd.DataFrame:
+    """
+    Load a dataset from its Arrow copy, converting from the uploaded file
+    (CSV, Parquet, ...) first when the copy is missing or older than it.
+    """
+    if not is_columnar_fresh(csv_path):
+        print(f"[ColumnarStore] Converting {csv_path} to Arrow")
+        convert_to_columnar(csv_path)
+
+    table = read_columnar(csv_path)
+    # split_blocks lets null-free numeric columns stay zero-copy views
+    return table.to_pandas(split_blocks=True)
+
+
+def load_normalized_dataset(csv_path: str) -> pd.DataFrame:
+    """
+    Load a dataset ready for the agent. Column types come from the schema
+    sidecar, so type inference runs once per dataset version (the first
+    load after upload) and later loads only apply the stored dtypes.
+    """
+    df = load_dataset(csv_path)
+    schema = load_schema(csv_path)
+
+    if schema is None:
+        df, schema = normalize_with_schema(df)
+        save_schema(csv_path, schema)
+        return df
+
+    return apply_schema(df, schema)
+
+
+def load_normalized_columns(csv_path: str, columns: list) -> pd.DataFrame:
+    """
+    Load only `columns` of a dataset, ready for the agent. Other columns
+    are never touched: selecting them from the memory-mapped Arrow copy
+    reads no data, and only the selected ones are converted to pandas and
+    normalized. Inference is per column, so without a stored schema the
+    kinds match those of a full load (the partial schema is not stored).
+    """
+    if not is_columnar_fresh(csv_path):
+        print(f"[ColumnarStore] Converting {csv_path} to Arrow")
+        convert_to_columnar(csv_path)
+
+    df = read_columnar(csv_path).select(columns).to_pandas(split_blocks=True)
+    return apply_stored_schema(csv_path, df)
+
+
+def apply_stored_schema(csv_path: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize part of a dataset (some rows or columns) with its stored
+    schema; without one, infer the kinds but do not store them.
+    """
+    schema = load_schema(csv_path)
+    if schema is None:
+        df, _ = normalize_with_schema(df)
+        return df
+    return apply_schema(df, schema)
+
+
+def zone_map_path(csv_path: str) -> str:
+    """Location of the per-record-batch statistics for an uploaded CSV."""
+    return csv_path + ZONES_SUFFIX
+
+
+def save_zone_map(csv_path: str, zones: list):
+    with open(zone_map_path(csv_path), "w") as f:
+        json.dump(zones, f, default=str)
+
+
+def _zones_for_batches(csv_path: str, first: int = 0, normalized: pd.DataFrame | None = None) -> list:
+    """Zone map entries for the record batches from `first` on."""
+    schema = load_schema(csv_path)
+    if schema is None and normalized is None:
+        load_normalized_dataset(csv_path)
+        schema = load_schema(csv_path)
+
+    zones, offset = [], 0
+    with pa.memory_map(columnar_path(csv_path), "r") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if i >= first:
+                if normalized is not None:
+                    part = normalized.iloc[offset:offset + batch.num_rows]
+                else:
+                    part = apply_schema(batch.to_pandas(), schema)
+                zones.append({"rows": batch.num_rows, "stats": column_stats(part)})
+            offset += batch.num_rows
+    return zones
+
+
+def build_zone_map(csv_path: str, normalized: pd.DataFrame | None = None) -> list:
+    """
+    Compute and store the zone map: for every record batch of the Arrow
+    copy, its row count and column_stats (min/max/nulls) of the normalized
+    values, so a rows_filter can skip batches before reading them. Pass
+    the already normalized frame of the whole dataset to avoid
+    normalizing the batches again.
+    """
+    zones = _zones_for_batches(csv_path, normalized=normalized)
+    save_zone_map(csv_path, zones)
+    return zones
+
+
+def extend_zone_map(src_csv_path: str, dst_csv_path: str) -> list:
+    """Zone map of an appended copy (see append_columnar): the source's plus the new batches."""
+    zones = load_zone_map(src_csv_path)
+    zones = zones + _zones_for_batches(dst_csv_path, first=len(zones))
+    save_zone_map(dst_csv_path, zones)
+    return zones
+
+
+def load_zone_map(csv_path: str) -> list:
+    """Stored zone map, built (and stored) when missing or stale."""
+    path = zone_map_path(csv_path)
+    if is_columnar_fresh(csv_path) and _is_sidecar_fresh(csv_path, path):
+        with open(path) as f:
+            return json.load(f)
+    if not is_columnar_fresh(csv_path):
+        convert_to_columnar(csv_path)
+    return build_zone_map(csv_path)
+
+
+def read_columnar_batches(csv_path: str, batches: list, columns: list | None = None) -> pd.DataFrame:
+    """
+    Normalized rows of the given record batches only (optionally only
+    `columns`), indexed by their row positions in the whole dataset.
+    Batches not listed are never read from the memory map.
+    """
+    source = pa.memory_map(columnar_path(csv_path), "r")
+    reader = pa.ipc.open_file(source)
+    wanted = set(batches)
+    parts, runs, offset = [], [], 0
+    for i in range(reader.num_record_batches):
+        # Zero-copy: a skipped batch only has its metadata touched
+        batch = reader.get_batch(i)
+        if i in wanted:
+            parts.append(batch)
+            if runs and runs[-1][1] == offset:
+                runs[-1][1] += batch.num_rows
+            else:
+                runs.append([offset, offset + batch.num_rows])
+        offset += batch.num_rows
+
+    table = pa.Table.from_batches(parts, schema=reader.schema)
+    if columns is not None:
+        table = table.select(columns)
+    df = table.to_pandas(split_blocks=True)
+    ranges = [pd.RangeIndex(start, stop) for start, stop in runs] or [pd.RangeIndex(0)]
+    df.index = ranges[0].append(ranges[1:]) if len(ranges) > 1 else ranges[0]
+    return apply_stored_schema(csv_path, df)
+
+
+def read_columnar_rows(csv_path: str, positions, columns: list | None = None) -> pd.DataFrame:
+    """Normalized rows at `positions` (optionally only `columns`), indexed by position."""
+    table = read_columnar(csv_path)
+    if columns is not None:
+        table = table.select(columns)
+    df = table.take(pa.array(positions, type=pa.int64())).to_pandas(split_blocks=True)
+    df.index = pd.Index(positions, dtype="int64")
+    return apply_stored_schema(csv_path, df)
+
+
+def _read_csv(filepath: str) -> pa.RecordBatchReader:
+    return frame_to_table(read_csv_file(filepath)).to_reader(max_chunksize=config.batch_rows)
+
+
+register_reader("csv", _read_csv, extensions=(".csv", ".tsv", ".txt"))
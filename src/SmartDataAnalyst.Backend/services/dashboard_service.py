@@ -1,7 +1,8 @@
 import pandas as pd
+from services.dataset_cache import dataset_cache
 
 def generate_dataset_summary(csv_path: str) -> dict:
-    df = pd.read_csv(csv_path)
+    df = dataset_cache.get(csv_path)
 
     columns_info = []
     numeric_summary = []
@@ -0,0 +1,217 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import pandas as pd
+
+from core.config import DatasetCacheConfig
+from services.columnar_store import load_dataset, load_normalized_columns, load_normalized_dataset
+from utils.normalizer import NORMALIZED_ATTR
+from utils.compaction import COMPACTION_ATTR, compact_dataframe, config as compaction_config
+
+
+def _compact(filepath: str, df: pd.DataFrame) -> pd.DataFrame:
+    if not compaction_config.enabled:
+        return df
+    df = compact_dataframe(df)
+    report = df.attrs[COMPACTION_ATTR]
+    print(f"[DatasetCache] Compacted {filepath}: {report['bytes_before']} -> {report['bytes_after']} bytes")
+    return df
+
+
+def _compacted(loader: Callable[[str], pd.DataFrame]) -> Callable[[str], pd.DataFrame]:
+    """Wrap a loader so cached frames use compact dtypes."""
+    def load(filepath: str) -> pd.DataFrame:
+        return _compact(filepath, loader(filepath))
+    return load
+
+
+# How each kind of cached frame is produced from the dataset files
+LOADERS = {
+    "raw": _compacted(load_dataset),
+    "normalized": _compacted(load_normalized_dataset),
+}
+
+# Kind of a single normalized column cached on its own (see get_columns)
+COLUMN_KIND_PREFIX = "normalized:"
+
+
+class DatasetCache:
+    """
+    Process-wide LRU cache of parsed DataFrames.
+
+    Entries are keyed by the absolute file path plus its mtime and size, so a
+    file overwritten by a new upload misses the cache and its stale frame ages
+    out under the byte budget. Each file can be cached as several kinds of
+    frame ("raw" as parsed, "normalized" for the agent). Cached frames are
+    shared between callers and must be treated as read-only (copy before
+    mutating).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+        self._sizes: dict = {}
+        self._compaction: dict = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, filepath: str, kind: str = "raw") -> tuple:
+        stat = os.stat(filepath)
+        return (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size, kind)
+
+    def get(self, filepath: str, kind: str = "raw", loader: Optional[Callable[[str], pd.DataFrame]] = None) -> pd.DataFrame:
+        """
+        Return the `kind` frame for `filepath`, loading it on a miss with
+        `loader` (default: the LOADERS entry for `kind`).
+        """
+        key = self._key(filepath, kind)
+
+        with self._lock:
+            df = self._entries.get(key)
+            if df is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return df
+            self.misses += 1
+
+        # Parse outside the lock so other datasets stay readable meanwhile
+        df = (loader or LOADERS[kind])(filepath)
+        self.put(filepath, df, kind=kind, key=key)
+        return df
+
+    def put(self, filepath: str, df: pd.DataFrame, kind: str = "raw", key: Optional[tuple] = None):
+        """Store an already parsed frame (e.g. right after upload)."""
+        key = key or self._key(filepath, kind)
+        size = int(df.memory_usage(deep=True).sum())
+
+        if size > self.max_bytes:
+            print(f"[DatasetCache] {filepath} ({size} bytes) exceeds budget, not cached")
+            return
+
+        with self._lock:
+            self._drop(key)
+            # Drop older versions of the same file right away
+            for old_key in [k for k in self._entries if k[0] == key[0] and k[3] == kind]:
+                self._drop(old_key)
+
+            self._entries[key] = df
+            self._sizes[key] = size
+            self._compaction[key] = df.attrs.get(COMPACTION_ATTR)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def peek(self, filepath: str, kind: str = "raw") -> Optional[pd.DataFrame]:
+        """Cached `kind` frame for `filepath`, or None; never loads or counts."""
+        if not os.path.exists(filepath):
+            return None
+        with self._lock:
+            return self._entries.get(self._key(filepath, kind))
+
+    def get_columns(self, filepath: str, columns: list) -> pd.DataFrame:
+        """
+        Normalized frame of only `columns` of `filepath`, owned by the
+        caller. Sliced from the cached full frame when there is one;
+        otherwise every column is cached on its own and only the missing
+        ones are read from the Arrow copy.
+        """
+        full = self.peek(filepath, "normalized")
+        if full is not None:
+            with self._lock:
+                self.hits += 1
+            df = full[list(columns)]
+        elif not columns:
+            df = load_normalized_columns(filepath, [])
+        else:
+            parts, missing = {}, []
+            for col in columns:
+                key = self._key(filepath, COLUMN_KIND_PREFIX + col)
+                with self._lock:
+                    part = self._entries.get(key)
+                    if part is not None:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        parts[col] = part
+                    else:
+                        self.misses += 1
+                        missing.append(col)
+
+            if missing:
+                loaded = _compact(filepath, load_normalized_columns(filepath, missing))
+                for col in missing:
+                    parts[col] = loaded[[col]]
+                    self.put(filepath, parts[col], kind=COLUMN_KIND_PREFIX + col)
+            df = pd.concat([parts[col] for col in columns], axis=1)
+
+        df.attrs = {NORMALIZED_ATTR: True}
+        return df
+
+    def extend(self, filepath: str, new_filepath: str, rows_for: Callable[[str], pd.DataFrame]) -> list[str]:
+        """
+        Cache the frames of `new_filepath` as the cached frames of `filepath`
+        plus appended rows, without reloading either file. `rows_for(kind)`
+        returns the new rows prepared for that kind. Kinds not cached for
+        `filepath` are skipped (they load lazily as usual). Returns the
+        kinds that were extended.
+        """
+        extended = []
+        for kind in LOADERS:
+            df = self.peek(filepath, kind)
+            if df is None:
+                continue
+            combined = pd.concat([df, rows_for(kind)], ignore_index=True)
+            combined.attrs = {k: v for k, v in df.attrs.items() if k != COMPACTION_ATTR}
+            self.put(new_filepath, _compact(new_filepath, combined), kind=kind)
+            extended.append(kind)
+        return extended
+
+    def invalidate(self, filepath: str):
+        """Remove every cached version and kind of `filepath`."""
+        path = os.path.abspath(filepath)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._compaction.clear()
+            self.current_bytes = 0
+
+    def _drop(self, key: tuple):
+        if key in self._entries:
+            del self._entries[key]
+            self._compaction.pop(key, None)
+            self.current_bytes -= self._sizes.pop(key, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "datasets": [
+                    {
+                        "path": key[0],
+                        "kind": key[3],
+                        "bytes": self._sizes[key],
+                        "compaction": self._compaction.get(key),
+                    }
+                    for key in self._entries
+                ],
+            }
+
+
+dataset_cache = DatasetCache(max_bytes=DatasetCacheConfig().max_bytes)
@@ -0,0 +1,359 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
+
+from core.config import DatasetRegistryConfig
+from services.columnar_store import is_columnar_fresh, link_or_copy
+
+MANIFEST_NAME = "datasets.json"
+VERSION_ID_LENGTH = 16
+
+
+def version_id_for(sha256: str) -> str:
+    """Version ids are the leading hex digits of the content hash."""
+    return sha256[:VERSION_ID_LENGTH]
+
+
+def hash_file(filepath: str, chunk_bytes: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class DatasetVersion:
+    """One immutable, content-addressed upload of a dataset."""
+    filename: str
+    version_id: str
+    sha256: str
+    size: int
+    path: str
+    uploaded_at: str
+    # Upload summary (columns, preview, profile) so re-uploads skip parsing
+    info: dict = field(default_factory=dict)
+
+
+class VersionConflictError(Exception):
+    """The dataset's current version changed while a new one was being built."""
+
+
+@dataclass
+class RegisterResult:
+    version: DatasetVersion
+    # False when identical content was already stored (artifacts reused)
+    is_new_content: bool
+    # True when the filename already pointed at this exact version
+    is_unchanged: bool
+    # True when the version waits for ingestion before it can become current
+    is_pending: bool = False
+
+
+class DatasetRegistry:
+    """
+    Maps dataset filenames to content-addressed versions.
+
+    Each distinct upload is stored once under
+    <root>/objects/<version_id>/<filename> together with its sidecars
+    (Arrow copy, dialect, schema). The filename points at its current
+    version, so caches and agents keyed by version path/id are never
+    served stale data and identical re-uploads reuse everything.
+    Superseded versions beyond config.keep_versions are pruned whenever a
+    new version becomes current. Uploads that still have to be ingested
+    can be registered as pending and only become current via activate(),
+    so a failed ingest never leaves the filename on an unreadable version.
+    """
+
+    def __init__(self, root: str, config: DatasetRegistryConfig | None = None):
+        self.root = root
+        self.config = config or DatasetRegistryConfig()
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._datasets: dict = {}
+        self._load()
+
+    # -------------------------
+    # Manifest persistence
+    # -------------------------
+    def _load(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self._datasets = json.load(f)
+            # Ingest jobs do not outlive the process; such versions are
+            # plain superseded ones now and get pruned as usual
+            for entry in self._datasets.values():
+                entry.pop("pending", None)
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._datasets, f, default=str)
+        os.replace(tmp_path, self.manifest_path)
+
+    # -------------------------
+    # Paths
+    # -------------------------
+    def staging_path(self, filename: str) -> str:
+        """Where an upload is streamed before its hash is known."""
+        staging_dir = os.path.join(self.root, "staging")
+        os.makedirs(staging_dir, exist_ok=True)
+        return os.path.join(staging_dir, f"{uuid.uuid4().hex}-{filename}")
+
+    def object_path(self, version_id: str, filename: str) -> str:
+        return os.path.join(self.root, "objects", version_id, filename)
+
+    # -------------------------
+    # Lookup
+    # -------------------------
+    def _version_from_entry(self, filename: str, version_id: str) -> DatasetVersion | None:
+        entry = self._datasets.get(filename)
+        if not entry or version_id not in entry["versions"]:
+            return None
+        return DatasetVersion(**entry["versions"][version_id])
+
+    def resolve(self, filename: str, version_id: str | None = None) -> DatasetVersion | None:
+        """
+        Current (or a specific) version of `filename`. Files uploaded before
+        versioning existed are adopted in place on first lookup.
+        """
+        with self._lock:
+            entry = self._datasets.get(filename)
+            if entry:
+                return self._version_from_entry(filename, version_id or entry["current"])
+
+            legacy_path = os.path.join(self.root, filename)
+            if version_id is None and os.path.isfile(legacy_path):
+                return self._adopt_legacy(filename, legacy_path)
+        return None
+
+    def versions(self, filename: str) -> list[DatasetVersion]:
+        with self._lock:
+            entry = self._datasets.get(filename) or {"versions": {}}
+            return [DatasetVersion(**v) for v in entry["versions"].values()]
+
+    def _adopt_legacy(self, filename: str, legacy_path: str) -> DatasetVersion:
+        sha256 = hash_file(legacy_path)
+        version = DatasetVersion(
+            filename=filename,
+            version_id=version_id_for(sha256),
+            sha256=sha256,
+            size=os.path.getsize(legacy_path),
+            path=legacy_path,
+            uploaded_at=datetime.now(timezone.utc).isoformat(),
+        )
+        self._set_current(version)
+        return version
+
+    # -------------------------
+    # Registration
+    # -------------------------
+    def _find_by_sha(self, sha256: str) -> DatasetVersion | None:
+        for filename, entry in self._datasets.items():
+            for data in entry["versions"].values():
+                if data["sha256"] == sha256 and os.path.exists(data["path"]):
+                    return DatasetVersion(**data)
+        return None
+
+    def _set_current(self, version: DatasetVersion):
+        entry = self._datasets.setdefault(version.filename, {"current": None, "versions": {}})
+        entry["versions"][version.version_id] = asdict(version)
+        entry["current"] = version.version_id
+        if version.version_id in entry.get("pending", []):
+            entry["pending"].remove(version.version_id)
+        self._prune(version.filename)
+        self._save()
+
+    def _set_pending(self, version: DatasetVersion):
+        entry = self._datasets.setdefault(version.filename, {"current": None, "versions": {}})
+        entry["versions"][version.version_id] = asdict(version)
+        pending = entry.setdefault("pending", [])
+        if version.version_id not in pending:
+            pending.append(version.version_id)
+        self._save()
+
+    def _delete_files(self, versions: list[dict]):
+        """Delete the files of forgotten versions no other version still uses."""
+        in_use = {v["path"] for e in self._datasets.values() for v in e["versions"].values()}
+        objects_dir = os.path.abspath(os.path.join(self.root, "objects")) + os.sep
+        for data in versions:
+            path = data["path"]
+            if path in in_use or not os.path.abspath(path).startswith(objects_dir) or not os.path.exists(path):
+                continue
+            for artifact in _artifact_files(path):
+                os.remove(artifact)
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                # Still holds artifacts of the same content under other names
+                pass
+
+    def _prune(self, filename: str):
+        """
+        Forget the superseded versions of `filename` beyond keep_versions
+        and delete their files, unless another version still uses them.
+        Files outside <root>/objects (adopted legacy uploads) are kept.
+        """
+        entry = self._datasets.get(filename)
+        if not entry or self.config.keep_versions <= 0:
+            return
+        pending = entry.get("pending", [])
+        superseded = sorted(
+            (v for vid, v in entry["versions"].items() if vid != entry["current"] and vid not in pending),
+            key=lambda v: v["uploaded_at"], reverse=True,
+        )
+        pruned = superseded[max(0, self.config.keep_versions - 1):]
+        if not pruned:
+            return
+        for data in pruned:
+            del entry["versions"][data["version_id"]]
+        self._delete_files(pruned)
+        print(f"[DatasetRegistry] Pruned {len(pruned)} old versions of {filename}")
+
+    def register(self, filename: str, staged_path: str, sha256: str, size: int,
+                 activate: bool = True) -> RegisterResult:
+        """
+        Make the staged upload the current version of `filename`.
+
+        - Same content already current for this filename: no-op.
+        - Same content stored before (any filename): reuse its artifacts.
+        - New content: move the staged file into its version directory.
+        The staged file is always consumed. With activate=False a version
+        that still needs ingesting is only recorded as pending; call
+        activate() once it is ingested or discard() when that failed.
+        """
+        version_id = version_id_for(sha256)
+
+        with self._lock:
+            current = None
+            entry = self._datasets.get(filename)
+            if entry:
+                current = self._version_from_entry(filename, entry["current"])
+
+            if current and current.sha256 == sha256 and os.path.exists(current.path):
+                os.remove(staged_path)
+                return RegisterResult(version=current, is_new_content=False, is_unchanged=True)
+
+            path = self.object_path(version_id, filename)
+            existing = self._find_by_sha(sha256)
+
+            if existing and is_columnar_fresh(existing.path):
+                os.remove(staged_path)
+                if existing.filename == filename:
+                    path = existing.path
+                else:
+                    # Share the parsed artifacts under this filename too
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    for src in _artifact_files(existing.path):
+                        dst = path + src[len(existing.path):]
+                        if not os.path.exists(dst):
+                            link_or_copy(src, dst)
+                is_new_content = False
+            elif os.path.exists(path):
+                # Same content still being ingested: leave the file it reads alone
+                os.remove(staged_path)
+                is_new_content = True
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(staged_path, path)
+                is_new_content = True
+
+            version = DatasetVersion(
+                filename=filename,
+                version_id=version_id,
+                sha256=sha256,
+                size=size,
+                path=path,
+                uploaded_at=datetime.now(timezone.utc).isoformat(),
+                info=existing.info if existing and not is_new_content else {},
+            )
+            is_pending = not activate and (is_new_content or not version.info)
+            if is_pending:
+                self._set_pending(version)
+            else:
+                self._set_current(version)
+            return RegisterResult(version=version, is_new_content=is_new_content, is_unchanged=False,
+                                  is_pending=is_pending)
+
+    def activate(self, version: DatasetVersion) -> DatasetVersion | None:
+        """Make a registered (e.g. pending, now ingested) version current."""
+        with self._lock:
+            stored = self._version_from_entry(version.filename, version.version_id)
+            if stored is not None:
+                self._set_current(stored)
+            return stored
+
+    def discard(self, version: DatasetVersion):
+        """
+        Forget a pending version whose ingest failed and delete its files.
+        The current version is never discarded.
+        """
+        with self._lock:
+            entry = self._datasets.get(version.filename)
+            if not entry or version.version_id == entry["current"]:
+                return
+            if version.version_id in entry.get("pending", []):
+                entry["pending"].remove(version.version_id)
+            data = entry["versions"].pop(version.version_id, None)
+            if not entry["versions"]:
+                del self._datasets[version.filename]
+            if data is not None:
+                self._delete_files([data])
+            self._save()
+
+    def add_version(self, filename: str, path: str, sha256: str, size: int, info: dict,
+                    parent_version_id: str | None = None) -> DatasetVersion:
+        """
+        Record a version whose file was already written to
+        object_path(version_id_for(sha256), filename), e.g. by an append,
+        and make it current. With `parent_version_id` this is a
+        compare-and-set: VersionConflictError when the current version is
+        no longer the one the new version was built from.
+        """
+        version = DatasetVersion(
+            filename=filename,
+            version_id=version_id_for(sha256),
+            sha256=sha256,
+            size=size,
+            path=path,
+            uploaded_at=datetime.now(timezone.utc).isoformat(),
+            info=info,
+        )
+        with self._lock:
+            if parent_version_id is not None:
+                entry = self._datasets.get(filename)
+                current = entry["current"] if entry else None
+                if current != parent_version_id:
+                    raise VersionConflictError(
+                        f"{filename} changed while the new version was built "
+                        f"(current {current}, expected {parent_version_id})")
+            self._set_current(version)
+        return version
+
+    def update_info(self, version: DatasetVersion, info: dict):
+        """Store the upload summary for a version (columns, preview, profile)."""
+        with self._lock:
+            entry = self._datasets.get(version.filename)
+            if not entry or version.version_id not in entry["versions"]:
+                return
+            entry["versions"][version.version_id]["info"] = info
+            version.info = info
+            self._save()
+
+
+def _artifact_files(csv_path: str) -> list[str]:
+    """The CSV and every sidecar that shares its path prefix."""
+    folder, name = os.path.split(csv_path)
+    return [
+        os.path.join(folder, f)
+        for f in os.listdir(folder)
+        if f == name or (f.startswith(name + ".") and not f.endswith(".tmp"))
+    ]
+
+
+dataset_registry = DatasetRegistry(root="data")
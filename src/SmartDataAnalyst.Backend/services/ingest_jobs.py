@@ -0,0 +1,249 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from core.config import IngestConfig, IngestJobConfig
+from services.ingest_service import ingest_upload
+from utils.csv_dialect import CsvDialect
+
+# Finished jobs stay queryable this long
+JOB_RETENTION_SECONDS = 3600
+
+# Last event a worker sends for a job
+END_OF_EVENTS = "__end__"
+
+# Progress events put by worker processes (set by _init_worker)
+_events = None
+
+
+def _init_worker(events):
+    global _events
+    _events = events
+
+
+def _run_ingest(job_id: str, csv_path: str, dialect: CsvDialect, size: int, config: IngestConfig) -> dict:
+    """Runs in a worker process: build the artifacts, report progress."""
+    def progress(**event):
+        _events.put({"job_id": job_id, **event})
+
+    try:
+        return ingest_upload(csv_path, dialect, size, config, progress=progress, warm_cache=False)
+    finally:
+        # Queued after every progress event, so the parent sees them all first
+        progress(stage=END_OF_EVENTS)
+
+
+@dataclass
+class IngestJob:
+    job_id: str
+    filename: str
+    version_id: str
+    bytes_total: int
+    status: str = "queued"  # queued -> running -> done | failed
+    stage: str = "queued"
+    bytes_read: int = 0
+    rows_parsed: int = 0
+    error: Optional[str] = None
+    result: Optional[dict] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    # (version_id, path) the job builds artifacts for; see submit
+    _target: Optional[tuple] = field(default=None, repr=False)
+    # Completion needs both the worker's result and its last event
+    _outcome: Optional[tuple] = field(default=None, repr=False)
+    _events_done: bool = field(default=False, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "version_id": self.version_id,
+            "status": self.status,
+            "stage": self.stage,
+            "bytes_read": self.bytes_read,
+            "bytes_total": self.bytes_total,
+            "rows_parsed": self.rows_parsed,
+            "error": self.error,
+        }
+
+
+# Async callbacks run on the event loop that submitted the job
+JobCallback = Callable[[IngestJob], Awaitable[None]]
+
+
+class IngestJobManager:
+    """
+    Runs upload ingestion (parsing, normalization, columnar conversion) in
+    a process pool so large files never block the event loop. Workers put
+    progress events on a queue; a pump thread applies them to the job and
+    hands them to the submitter's on_progress callback on its loop.
+    A worker that dies (crash, OOM kill) breaks the pool: its jobs fail
+    and the next submit starts a new pool.
+    """
+
+    def __init__(self, config: IngestJobConfig | None = None):
+        self.config = config or IngestJobConfig()
+        self._jobs: dict[str, IngestJob] = {}
+        self._callbacks: dict[str, tuple] = {}
+        # (version_id, path) -> (job, done) of jobs not finished yet
+        self._inflight: dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._pool: ProcessPoolExecutor | None = None
+        self._events = None
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is not None:
+                return self._pool
+            ctx = multiprocessing.get_context(self.config.start_method)
+            self._events = ctx.Queue()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.config.max_workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self._events,),
+            )
+            threading.Thread(target=self._pump_events, args=(self._events,), name="ingest-events", daemon=True).start()
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        """Drop a pool broken by a dead worker; the next submit starts a new one."""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            events, self._pool, self._events = self._events, None, None
+        print("[IngestJobs] A worker process died; starting a new pool for later jobs")
+        pool.shutdown(wait=False, cancel_futures=True)
+        events.put(None)
+
+    def _pump_events(self, events):
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            job = self._jobs.get(event.pop("job_id"))
+            if job is None or job.status in ("done", "failed"):
+                continue
+            if event.get("stage") == END_OF_EVENTS:
+                job._events_done = True
+                self._maybe_complete(job)
+                continue
+            job.status = "running"
+            job.stage = event.get("stage", job.stage)
+            job.rows_parsed = event.get("rows_parsed", job.rows_parsed)
+            job.bytes_read = event.get("bytes_read", job.bytes_read)
+            self._dispatch(job, "progress")
+
+    def _dispatch(self, job: IngestJob, which: str):
+        loop, on_progress, on_done, done = self._callbacks.get(job.job_id, (None,) * 4)
+        if loop is None or loop.is_closed():
+            return
+        if which == "progress":
+            if on_progress is not None:
+                asyncio.run_coroutine_threadsafe(on_progress(job), loop)
+        else:
+            asyncio.run_coroutine_threadsafe(self._complete(job, on_done, done), loop)
+
+    @staticmethod
+    async def _complete(job: IngestJob, on_done: JobCallback | None, done: asyncio.Future):
+        try:
+            if on_done is not None:
+                await on_done(job)
+        finally:
+            if not done.done():
+                done.set_result(job)
+
+    def submit(self, filename: str, version_id: str, csv_path: str, dialect: CsvDialect, size: int,
+               ingest_config: IngestConfig | None = None,
+               on_progress: JobCallback | None = None, on_done: JobCallback | None = None) -> tuple[IngestJob, asyncio.Future]:
+        """
+        Queue ingestion of a stored upload. Must be called from a running
+        event loop; callbacks are scheduled on it. The returned future
+        resolves to the job once it finished and on_done has run. While a
+        job for the same version and path is unfinished, that job and its
+        future are returned instead (the callbacks given here are not
+        used), so two jobs never write the same artifacts.
+        """
+        target = (version_id, os.path.abspath(csv_path))
+        with self._lock:
+            inflight = self._inflight.get(target)
+        if inflight is not None:
+            print(f"[IngestJobs] {filename} ({version_id}) is already being ingested by job {inflight[0].job_id}")
+            return inflight
+
+        pool = self._ensure_pool()
+        loop = asyncio.get_running_loop()
+        job = IngestJob(job_id=uuid.uuid4().hex, filename=filename, version_id=version_id, bytes_total=size,
+                        _target=target)
+        done = loop.create_future()
+        with self._lock:
+            self._inflight[target] = (job, done)
+            cutoff = time.time() - JOB_RETENTION_SECONDS
+            for old_id in [j.job_id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+                del self._jobs[old_id]
+            self._jobs[job.job_id] = job
+            self._callbacks[job.job_id] = (loop, on_progress, on_done, done)
+
+        args = (_run_ingest, job.job_id, csv_path, dialect, size, ingest_config or IngestConfig())
+        try:
+            future = pool.submit(*args)
+        except BrokenProcessPool:
+            # Broken before its failed jobs reported back
+            self._reset_pool(pool)
+            pool = self._ensure_pool()
+            future = pool.submit(*args)
+        future.add_done_callback(lambda f: self._finish(job, f, pool))
+        return job, done
+
+    def _finish(self, job: IngestJob, future: Future, pool: ProcessPoolExecutor):
+        try:
+            job._outcome = (future.result(), None)
+        except BrokenProcessPool as e:
+            self._reset_pool(pool)
+            job._outcome = (None, f"Ingest worker process died (out of memory?): {e}")
+            job._events_done = True
+        except Exception as e:
+            # A crashed worker never sends its last event; don't wait for it
+            job._outcome = (None, str(e))
+            job._events_done = True
+        self._maybe_complete(job)
+
+    def _maybe_complete(self, job: IngestJob):
+        with self._lock:
+            if job._outcome is None or not job._events_done or job.finished_at is not None:
+                return
+            job.finished_at = time.time()
+            self._inflight.pop(job._target, None)
+
+        result, error = job._outcome
+        if error is None:
+            job.result = result
+            job.status, job.stage = "done", "done"
+            job.bytes_read = job.bytes_total
+            job.rows_parsed = result["profile"]["rows"]
+        else:
+            job.status, job.stage, job.error = "failed", "failed", error
+            print(f"[IngestJobs] Job {job.job_id} ({job.filename}) failed: {error}")
+        self._dispatch(job, "done")
+        with self._lock:
+            self._callbacks.pop(job.job_id, None)
+
+    def get(self, job_id: str) -> IngestJob | None:
+        return self._jobs.get(job_id)
+
+    def shutdown(self):
+        with self._lock:
+            pool, events, self._pool, self._events = self._pool, self._events, None, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+            events.put(None)
+
+
+ingest_jobs = IngestJobManager()
@@ -0,0 +1,267 @@
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+import pandas as pd
+import pyarrow as pa
+
+from core.config import IngestConfig
+from services.columnar_store import (
+    build_schema, build_zone_map, convert_to_columnar, read_columnar_head, save_dialect, write_columnar_chunks,
+    columnar_path, load_dataset, load_normalized_dataset
+)
+from services.readers import DEFAULT_FORMAT, detect_format
+from services.dataset_cache import dataset_cache
+from utils.csv_dialect import CsvDialect
+
+# Receives progress events as keyword arguments (stage, rows_parsed, bytes_read)
+ProgressCallback = Callable[..., None]
+
+# pandas dtype chosen for each kind of column evidence
+_KIND_DTYPES = {
+    "int": "int64",
+    "float": "float64",
+    "empty": "float64",
+    "bool": "bool",
+    "text": "object",
+}
+
+_KIND_ARROW_TYPES = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "empty": pa.float64(),
+    "bool": pa.bool_(),
+    "text": pa.string(),
+}
+
+
+def _series_kind(series: pd.Series) -> str:
+    if series.isna().all():
+        return "empty"
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    if pd.api.types.is_integer_dtype(series):
+        return "int"
+    if pd.api.types.is_float_dtype(series):
+        return "float"
+    return "text"
+
+
+def _scalar(value):
+    """numpy scalar -> Python scalar (JSON-serializable); others unchanged."""
+    return value.item() if hasattr(value, "item") else value
+
+
+def _merge_kinds(a: str, b: str) -> str:
+    """Widen two kinds the same way pandas would for a single full read."""
+    if a == b or b == "empty":
+        return a
+    if a == "empty":
+        return b
+    if {a, b} == {"int", "float"}:
+        return "float"
+    return "text"
+
+
+class DatasetProfile:
+    """
+    Column statistics accumulated chunk by chunk:
+    row count, per-column null counts, numeric min/max and dtype evidence.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns: dict[str, dict] = {}
+
+    def update(self, chunk: pd.DataFrame):
+        self.rows += len(chunk)
+
+        for col in chunk.columns:
+            series = chunk[col]
+            stats = self.columns.setdefault(col, {"kind": "empty", "nulls": 0, "min": None, "max": None})
+
+            stats["nulls"] += int(series.isna().sum())
+            stats["kind"] = _merge_kinds(stats["kind"], _series_kind(series))
+
+            if stats["kind"] in ("int", "float") and pd.api.types.is_numeric_dtype(series):
+                lo, hi = series.min(), series.max()
+                if pd.notna(lo):
+                    lo, hi = _scalar(lo), _scalar(hi)
+                    stats["min"] = lo if stats["min"] is None else min(stats["min"], lo)
+                    stats["max"] = hi if stats["max"] is None else max(stats["max"], hi)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DatasetProfile":
+        """Rebuild a profile from to_dict() output so it can keep updating."""
+        kinds = {dtype: kind for kind, dtype in _KIND_DTYPES.items() if kind != "empty"}
+        profile = cls()
+        profile.rows = data["rows"]
+        for col in data["columns"]:
+            empty = col["nulls"] == data["rows"] and col["dtype"] == "float64"
+            profile.columns[col["name"]] = {
+                "kind": "empty" if empty else kinds.get(col["dtype"], "text"),
+                "nulls": col["nulls"],
+                "min": col["min"],
+                "max": col["max"],
+            }
+        return profile
+
+    def dtypes(self) -> dict:
+        """pandas dtypes that reproduce a single full read of the file."""
+        return {col: _KIND_DTYPES[stats["kind"]] for col, stats in self.columns.items()}
+
+    def arrow_schema(self) -> pa.Schema:
+        return pa.schema([(col, _KIND_ARROW_TYPES[stats["kind"]]) for col, stats in self.columns.items()])
+
+    def to_dict(self) -> dict:
+        columns = []
+        for col, stats in self.columns.items():
+            numeric = stats["kind"] in ("int", "float")
+            columns.append({
+                "name": col,
+                "dtype": _KIND_DTYPES[stats["kind"]],
+                "nulls": stats["nulls"],
+                "min": stats["min"] if numeric else None,
+                "max": stats["max"] if numeric else None,
+            })
+        return {"rows": self.rows, "columns": columns}
+
+
+@dataclass
+class IngestResult:
+    columns: list
+    preview: list
+    profile: dict
+
+
+def _is_data_column(name) -> bool:
+    return not str(name).startswith("Unnamed")
+
+
+def _read_chunks(csv_path: str, dialect: CsvDialect, chunk_rows: int, dtype: dict | None = None,
+                 progress: ProgressCallback | None = None, stage: str = "parsing") -> Iterator[pd.DataFrame]:
+    rows = 0
+    with open(csv_path, "rb") as f:
+        reader = pd.read_csv(
+            f,
+            **dialect.read_csv_kwargs(),
+            usecols=_is_data_column,
+            dtype=dtype,
+            chunksize=chunk_rows,
+        )
+        with reader:
+            for chunk in reader:
+                rows += len(chunk)
+                if progress:
+                    # Position in the stored (possibly compressed) file
+                    progress(stage=stage, rows_parsed=rows, bytes_read=f.tell())
+                yield chunk.dropna(how="all", axis=0)
+
+
+def profile_csv(csv_path: str, dialect: CsvDialect, chunk_rows: int,
+                progress: ProgressCallback | None = None) -> DatasetProfile:
+    """First pass: collect statistics and dtype evidence for the whole file."""
+    profile = DatasetProfile()
+    for chunk in _read_chunks(csv_path, dialect, chunk_rows, progress=progress, stage="profiling"):
+        profile.update(chunk)
+    return profile
+
+
+def ingest_csv_chunked(csv_path: str, dialect: CsvDialect, config: IngestConfig | None = None,
+                       progress: ProgressCallback | None = None) -> IngestResult:
+    """
+    Out-of-core ingestion for CSVs that may not fit in memory.
+
+    Pass 1 profiles the file chunk by chunk. Pass 2 re-reads it with the
+    dtypes settled by the profile (so every chunk has the same schema)
+    and streams the chunks into the Arrow copy. Peak memory is one chunk.
+    """
+    config = config or IngestConfig()
+    profile = profile_csv(csv_path, dialect, config.chunk_rows, progress)
+
+    preview = []
+
+    def typed_chunks():
+        for chunk in _read_chunks(csv_path, dialect, config.chunk_rows, dtype=profile.dtypes(),
+                                  progress=progress, stage="writing"):
+            if len(preview) < 5:
+                preview.extend(chunk.head(5 - len(preview)).to_dict(orient="records"))
+            yield chunk
+
+    write_columnar_chunks(csv_path, typed_chunks(), profile.arrow_schema())
+
+    return IngestResult(
+        columns=list(profile.columns),
+        preview=preview,
+        profile=profile.to_dict(),
+    )
+
+
+def profile_columnar(csv_path: str) -> DatasetProfile:
+    """Profile a dataset batch by batch from its Arrow copy."""
+    profile = DatasetProfile()
+    with pa.memory_map(columnar_path(csv_path), "r") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            profile.update(reader.get_batch(i).to_pandas())
+    return profile
+
+
+def ingest_upload(csv_path: str, dialect: CsvDialect, size: int, config: IngestConfig | None = None,
+                  progress: ProgressCallback | None = None, warm_cache: bool = True) -> dict:
+    """
+    Build every artifact for a freshly stored upload (dialect sidecar,
+    Arrow copy, schema sidecar, zone map) and return its summary:
+    {"columns", "preview", "profile"}.
+    Non-CSV uploads (Parquet, Arrow, JSON Lines, Excel) go through the
+    reader for their format instead of the CSV parser.
+    `progress(stage=..., **counters)` is called as work advances.
+    `warm_cache=False` skips the shared dataset cache, for callers that
+    run in a worker process whose cache nobody reads.
+    """
+    config = config or IngestConfig()
+    progress = progress or (lambda **event: None)
+    fmt = detect_format(csv_path)
+    if fmt == DEFAULT_FORMAT:
+        save_dialect(csv_path, dialect)
+
+    # Parse the CSV once into its Arrow copy; later reads memory-map it
+    if size >= config.chunked_threshold_bytes:
+        # Large file: stream it in chunks, never holding the whole frame
+        if fmt == DEFAULT_FORMAT:
+            result = ingest_csv_chunked(csv_path, dialect, config, progress)
+            progress(stage="schema")
+            build_schema(csv_path)
+            progress(stage="zone map")
+            build_zone_map(csv_path)
+            return {"columns": result.columns, "preview": result.preview, "profile": result.profile}
+
+        progress(stage="parsing")
+        convert_to_columnar(csv_path)
+        progress(stage="schema")
+        build_schema(csv_path)
+        progress(stage="zone map")
+        build_zone_map(csv_path)
+        profile = profile_columnar(csv_path)
+        return {
+            "columns": list(profile.columns),
+            "preview": read_columnar_head(csv_path, 5).to_pandas().to_dict(orient="records"),
+            "profile": profile.to_dict(),
+        }
+
+    progress(stage="parsing")
+    convert_to_columnar(csv_path, dialect=dialect)
+    df = dataset_cache.get(csv_path) if warm_cache else load_dataset(csv_path)
+    progress(stage="normalizing", rows_parsed=len(df))
+    stats = DatasetProfile()
+    stats.update(df)
+    # Normalize once per upload; writes the schema sidecar
+    if warm_cache:
+        normalized = dataset_cache.get(csv_path, kind="normalized")
+    else:
+        normalized = load_normalized_dataset(csv_path)
+    build_zone_map(csv_path, normalized=normalized)
+    return {
+        "columns": list(df.columns),
+        "preview": df.head().to_dict(orient="records"),
+        "profile": stats.to_dict(),
+    }
@@ -0,0 +1,186 @@
+import os
+from concurrent.futures import Executor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from services.columnar_store import apply_stored_schema, columnar_path, convert_to_columnar, is_columnar_fresh, \
+    load_zone_map, read_columnar, read_columnar_batches, read_columnar_head, read_columnar_rows
+from services.dataset_cache import dataset_cache
+from services.secondary_indexes import secondary_indexes
+from utils.normalizer import NORMALIZED_ATTR
+from utils.pruning import compile_filter, filter_columns
+
+# frame.attrs key: how LazyDataset.load produced the frame (see load)
+SOURCE_ATTR = "lazy_dataset_source"
+
+
+def _own(view: pd.DataFrame, columns: list | None) -> pd.DataFrame:
+    """A copy of a slice of a cached frame (optionally only `columns`) that callers may modify."""
+    return view[columns] if columns is not None else view.copy()
+
+
+class LazyDataset:
+    """
+    A stored dataset (one upload, or the shards of a sharded dataset in
+    order) whose columns are read only when asked for. The agent builds
+    its prompt from head(), then loads just the columns the LLM plan
+    refers to. An optional rows_filter is evaluated once, on the columns
+    it names and the record batches its zone map allows, and every later
+    load keeps only the matching rows. `backend` tells the agent how to
+    run "rows" plans ("pandas" or "lazy", see services.query_plan).
+    """
+
+    def __init__(self, paths: list[str], rows_filter: str | None = None, executor: Executor | None = None,
+                 backend: str = "pandas"):
+        if not paths:
+            raise ValueError("LazyDataset needs at least one file")
+        self.paths = paths
+        self.rows_filter = rows_filter
+        self.backend = backend
+        self._executor = executor
+        self._columns = None
+        # Positions (in the concatenated files) of rows matching rows_filter
+        self._rows = None
+        if rows_filter:
+            self._rows = self._read(self._filter_columns(rows_filter), rows_filter).query(rows_filter).index
+
+    @property
+    def columns(self) -> list:
+        """Column names from the Arrow schema; no data is read."""
+        if self._columns is None:
+            path = self.paths[0]
+            if not is_columnar_fresh(path):
+                convert_to_columnar(path)
+            with pa.memory_map(columnar_path(path), "r") as source:
+                self._columns = list(pa.ipc.open_file(source).schema.names)
+        return self._columns
+
+    def _filter_columns(self, rows_filter: str) -> list | None:
+        names = filter_columns(rows_filter)
+        if names is None:
+            return None
+        return [col for col in self.columns if col in names]
+
+    def _read(self, columns: list | None, rows_filter: str | None = None) -> pd.DataFrame:
+        """
+        Normalized `columns` (None: all) of every file, concatenated and
+        indexed by row position. With `rows_filter`, only the rows that
+        secondary indexes return are read, or else the record batches whose
+        zone map shows they may match; the rows read are not filtered
+        further.
+        """
+        may_match = compile_filter(rows_filter) if rows_filter else None
+
+        def read(path):
+            if rows_filter:
+                positions = secondary_indexes.lookup(path, rows_filter, self.columns)
+                if positions is not None:
+                    print(f"[LazyDataset] {path}: {len(positions)} rows from secondary indexes")
+                    return self._read_positions(path, positions, columns)
+            if may_match is not None:
+                zones = load_zone_map(path)
+                batches = [i for i, zone in enumerate(zones) if may_match(zone["stats"])]
+                if len(batches) < len(zones):
+                    return self._read_batches(path, zones, batches, columns)
+            if columns is None:
+                return dataset_cache.get(path, kind="normalized").copy()
+            return dataset_cache.get_columns(path, columns)
+
+        if len(self.paths) == 1:
+            return read(self.paths[0])
+
+        mapper = self._executor.map if self._executor is not None else map
+        frames, offset = [], 0
+        for path, df in zip(self.paths, mapper(read, self.paths)):
+            frames.append(df.set_axis(df.index + offset, axis=0))
+            offset += read_columnar(path).num_rows
+        return pd.concat(frames)
+
+    @staticmethod
+    def _read_positions(path: str, positions, columns: list | None) -> pd.DataFrame:
+        """Rows at some positions, from the cached frame when there is one."""
+        cached = dataset_cache.peek(path, "normalized")
+        if cached is None:
+            return read_columnar_rows(path, positions, columns)
+        # Sorted positions without gaps (a range lookup on an ordered
+        # column) are a slice, not a gather
+        if len(positions) and positions[-1] - positions[0] + 1 == len(positions):
+            return _own(cached.iloc[positions[0]:positions[-1] + 1], columns)
+        df = cached.iloc[positions]
+        return df[columns] if columns is not None else df
+
+    @classmethod
+    def _read_batches(cls, path: str, zones: list, batches: list, columns: list | None) -> pd.DataFrame:
+        """Rows of some record batches."""
+        print(f"[LazyDataset] {path}: reading {len(batches)}/{len(zones)} record batches")
+        cached = dataset_cache.peek(path, "normalized")
+        if cached is None:
+            return read_columnar_batches(path, batches, columns)
+
+        # Runs of adjacent batches are sliced from the cached frame, which
+        # is much cheaper than gathering their rows one position at a time
+        starts = np.cumsum([0] + [zone["rows"] for zone in zones])
+        runs = []
+        for i in sorted(batches):
+            if runs and runs[-1][1] == starts[i]:
+                runs[-1][1] = starts[i + 1]
+            else:
+                runs.append([starts[i], starts[i + 1]])
+        if not runs:
+            return _own(cached.iloc[:0], columns)
+        parts = [cached.iloc[start:stop] for start, stop in runs]
+        if len(parts) == 1:
+            return _own(parts[0], columns)
+        df = pd.concat(parts)
+        return df[columns] if columns is not None else df
+
+    def load(self, columns: list | None = None, rows_filter: str | None = None) -> pd.DataFrame:
+        """
+        Normalized frame of `columns` (None: every column) restricted to
+        the rows matching the dataset's rows_filter. A `rows_filter` given
+        here only skips rows that cannot match it (secondary indexes, zone
+        maps); apply it to the result to get the matching rows. The frame
+        is the caller's to modify.
+        """
+        df = self._read(columns, rows_filter)
+        if self._rows is not None:
+            df = df[df.index.isin(self._rows)]
+        df.attrs[NORMALIZED_ATTR] = True
+        # Lets another process load the same frame instead of receiving it;
+        # frames derived from this one inherit attrs, hence the id
+        df.attrs[SOURCE_ATTR] = {
+            "paths": [os.path.abspath(p) for p in self.paths],
+            "rows_filter": self.rows_filter,
+            "columns": list(columns) if columns is not None else None,
+            "prune_filter": rows_filter,
+            "frame_id": id(df),
+            "rows": len(df),
+            "column_names": list(df.columns),
+        }
+        return df
+
+    def head(self, rows: int = 5) -> pd.DataFrame:
+        """First (matching) rows with every column, reading only those rows."""
+        if self._rows is None:
+            path = self.paths[0]
+            cached = dataset_cache.peek(path, "normalized")
+            if cached is not None:
+                return cached.head(rows)
+            if not is_columnar_fresh(path):
+                convert_to_columnar(path)
+            return apply_stored_schema(path, read_columnar_head(path, rows).to_pandas())
+
+        wanted = np.asarray(self._rows[:rows], dtype=np.int64)
+        frames, offset = [], 0
+        for path in self.paths:
+            count = read_columnar(path).num_rows
+            local = wanted[(wanted >= offset) & (wanted < offset + count)] - offset
+            if len(local):
+                frame = self._read_positions(path, local, None)
+                frames.append(frame.set_axis(frame.index + offset, axis=0))
+            offset += count
+        if not frames:
+            return self._read_positions(self.paths[0], np.array([], dtype=np.int64), None)
+        return pd.concat(frames) if len(frames) > 1 else frames[0]
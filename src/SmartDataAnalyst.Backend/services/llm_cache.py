@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from core.config import LLMCacheConfig
+
+MODES = ("off", "record", "replay")
+
+
+class LLMCacheMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+class LLMResponseCache:
+    """
+    Durable cache of LLM responses in an SQLite file, keyed by the hash of
+    the full request. One connection per process; the file is opened on
+    first use so importing the module touches nothing on disk.
+    """
+
+    def __init__(self, config: LLMCacheConfig | None = None):
+        self.config = config or LLMCacheConfig()
+        if self.config.mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode '{self.config.mode}' (expected one of {', '.join(MODES)})")
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(request: dict) -> str:
+        return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.config.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.config.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> str | None:
+        """Recorded response; in replay mode a miss raises LLMCacheMiss."""
+        if self.config.mode == "off":
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                if self.config.mode == "replay":
+                    raise LLMCacheMiss(f"No recorded LLM response for request {key[:12]} (LLM_CACHE_MODE=replay)")
+                return None
+            conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        if self.config.mode != "record" or not response:
+            return
+        size = len(response.encode())
+        if size > self.config.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now))
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if entries <= self.config.max_entries and total <= self.config.max_bytes:
+            return
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if entries <= self.config.max_entries and total <= self.config.max_bytes:
+                break
+            evicted.append((key,))
+            entries -= 1
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "mode": self.config.mode,
+            "path": self.config.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "max_entries": self.config.max_entries,
+            "max_bytes": self.config.max_bytes,
+        }
+        if self.config.mode != "off":
+            with self._lock:
+                entries, total = self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            stats.update(entries=entries, current_bytes=total)
+        return stats
+
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,216 @@
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from core.config import PlanCacheConfig
+from services.answer_cache import canonical_question
+from services.columnar_store import build_schema, load_schema
+from services.lazy_dataset import LazyDataset
+
+# Parts of an LLM JSON plan that are replayed
+PLAN_KEYS = ("action", "code", "rows_filter", "target_columns", "sql", "explain")
+
+_QUOTED = re.compile(r"'([^']*)'|\"([^\"]*)\"|`([^`]*)`")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_CAPITALIZED = re.compile(r"\b[A-Z][\w&.-]*")
+_NUMBER_WORDS = frozenset(
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+    "sixteen seventeen eighteen nineteen twenty thirty forty fifty sixty seventy eighty ninety "
+    "hundred thousand million billion half quarter first second third last".split()
+)
+
+
+def question_literals(question: str) -> tuple:
+    """
+    Values a plan bakes in: numbers (and number words), quoted strings and
+    capitalized names other than the first word. "Top 5 models by OpenAI"
+    -> ("5", "openai"). Sorted, so the order they appear in does not matter.
+    """
+    text = question or ""
+    literals = [next(g for g in m.groups() if g is not None).casefold() for m in _QUOTED.finditer(text)]
+    text = _QUOTED.sub(" ", text)
+    literals += _NUMBER.findall(text)
+    words = re.findall(r"[A-Za-z]+", text)
+    literals += [w.casefold() for w in words if w.casefold() in _NUMBER_WORDS]
+    first = re.match(r"\W*([\w&.-]+)", text)
+    literals += [
+        m.group().casefold() for m in _CAPITALIZED.finditer(text)
+        if m.group() != "I" and not (first and m.start() == first.start(1))
+    ]
+    return tuple(sorted(literals))
+
+
+def schema_fingerprint(df: pd.DataFrame | LazyDataset) -> str:
+    """Hash of the column names and kinds (stored schema, else dtypes)."""
+    if isinstance(df, LazyDataset):
+        columns = df.columns  # writes the Arrow copy when stale
+        kinds = load_schema(df.paths[0]) or build_schema(df.paths[0])
+        schema = [(col, kinds.get(col, "")) for col in columns]
+    else:
+        schema = [(str(col), str(dtype)) for col, dtype in df.dtypes.items()]
+    return hashlib.sha256(json.dumps(schema).encode()).hexdigest()[:16]
+
+
+@dataclass
+class CachedPlan:
+    question: str
+    fingerprint: str
+    plan: Dict[str, Any]
+    vector: np.ndarray
+    literals: tuple = ()
+    created_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+class SemanticPlanCache:
+    """
+    Process-wide cache of the JSON plans the LLM returned, with the
+    embedding of the question they answer and the schema fingerprint of
+    the dataset. A question about a dataset with the same schema whose
+    embedding is close enough to a cached one, and whose literals (numbers,
+    quoted values, names) are the same, gets that plan back, so it can be
+    run without asking the LLM: "top 5 models" never reuses the plan for
+    "top 10 models", however similar the embeddings. Least recently used
+    plans go first once max_entries is exceeded.
+
+    Embeddings come from memory.embedding_service.EmbeddingService, loaded
+    on first use; `embed` replaces it (text -> normalized vector). Without
+    sentence_transformers the cache stays empty.
+    """
+
+    def __init__(self, config: PlanCacheConfig | None = None, embed: Callable[[str], np.ndarray] | None = None):
+        self.config = config or PlanCacheConfig()
+        self._embed = embed
+        self._entries: "OrderedDict[tuple, CachedPlan]" = OrderedDict()
+        # fingerprint -> (keys, stacked vectors), rebuilt after changes
+        self._matrices: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.unavailable = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Lookups whose closest plan cleared the threshold but had other literals
+        self.literal_mismatches = 0
+        self.last_similarity = None
+
+    def embed(self, question: str) -> np.ndarray | None:
+        if self._embed is None and self.unavailable is None:
+            try:
+                from memory.embedding_service import EmbeddingService
+                self._embed = EmbeddingService(self.config.embedding_model).embed_text
+            except Exception as e:
+                self.unavailable = str(e)
+                print(f"[PlanCache] Embeddings unavailable, plan cache disabled: {e}")
+        if self._embed is None:
+            return None
+        vector = np.asarray(self._embed(canonical_question(question)), dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, question: str, fingerprint: str) -> tuple[Dict[str, Any] | None, np.ndarray | None]:
+        """
+        (plan, question embedding): a copy of the closest cached plan for
+        the schema with the same literals as the question, when it clears
+        the similarity threshold, else None. The embedding can be passed
+        on to add().
+        """
+        if not self.config.enabled:
+            return None, None
+        vector = self.embed(question)
+        if vector is None:
+            return None, None
+
+        literals = question_literals(question)
+        with self._lock:
+            keys, matrix = self._matrix(fingerprint)
+            best, similarity = None, None
+            if keys:
+                scores = matrix @ vector
+                close = scores >= self.config.similarity_threshold
+                same = np.array([self._entries[key].literals == literals for key in keys])
+                if close.any() and not (close & same).any():
+                    self.literal_mismatches += 1
+                if same.any():
+                    i = int(np.argmax(np.where(same, scores, -np.inf)))
+                    best, similarity = keys[i], float(scores[i])
+            self.last_similarity = similarity
+            if best is None or similarity < self.config.similarity_threshold:
+                self.misses += 1
+                return None, vector
+            entry = self._entries[best]
+            self._entries.move_to_end(best)
+            entry.hits += 1
+            self.hits += 1
+            print(f"[PlanCache] Plan hit ({similarity:.3f}): {question!r} ~ {entry.question!r}")
+            return copy.deepcopy(entry.plan), vector
+
+    def add(self, question: str, fingerprint: str, plan: Dict[str, Any], vector: np.ndarray | None = None):
+        if not self.config.enabled:
+            return
+        if vector is None:
+            vector = self.embed(question)
+            if vector is None:
+                return
+        plan = {k: copy.deepcopy(plan[k]) for k in PLAN_KEYS if k in plan}
+        key = (fingerprint, canonical_question(question))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = CachedPlan(question=key[1], fingerprint=fingerprint, plan=plan, vector=vector,
+                                            literals=question_literals(question))
+            self._matrices.pop(fingerprint, None)
+            while len(self._entries) > self.config.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._matrices.pop(evicted.fingerprint, None)
+                self.evictions += 1
+
+    def _matrix(self, fingerprint: str) -> tuple:
+        cached = self._matrices.get(fingerprint)
+        if cached is None:
+            keys = [key for key in self._entries if key[0] == fingerprint]
+            matrix = np.stack([self._entries[key].vector for key in keys]) if keys else None
+            cached = self._matrices[fingerprint] = (keys, matrix)
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.config.enabled,
+                "unavailable": self.unavailable,
+                "similarity_threshold": self.config.similarity_threshold,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "literal_mismatches": self.literal_mismatches,
+                "last_similarity": self.last_similarity,
+                "plans": [
+                    {
+                        "fingerprint": entry.fingerprint,
+                        "question": entry.question,
+                        "literals": list(entry.literals),
+                        "action": entry.plan.get("action"),
+                        "hits": entry.hits,
+                        "age_seconds": round(time.monotonic() - entry.created_at, 1),
+                    }
+                    for entry in self._entries.values()
+                ],
+            }
+
+
+plan_cache = SemanticPlanCache()
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, field, replace
+
+import pandas as pd
+
+from core.config import QueryPlanConfig
+from services.lazy_dataset import LazyDataset
+from utils.normalizer import NORMALIZED_ATTR
+from utils.pruning import filter_columns
+
+BACKENDS = ("pandas", "lazy")
+SETTINGS_NAME = "query_backends.json"
+
+config = QueryPlanConfig()
+
+
+@dataclass(frozen=True)
+class Op:
+    """
+    One step of a query plan:
+    - ("filter", expr): pandas query() expression
+    - ("select", columns)
+    - ("groupby", (keys, {column: aggregation}))
+    - ("sort", [(column, ascending), ...])
+    - ("limit", n)
+    - ("topk", (sort keys, n)): sort + limit, fused by the optimizer
+    """
+    kind: str
+    arg: object
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """
+    A lazy description of a query over a dataset. Building a plan reads
+    nothing; collect() optimizes it and reads only what the final result
+    needs: filters are pushed into the scan (zone maps, secondary
+    indexes), only referenced columns are loaded, repeated filters run
+    once and sort + limit become a top-k selection. collect_eager() runs
+    the same steps the way the pandas path does, for comparison.
+    """
+    ops: tuple = field(default_factory=tuple)
+
+    def _then(self, kind: str, arg) -> "QueryPlan":
+        return replace(self, ops=self.ops + (Op(kind, arg),))
+
+    def filter(self, expr: str) -> "QueryPlan":
+        return self._then("filter", expr)
+
+    def select(self, columns: list) -> "QueryPlan":
+        return self._then("select", tuple(columns))
+
+    def groupby(self, keys: list, aggregations: dict) -> "QueryPlan":
+        return self._then("groupby", (tuple(keys), tuple(aggregations.items())))
+
+    def sort(self, by: list, ascending: bool | list = True) -> "QueryPlan":
+        flags = ascending if isinstance(ascending, list) else [ascending] * len(by)
+        return self._then("sort", tuple(zip(by, flags)))
+
+    def limit(self, n: int) -> "QueryPlan":
+        return self._then("limit", int(n))
+
+    @classmethod
+    def from_llm_plan(cls, json_obj: dict) -> "QueryPlan | None":
+        """Plan for an LLM "rows" answer (rows_filter, target_columns), or None."""
+        if json_obj.get("action") != "rows":
+            return None
+        plan = cls()
+        rows_filter = json_obj.get("rows_filter")
+        if rows_filter:
+            if not isinstance(rows_filter, str):
+                return None
+            plan = plan.filter(rows_filter)
+        target = json_obj.get("target_columns") or []
+        if target:
+            if not isinstance(target, list):
+                return None
+            plan = plan.select(target)
+        return plan
+
+    # -------------------------
+    # Optimization
+    # -------------------------
+    def optimized(self) -> "QueryPlan":
+        ops = list(self.ops)
+
+        # Filters move ahead of projections and sorts (never past a
+        # groupby or limit, which change what they would see)
+        changed = True
+        while changed:
+            changed = False
+            for i in range(1, len(ops)):
+                if ops[i].kind == "filter" and ops[i - 1].kind in ("select", "sort"):
+                    ops[i - 1], ops[i] = ops[i], ops[i - 1]
+                    changed = True
+
+        fused = []
+        for op in ops:
+            prev = fused[-1] if fused else None
+            if op.kind == "filter" and prev is not None and prev.kind == "filter":
+                # Common subexpressions: a repeated condition runs once
+                parts = list(prev.arg) + [op.arg]
+                fused[-1] = Op("filter", tuple(dict.fromkeys(parts)))
+            elif op.kind == "filter":
+                fused.append(Op("filter", (op.arg,)))
+            elif op.kind == "select" and prev is not None and prev.kind == "select":
+                fused[-1] = op
+            elif op.kind == "limit" and prev is not None and prev.kind == "sort":
+                fused[-1] = Op("topk", (prev.arg, op.arg))
+            else:
+                fused.append(op)
+        return QueryPlan(ops=tuple(fused))
+
+    def required_columns(self, columns: list) -> list | None:
+        """
+        Dataset columns the plan reads (projection pushdown), or None when
+        its output keeps whole rows or a filter cannot be analysed.
+        """
+        known, needed = set(columns), set()
+        for op in self.ops:
+            if op.kind == "filter":
+                for expr in (op.arg if isinstance(op.arg, tuple) else (op.arg,)):
+                    names = filter_columns(expr)
+                    if names is None:
+                        return None
+                    needed |= names & known
+            elif op.kind == "select":
+                return [c for c in columns if c in needed | set(op.arg)]
+            elif op.kind == "groupby":
+                keys, aggregations = op.arg
+                needed |= set(keys) | {col for col, _ in aggregations}
+                return [c for c in columns if c in needed]
+            elif op.kind in ("sort", "topk"):
+                keys = op.arg[0] if op.kind == "topk" else op.arg
+                needed |= {col for col, _ in keys}
+        return None
+
+    # -------------------------
+    # Execution
+    # -------------------------
+    def collect(self, dataset: LazyDataset) -> pd.DataFrame:
+        """Optimize, then materialize only the final result."""
+        plan = self.optimized()
+        ops = list(plan.ops)
+
+        scan_filter = None
+        if ops and ops[0].kind == "filter":
+            scan_filter = " and ".join(f"({expr})" for expr in ops.pop(0).arg)
+
+        df = dataset.load(plan.required_columns(dataset.columns), rows_filter=scan_filter)
+        if scan_filter:
+            df = df.query(scan_filter)
+        for op in ops:
+            df = _apply(df, op, copy=False)
+        df.attrs[NORMALIZED_ATTR] = True
+        return df
+
+    def collect_eager(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Every step in order on the full frame, copying each result."""
+        for op in self.ops:
+            df = _apply(df, op, copy=True)
+        return df
+
+
+def _apply(df: pd.DataFrame, op: Op, copy: bool) -> pd.DataFrame:
+    if op.kind == "filter":
+        exprs = op.arg if isinstance(op.arg, tuple) else (op.arg,)
+        out = df.query(" and ".join(f"({e})" for e in exprs))
+    elif op.kind == "select":
+        out = df[list(op.arg)]
+    elif op.kind == "groupby":
+        keys, aggregations = op.arg
+        out = df.groupby(list(keys), observed=True).agg(dict(aggregations)).reset_index()
+    elif op.kind == "sort":
+        out = df.sort_values([c for c, _ in op.arg], ascending=[a for _, a in op.arg], kind="stable")
+    elif op.kind == "limit":
+        out = df.head(op.arg)
+    elif op.kind == "topk":
+        keys, n = op.arg
+        # One numeric key without nulls (sorted last): partial selection
+        # instead of a full sort
+        col, ascending = keys[0]
+        series = df[col]
+        if len(keys) == 1 and pd.api.types.is_numeric_dtype(series) \
+                and not pd.api.types.is_bool_dtype(series) and not series.hasnans:
+            out = df.nsmallest(n, col, keep="first") if ascending else df.nlargest(n, col, keep="first")
+        else:
+            out = _apply(df, Op("sort", keys), copy=False).head(n)
+    else:
+        raise ValueError(f"Unknown plan step: {op.kind}")
+    return out.copy() if copy else out
+
+
+class QueryBackendSettings:
+    """
+    Which backend runs "rows" plans for each dataset: "pandas" (eager,
+    the default) or "lazy" (QueryPlan.collect). Stored in
+    <root>/query_backends.json.
+    """
+
+    def __init__(self, root: str):
+        self.path = os.path.join(root, SETTINGS_NAME)
+        self._lock = threading.Lock()
+        self._backends: dict = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self._backends = json.load(f)
+
+    def get(self, filename: str) -> str:
+        return self._backends.get(filename, config.default_backend)
+
+    def set(self, filename: str, backend: str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown query backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+        with self._lock:
+            self._backends[filename] = backend
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._backends, f)
+            os.replace(tmp_path, self.path)
+
+
+query_backends = QueryBackendSettings(root="data")
@@ -0,0 +1,150 @@
+import importlib.util
+import os
+from typing import Callable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
+
+from core.config import ColumnarStoreConfig
+
+# Files that match no magic bytes or extension are read as CSV
+DEFAULT_FORMAT = "csv"
+ARROW_FILE_MAGIC = b"ARROW1"
+
+config = ColumnarStoreConfig()
+
+# {format: reader}. A reader turns a stored upload into a stream of Arrow
+# record batches, which the columnar store writes as the dataset's Arrow copy.
+READERS: dict[str, Callable[[str], pa.RecordBatchReader]] = {}
+# {format: check}. A check raises UnsupportedFormatError when the reader
+# cannot run here (e.g. an optional engine is missing), without reading.
+_CHECKS: dict[str, Callable[[str], None]] = {}
+_EXTENSIONS: dict[str, str] = {}
+_MAGIC: list[tuple[bytes, str]] = []
+
+
+class UnsupportedFormatError(Exception):
+    """Raised when a file cannot be read (unknown format or missing engine)."""
+
+
+def register_reader(fmt: str, reader: Callable[[str], pa.RecordBatchReader], extensions=(), magic=(),
+                    check: Callable[[str], None] | None = None):
+    """
+    Add (or replace) the reader for `fmt`. Detection tries the leading
+    `magic` bytes first, then the file `extensions` (with the dot).
+    `check` tells up front whether the reader can open a file here.
+    """
+    READERS[fmt] = reader
+    if check is not None:
+        _CHECKS[fmt] = check
+    for ext in extensions:
+        _EXTENSIONS[ext.lower()] = fmt
+    for prefix in magic:
+        _MAGIC.append((prefix, fmt))
+
+
+def detect_format(filepath: str) -> str:
+    """Format of a stored upload, from its magic bytes or extension."""
+    with open(filepath, "rb") as f:
+        head = f.read(8)
+    for prefix, fmt in _MAGIC:
+        if head.startswith(prefix):
+            return fmt
+    return _EXTENSIONS.get(os.path.splitext(filepath)[1].lower(), DEFAULT_FORMAT)
+
+
+def is_arrow_file(filepath: str) -> bool:
+    """True for Arrow IPC files, which can serve as the Arrow copy as they are."""
+    with open(filepath, "rb") as f:
+        return f.read(len(ARROW_FILE_MAGIC)) == ARROW_FILE_MAGIC
+
+
+def check_readable(filepath: str) -> str:
+    """
+    Format of a stored upload; raises UnsupportedFormatError when it
+    cannot be read here. Cheap enough for the request path.
+    """
+    fmt = detect_format(filepath)
+    if fmt not in READERS:
+        raise UnsupportedFormatError(f"No reader for format '{fmt}'")
+    if fmt in _CHECKS:
+        _CHECKS[fmt](filepath)
+    return fmt
+
+
+def open_batches(filepath: str, fmt: str | None = None) -> pa.RecordBatchReader:
+    fmt = fmt or detect_format(filepath)
+    if fmt not in READERS:
+        raise UnsupportedFormatError(f"No reader for format '{fmt}'")
+    return READERS[fmt](filepath)
+
+
+def frame_to_table(df: pd.DataFrame, schema: pa.Schema | None = None) -> pa.Table:
+    if schema is not None:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns (e.g. numbers and text) -> store as text
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == "object":
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _read_parquet(filepath: str) -> pa.RecordBatchReader:
+    """Row group by row group; the file is memory-mapped, not read up front."""
+    parquet = pq.ParquetFile(filepath, memory_map=True)
+    return pa.RecordBatchReader.from_batches(
+        parquet.schema_arrow, parquet.iter_batches(batch_size=config.batch_rows)
+    )
+
+
+def _read_arrow(filepath: str) -> pa.RecordBatchReader:
+    """Arrow IPC file or stream; batches point into the memory map."""
+    source = pa.memory_map(filepath, "r")
+    if not is_arrow_file(filepath):
+        return pa.ipc.open_stream(source)
+    reader = pa.ipc.open_file(source)
+    return pa.RecordBatchReader.from_batches(
+        reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    )
+
+
+def _read_jsonl(filepath: str) -> pa.RecordBatchReader:
+    try:
+        table = pa_json.read_json(filepath)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Arrow needs one type per field; pandas tolerates mixed values
+        table = frame_to_table(pd.read_json(filepath, lines=True))
+    return table.to_reader(max_chunksize=config.batch_rows)
+
+
+def _read_excel(filepath: str) -> pa.RecordBatchReader:
+    """First sheet; needs openpyxl (.xlsx) or xlrd (.xls)."""
+    try:
+        df = pd.read_excel(filepath)
+    except ImportError as e:
+        raise UnsupportedFormatError(f"Excel uploads need an Excel engine: {e}")
+    df = df.dropna(how="all", axis=0)
+    df = df.loc[:, ~df.columns.astype(str).str.contains("^Unnamed")]
+    return frame_to_table(df).to_reader(max_chunksize=config.batch_rows)
+
+
+def _check_excel(filepath: str):
+    """.xls files (OLE2 container) need xlrd, everything else openpyxl."""
+    with open(filepath, "rb") as f:
+        engine = "xlrd" if f.read(4) == b"\xd0\xcf\x11\xe0" else "openpyxl"
+    if importlib.util.find_spec(engine) is None:
+        raise UnsupportedFormatError(f"Excel uploads need an Excel engine: {engine} is not installed")
+
+
+register_reader("parquet", _read_parquet, extensions=(".parquet", ".pq"), magic=(b"PAR1",))
+register_reader("arrow", _read_arrow, extensions=(".arrow", ".feather", ".ipc"),
+                magic=(ARROW_FILE_MAGIC, b"\xff\xff\xff\xff"))
+register_reader("jsonl", _read_jsonl, extensions=(".jsonl", ".ndjson"))
+register_reader("excel", _read_excel, extensions=(".xlsx", ".xls"),
+                magic=(b"PK\x03\x04", b"\xd0\xcf\x11\xe0"), check=_check_excel)
@@ -0,0 +1,129 @@
+import os
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from core.config import SecondaryIndexConfig
+from services.dataset_cache import dataset_cache
+from utils.secondary_index import build_index, filter_usage, lookup
+
+
+class SecondaryIndexes:
+    """
+    Process-wide secondary indexes over dataset columns, built on demand.
+    Every rows_filter counts, per dataset file, how often each column is
+    filtered by equality (hash index) or by range (sorted index); once a
+    count reaches min_filter_count the index is built from the normalized
+    column and later filters are answered by lookup instead of a scan.
+    Indexes are keyed like cached frames (path, mtime, size), so a
+    rewritten file never uses a stale index.
+    """
+
+    def __init__(self, config: SecondaryIndexConfig | None = None):
+        self.config = config or SecondaryIndexConfig()
+        self._usage: dict = defaultdict(int)
+        self._indexes: "OrderedDict[tuple, object]" = OrderedDict()
+        self._sizes: dict = {}
+        self._unsuitable: set = set()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.lookups = 0
+        self.builds = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _file_key(filepath: str) -> tuple:
+        stat = os.stat(filepath)
+        return (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+
+    def lookup(self, filepath: str, expr: str, columns: list) -> np.ndarray | None:
+        """
+        Row positions of `filepath` that may match `expr` (apply the filter
+        to them for the exact rows), or None when no index helps yet.
+        """
+        if not self.config.enabled:
+            return None
+
+        file_key = self._file_key(filepath)
+        indexes = {}
+        for col, kind in filter_usage(expr):
+            if col not in columns:
+                continue
+            with self._lock:
+                self._usage[(file_key[0], col, kind)] += 1
+                due = self._usage[(file_key[0], col, kind)] >= self.config.min_filter_count
+            index = self._get(filepath, file_key + (col, kind), build=due)
+            if index is not None:
+                indexes.setdefault(col, []).append(index)
+
+        if not indexes:
+            return None
+        positions = lookup(expr, indexes)
+        if positions is not None:
+            with self._lock:
+                self.lookups += 1
+        return positions
+
+    def _get(self, filepath: str, key: tuple, build: bool):
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+            if not build or key in self._unsuitable:
+                return None
+
+        col, kind = key[-2:]
+        index = build_index(dataset_cache.get_columns(filepath, [col])[col], kind)
+        if index is None:
+            with self._lock:
+                self._unsuitable.add(key)
+            return None
+        print(f"[SecondaryIndexes] Built {kind} index on {filepath}:{col} ({index.nbytes} bytes)")
+        self._put(key, index)
+        return index
+
+    def _put(self, key: tuple, index):
+        if index.nbytes > self.config.max_bytes:
+            return
+        with self._lock:
+            # Drop indexes of older versions of the same file and column
+            for old_key in [k for k in self._indexes if k[0] == key[0] and k[3:] == key[3:]]:
+                self._drop(old_key)
+            self._indexes[key] = index
+            self._sizes[key] = index.nbytes
+            self.current_bytes += index.nbytes
+            self.builds += 1
+            while self.current_bytes > self.config.max_bytes and self._indexes:
+                self._drop(next(iter(self._indexes)))
+                self.evictions += 1
+
+    def _drop(self, key: tuple):
+        if key in self._indexes:
+            del self._indexes[key]
+            self.current_bytes -= self._sizes.pop(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._sizes.clear()
+            self._usage.clear()
+            self._unsuitable.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "indexes": [
+                    {"file": k[0], "column": k[3], "kind": k[4], "bytes": self._sizes[k]} for k in self._indexes
+                ],
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.config.max_bytes,
+                "lookups": self.lookups,
+                "builds": self.builds,
+                "evictions": self.evictions,
+            }
+
+
+secondary_indexes = SecondaryIndexes()
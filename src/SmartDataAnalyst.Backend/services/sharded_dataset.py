@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+
+from core.config import ShardConfig
+from services.columnar_store import build_schema, load_schema, load_zone_map
+from services.dataset_registry import DatasetVersion
+from services.lazy_dataset import LazyDataset
+from utils.pruning import compile_filter, merge_stats
+
+MANIFEST_NAME = "sharded.json"
+
+config = ShardConfig()
+_executor: ThreadPoolExecutor | None = None
+
+
+class ShardMismatchError(Exception):
+    """A shard's columns or column kinds differ from the rest of its dataset."""
+
+
+# Stored schema kinds that load as the same dtype family once normalized
+_KIND_FAMILIES = {"int": "number", "float": "number", "datetime": "datetime", "datetime_s": "datetime",
+                  "datetime_ms": "datetime", "text": "text"}
+
+
+def _kind_families(path: str) -> dict:
+    schema = load_schema(path) or build_schema(path)
+    return {col: _KIND_FAMILIES.get(kind, kind) for col, kind in schema.items()}
+
+
+@dataclass
+class ShardInfo:
+    """One part file of a sharded dataset plus the statistics used for pruning."""
+    name: str
+    version_id: str
+    path: str
+    rows: int
+    columns: list
+    # column_stats() of the normalized shard
+    stats: dict
+
+
+def shard_filename(dataset: str, name: str) -> str:
+    """Registry filename of a shard, so each shard is versioned like any upload."""
+    return f"{dataset}/{name}"
+
+
+def compute_shard_stats(path: str) -> dict:
+    """
+    Min/max/null statistics of a stored shard: its zone map (computed
+    batch by batch on normalized values) merged into one entry per column.
+    """
+    stats = None
+    for zone in load_zone_map(path):
+        stats = zone["stats"] if stats is None else merge_stats(stats, zone["stats"])
+    return stats or {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        workers = config.max_workers or os.cpu_count() or 1
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shards")
+    return _executor
+
+
+class ShardedDatasetRegistry:
+    """
+    Logical datasets made of many part files ("shards"). Every shard is a
+    regular registered upload (own Arrow copy, schema, cache entries); the
+    manifest <root>/sharded.json lists them with their statistics.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._datasets: dict = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self._datasets = json.load(f)
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._datasets, f, default=str)
+        os.replace(tmp_path, self.manifest_path)
+
+    def exists(self, dataset: str) -> bool:
+        return dataset in self._datasets
+
+    def shards(self, dataset: str) -> list[ShardInfo]:
+        with self._lock:
+            entry = self._datasets.get(dataset) or {"shards": {}}
+            return [ShardInfo(**s) for s in entry["shards"].values()]
+
+    def version_id(self, dataset: str) -> str | None:
+        """Changes whenever a shard is added or replaced."""
+        shards = self.shards(dataset)
+        if not shards:
+            return None
+        digest = hashlib.sha256()
+        for shard in sorted(shards, key=lambda s: s.name):
+            digest.update(f"{shard.name}:{shard.version_id};".encode())
+        return digest.hexdigest()[:16]
+
+    def add_shard(self, dataset: str, name: str, version: DatasetVersion) -> ShardInfo:
+        """
+        Add or replace shard `name` with an ingested version. Its columns
+        and their stored kinds must match the other shards (ints next to
+        floats, or differently encoded dates, still match).
+        """
+        columns = list(version.info.get("columns") or [])
+        rows = (version.info.get("profile") or {}).get("rows", 0)
+
+        with self._lock:
+            entry = self._datasets.setdefault(dataset, {"shards": {}})
+            others = [s for key, s in entry["shards"].items() if key != name]
+            if others and others[0]["columns"] != columns:
+                raise ShardMismatchError(
+                    f"Shard {name} columns {columns} differ from dataset columns {others[0]['columns']}"
+                )
+
+        if others:
+            kinds, expected = _kind_families(version.path), _kind_families(others[0]["path"])
+            differing = {col: (kinds.get(col), expected.get(col)) for col in columns
+                         if kinds.get(col) != expected.get(col)}
+            if differing:
+                details = ", ".join(f"{col}: {got} (dataset: {want})" for col, (got, want) in differing.items())
+                raise ShardMismatchError(f"Shard {name} column kinds differ from the dataset ({details})")
+
+        shard = ShardInfo(
+            name=name,
+            version_id=version.version_id,
+            path=version.path,
+            rows=rows,
+            columns=columns,
+            stats=compute_shard_stats(version.path),
+        )
+        with self._lock:
+            self._datasets[dataset]["shards"][name] = asdict(shard)
+            self._save()
+        return shard
+
+
+def prune_shards(shards: list[ShardInfo], rows_filter: str | None) -> list[ShardInfo]:
+    """Shards whose statistics show they may hold rows matching rows_filter."""
+    if not rows_filter:
+        return shards
+    may_match = compile_filter(rows_filter)
+    return [s for s in shards if may_match(s.stats)]
+
+
+def open_sharded(registry: ShardedDatasetRegistry, dataset: str, rows_filter: str | None = None) -> LazyDataset:
+    """
+    A sharded dataset as one table. Shards that cannot match `rows_filter`
+    are skipped; the rest are read concurrently, and columns only when the
+    returned dataset is asked for them (see LazyDataset).
+    """
+    shards = registry.shards(dataset)
+    if not shards:
+        raise KeyError(dataset)
+
+    # Pruned shards hold no matching rows, so shard 0 stands in for none
+    selected = prune_shards(shards, rows_filter) or shards[:1]
+    print(f"[Shards] {dataset}: opening {len(selected)}/{len(shards)} shards")
+    return LazyDataset([s.path for s in selected], rows_filter=rows_filter, executor=_get_executor())
+
+
+sharded_registry = ShardedDatasetRegistry(root="data")
@@ -0,0 +1,147 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pa_dataset
+
+from core.config import SqlConfig
+from services.columnar_store import columnar_path, convert_to_columnar, is_columnar_fresh, load_schema
+from services.lazy_dataset import LazyDataset
+
+try:
+    import duckdb
+except ImportError:  # optional: only needed for the agent's "sql" action
+    duckdb = None
+
+# Name of the dataset in the LLM's SQL, as in its pandas code
+TABLE_NAME = "df"
+_SOURCE_NAME = "__source__"
+
+# Non-ISO formats tried after a plain cast, month-first like pd.to_datetime
+_DATE_FORMATS = ["%m/%d/%Y", "%d/%m/%Y", "%Y/%m/%d", "%Y.%m.%d", "%d.%m.%Y", "%d-%m-%Y"]
+
+config = SqlConfig()
+
+
+class SqlError(Exception):
+    """Raised for SQL that cannot run (engine missing, not a single SELECT, query error)."""
+
+
+def is_available() -> bool:
+    return duckdb is not None and config.enabled
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _column_sql(name: str, arrow_type: pa.DataType, kind: str | None) -> str:
+    """
+    SQL for one column of the normalized view: the stored schema kind
+    applied to the raw Arrow value, like the normalizer does in pandas
+    (trim, drop thousands separators, empty -> NULL, then convert).
+    """
+    col = _quote(name)
+    if kind is None:
+        return col
+
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        cleaned = f"NULLIF(replace(trim({col}), ',', ''), '')"
+        if kind == "int":
+            return f"TRY_CAST({cleaned} AS BIGINT)"
+        if kind == "float":
+            return f"TRY_CAST({cleaned} AS DOUBLE)"
+        if kind == "datetime_s":
+            return f"to_timestamp(TRY_CAST({cleaned} AS DOUBLE))"
+        if kind == "datetime_ms":
+            return f"epoch_ms(TRY_CAST({cleaned} AS BIGINT))"
+        if kind == "datetime":
+            formats = ", ".join(f"'{f}'" for f in _DATE_FORMATS)
+            return f"COALESCE(TRY_CAST({cleaned} AS TIMESTAMP), try_strptime({cleaned}, [{formats}]))"
+        return cleaned
+
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        if kind == "datetime_s":
+            return f"to_timestamp({col})"
+        if kind == "datetime_ms":
+            return f"epoch_ms(CAST({col} AS BIGINT))"
+    if kind == "text":
+        return f"CAST({col} AS VARCHAR)"
+    return col
+
+
+def normalized_view_sql(schema: pa.Schema, kinds: dict) -> str:
+    """SELECT over the raw Arrow source that yields the normalized columns."""
+    columns = [f"{_column_sql(f.name, f.type, kinds.get(f.name))} AS {_quote(f.name)}" for f in schema]
+    return f"SELECT {', '.join(columns)} FROM {_SOURCE_NAME}"
+
+
+def _connect():
+    con = duckdb.connect()
+    if config.threads:
+        con.execute(f"SET threads = {int(config.threads)}")
+    if config.memory_limit:
+        con.execute("SET memory_limit = ?", [config.memory_limit])
+    if config.temp_directory:
+        con.execute("SET temp_directory = ?", [config.temp_directory])
+    return con
+
+
+def _register(con, source):
+    """Expose the dataset as view `df` (normalized values)."""
+    if isinstance(source, pd.DataFrame):
+        con.register(TABLE_NAME, source)
+        return
+
+    if source.rows_filter:
+        # Only the matching rows may be seen; they are filtered in pandas
+        con.register(TABLE_NAME, source.load())
+        return
+
+    for path in source.paths:
+        if not is_columnar_fresh(path):
+            convert_to_columnar(path)
+    # Scanned straight from the memory-mapped Arrow copies: DuckDB pushes
+    # the columns (and simple filters) it needs down into the scan
+    arrow = pa_dataset.dataset([columnar_path(p) for p in source.paths], format="ipc")
+    con.register(_SOURCE_NAME, arrow)
+    con.execute(f"CREATE VIEW {TABLE_NAME} AS {normalized_view_sql(arrow.schema, load_schema(source.paths[0]) or {})}")
+
+
+def run_sql(source: LazyDataset | pd.DataFrame, sql: str) -> pd.DataFrame:
+    """
+    Run one SELECT statement of the LLM against the dataset, visible as
+    table `df`, on an in-process DuckDB (vectorized, multi-threaded,
+    spilling to disk under memory_limit). The connection cannot touch
+    files or the network. Returns at most max_rows rows.
+    """
+    if not is_available():
+        raise SqlError("SQL execution needs the 'duckdb' package")
+
+    sql = (sql or "").strip().rstrip(";").strip()
+    con = _connect()
+    try:
+        try:
+            statements = con.extract_statements(sql)
+        except duckdb.Error as e:
+            raise SqlError(str(e)) from e
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise SqlError("Only a single SELECT statement is allowed")
+
+        _register(con, source)
+        con.execute("SET enable_external_access = false")
+        con.execute("SET lock_configuration = true")
+        try:
+            result = con.execute(sql)
+            # to_arrow_reader replaced fetch_record_batch in newer DuckDB
+            fetch = getattr(result, "to_arrow_reader", None) or result.fetch_record_batch
+            reader = fetch(config.max_rows)
+            batches, rows = [], 0
+            for batch in reader:
+                batches.append(batch)
+                rows += batch.num_rows
+                if rows >= config.max_rows:
+                    break
+        except duckdb.Error as e:
+            raise SqlError(str(e)) from e
+        return pa.Table.from_batches(batches, schema=reader.schema).slice(0, config.max_rows).to_pandas()
+    finally:
+        con.close()
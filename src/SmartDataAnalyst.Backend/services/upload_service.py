@@ -0,0 +1,102 @@
+import hashlib
+import os
+from dataclasses import dataclass
+
+from fastapi import UploadFile
+
+from core.config import UploadConfig
+from utils.compression import StreamDecompressor, detect_compression
+from utils.csv_dialect import CsvDialect, sniff_dialect
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload stream goes past the configured maximum size."""
+
+
+@dataclass
+class UploadResult:
+    filepath: str
+    # Bytes as uploaded (and stored); the hash covers these
+    size: int
+    sha256: str
+    dialect: CsvDialect
+    # Decompressed bytes; equals size for plain uploads
+    raw_size: int = 0
+
+
+def _check_size(size: int, max_bytes: int):
+    if max_bytes and size > max_bytes:
+        raise UploadTooLargeError(f"Upload exceeds maximum size of {max_bytes} bytes")
+
+
+async def stream_upload_to_disk(file: UploadFile, filepath: str, config: UploadConfig | None = None) -> UploadResult:
+    """
+    Copy an upload to disk in fixed-size chunks so memory stays bounded
+    by one chunk regardless of file size.
+    - gzip/bz2/zstd uploads (detected by magic bytes) are stored as sent;
+      they are decompressed incrementally while streaming only to sniff,
+      validate and measure them, so no plaintext copy is ever written.
+    - Sniffs the CSV dialect (encoding, delimiter, quoting, decimal,
+      header) from the first sample_bytes of (decompressed) content.
+    - Hashes the content while streaming (no second read of the file).
+    - Aborts as soon as max_bytes is exceeded, compressed or decompressed.
+    Data goes to a temp file that only replaces `filepath` once complete,
+    so a rejected upload never clobbers an existing dataset.
+    """
+    config = config or UploadConfig()
+    tmp_path = filepath + ".part"
+    digest = hashlib.sha256()
+    size = 0
+    raw_size = 0
+    decompressor = None
+    compression = None
+    sample = b""
+    dialect = None
+
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(config.chunk_bytes)
+                if not chunk:
+                    break
+
+                if size == 0:
+                    compression = detect_compression(chunk)
+                    if compression:
+                        decompressor = StreamDecompressor(compression)
+
+                size += len(chunk)
+                _check_size(size, config.max_bytes)
+
+                pieces = decompressor.feed(chunk) if decompressor else [chunk]
+                for piece in pieces:
+                    raw_size += len(piece)
+                    _check_size(raw_size, config.max_bytes)
+                    if dialect is None and len(sample) < config.sample_bytes:
+                        sample += piece[:config.sample_bytes - len(sample)]
+
+                if dialect is None and len(sample) >= config.sample_bytes:
+                    dialect = sniff_dialect(sample)
+
+                digest.update(chunk)
+                out.write(chunk)
+
+        if decompressor:
+            decompressor.finish()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if dialect is None:
+        dialect = sniff_dialect(sample) if sample else CsvDialect()
+    dialect.compression = compression
+
+    os.replace(tmp_path, filepath)
+    return UploadResult(
+        filepath=filepath,
+        size=size,
+        sha256=digest.hexdigest(),
+        dialect=dialect,
+        raw_size=raw_size,
+    )
@@ -0,0 +1,42 @@
+import pandas as pd
+from core.config import AnswerCacheConfig
+from services import answer_cache as answer_cache_module
+from services.answer_cache import AnswerCache, canonical_question
+
+
+def test_canonical_question_folds_case_whitespace_and_punctuation():
+    assert canonical_question("  How many   models, per developer?! ") == "how many models per developer"
+
+
+def test_canonical_question_keeps_numeric_punctuation():
+    questions = ["Rows with growth above 5", "Rows with growth above -5", "Rows with growth above 5%",
+                 "Rows with growth above 1.5", "Rows with growth above 15", "Rows with growth above 1,5"]
+    assert len({canonical_question(q) for q in questions}) == len(questions)
+    assert canonical_question("Growth above -5.5%?") == "growth above -5.5%"
+    assert canonical_question("Sales, 2023 - 2024.") == "sales 2023 2024"
+    assert AnswerCache.key("v1", "Top 5 models?") == AnswerCache.key("v1", "top 5  MODELS")
+    assert AnswerCache.key("v1", "Top 5 models") != AnswerCache.key("v2", "Top 5 models")
+    assert AnswerCache.key("v1", "q", rows_filter="year > 2020") != AnswerCache.key("v1", "q")
+
+
+def test_hits_ttl_and_eviction(monkeypatch):
+    cache = AnswerCache(AnswerCacheConfig(ttl_seconds=60, max_entries=2, max_bytes=1024 * 1024))
+    rows = pd.DataFrame({"model": ["a", "b"]})
+    cache.put(AnswerCache.key("v1", "q1"), "answer 1", rows)
+    cache.put(AnswerCache.key("v1", "q2"), "answer 2")
+
+    entry = cache.get(AnswerCache.key("v1", "Q1?"))
+    assert entry.answer == "answer 1" and entry.context_rows is rows
+    cache.get(AnswerCache.key("v1", "q1"))
+    assert [a["hits"] for a in cache.stats()["answers"]] == [0, 2]
+
+    # q2 is the least recently used
+    cache.put(AnswerCache.key("v1", "q3"), "answer 3")
+    assert cache.get(AnswerCache.key("v1", "q2")) is None
+    assert cache.stats()["evictions"] == 1
+
+    now = answer_cache_module.time.monotonic()
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: now + 61)
+    assert cache.get(AnswerCache.key("v1", "q1")) is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["hits"] == 2 and stats["misses"] == 2
@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+from services.append_service import AppendValidationError, append_rows
+from services.columnar_store import read_columnar, read_csv_file
+from services.dataset_cache import dataset_cache
+from services.dataset_registry import DatasetRegistry, VersionConflictError, hash_file
+from services.ingest_service import ingest_upload
+from utils.compression import compress
+from utils.csv_dialect import CsvDialect, sniff_file
+
+
+def _upload(registry, filename, df):
+    staged = registry.staging_path(filename)
+    df.to_csv(staged, index=False)
+    version = registry.register(filename, staged, hash_file(staged), os.path.getsize(staged)).version
+    registry.update_info(version, ingest_upload(version.path, CsvDialect(), version.size))
+    return version
+
+
+def _rows_file(tmp_path, df):
+    path = str(tmp_path / "rows.csv")
+    df.to_csv(path, index=False)
+    return path, sniff_file(path)
+
+
+def test_append_extends_store_cache_and_profile(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path / "data"))
+    version = _upload(registry, "sales.csv", pd.DataFrame({"id": [1, 2], "amount": ["1,000", "2.5"], "city": ["a", "b"]}))
+
+    rows_path, dialect = _rows_file(tmp_path, pd.DataFrame({"city": ["c"], "id": [3], "amount": ["7"]}))
+    result = append_rows(registry, version, rows_path, dialect)
+    new = result.version
+
+    assert result.appended_rows == 1
+    assert registry.resolve("sales.csv").version_id == new.version_id
+    # CSV, Arrow copy and profile agree with a fresh parse of the new file
+    assert new.sha256 == hash_file(new.path)
+    full = read_csv_file(new.path)
+    assert read_columnar(new.path).to_pandas().equals(full)
+    assert new.info["profile"]["rows"] == 3
+    ids = next(c for c in new.info["profile"]["columns"] if c["name"] == "id")
+    assert ids["max"] == 3
+
+    # Cached frames moved to the new version without reloading
+    assert set(result.cache_kinds) == {"raw", "normalized"}
+    misses = dataset_cache.misses
+    normalized = dataset_cache.get(new.path, kind="normalized")
+    assert dataset_cache.misses == misses
+    assert normalized["amount"].tolist() == [1000.0, 2.5, 7.0]
+
+
+def test_append_rejects_rows_that_break_the_schema(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path / "data"))
+    version = _upload(registry, "s.csv", pd.DataFrame({"id": [1, 2], "when": ["2024-01-01", "2024-02-01"]}))
+
+    rows_path, dialect = _rows_file(tmp_path, pd.DataFrame({"id": ["x"], "when": ["2024-03-01"]}))
+    with pytest.raises(AppendValidationError, match="id"):
+        append_rows(registry, version, rows_path, dialect)
+
+    rows_path, dialect = _rows_file(tmp_path, pd.DataFrame({"id": [3]}))
+    with pytest.raises(AppendValidationError, match="missing"):
+        append_rows(registry, version, rows_path, dialect)
+
+    assert registry.resolve("s.csv").version_id == version.version_id
+
+
+def test_append_to_compressed_dataset_adds_a_member(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path / "data"))
+    staged = registry.staging_path("z.csv.gz")
+    with open(staged, "wb") as f:
+        f.write(compress(b"id,name\n1,a\n2,b", "gzip"))
+    version = registry.register("z.csv.gz", staged, hash_file(staged), os.path.getsize(staged)).version
+    registry.update_info(version, ingest_upload(version.path, sniff_file(version.path), 100))
+
+    rows_path, dialect = _rows_file(tmp_path, pd.DataFrame({"id": [3], "name": ["c"]}))
+    new = append_rows(registry, version, rows_path, dialect).version
+
+    assert read_csv_file(new.path)["id"].tolist() == [1, 2, 3]
+    assert new.info["profile"]["rows"] == 3
+
+
+def test_concurrent_appends_keep_every_row(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path / "data"))
+    version = _upload(registry, "c.csv", pd.DataFrame({"id": [0]}))
+    batches = []
+    for i in range(1, 5):
+        path = str(tmp_path / f"rows{i}.csv")
+        pd.DataFrame({"id": [i]}).to_csv(path, index=False)
+        batches.append((path, sniff_file(path)))
+
+    # Every request saw the same parent version
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda b: append_rows(registry, version, *b), batches))
+
+    current = registry.resolve("c.csv")
+    assert sorted(read_csv_file(current.path)["id"].tolist()) == [0, 1, 2, 3, 4]
+    assert current.info["profile"]["rows"] == 5
+    assert len({r.previous_version_id for r in results}) == 4
+
+
+def test_add_version_rejects_a_stale_parent(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path / "data"))
+    first = _upload(registry, "p.csv", pd.DataFrame({"id": [1]}))
+    second = _upload(registry, "p.csv", pd.DataFrame({"id": [2]}))
+
+    with pytest.raises(VersionConflictError):
+        registry.add_version("p.csv", second.path, second.sha256, second.size, second.info,
+                             parent_version_id=first.version_id)
+    assert registry.resolve("p.csv").version_id == second.version_id
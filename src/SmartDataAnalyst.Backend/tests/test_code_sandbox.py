@@ -0,0 +1,134 @@
+import asyncio
+import os
+import pandas as pd
+import pytest
+from core.config import SandboxConfig
+from services import code_sandbox as code_sandbox_module
+from services.code_sandbox import CodeError, CodeSandbox, SandboxError
+from services.lazy_dataset import LazyDataset
+
+
+@pytest.fixture
+def sandbox():
+    sandbox = CodeSandbox(SandboxConfig(workers=1, start_method="spawn", timeout_seconds=30))
+    yield sandbox
+    sandbox.shutdown()
+
+
+def frame():
+    return pd.DataFrame({
+        "dev": pd.Categorical(["A", "B", "A"]),
+        "year": pd.array([2021, 2022, None], dtype="Int16"),
+        "size": [1.5, 2.0, 3.0],
+    })
+
+
+@pytest.mark.asyncio
+async def test_code_runs_in_worker(sandbox):
+    df = frame()
+
+    outcome = await sandbox.run("result = df.groupby('dev', observed=True)['size'].sum().to_dict()", df)
+    assert outcome.result == "{'A': 4.5, 'B': 2.0}"
+
+    outcome = await sandbox.run("filtered_df = df[df['dev'] == 'A']", df, "filtered_df")
+    assert outcome.result is None
+    pd.testing.assert_frame_equal(outcome.frame, df[df["dev"] == "A"])
+
+    # The input frame comes back as a copy, not over the pipe
+    outcome = await sandbox.run("x = 1", df)
+    pd.testing.assert_frame_equal(outcome.frame, df)
+
+    with pytest.raises(CodeError, match="missing"):
+        await sandbox.run("result = df['missing']", df)
+    assert sandbox.stats()["runs"] == 4 and sandbox.stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_timeout_and_cancel_replace_the_worker(sandbox):
+    df = frame()
+
+    with pytest.raises(SandboxError, match="timed out"):
+        await sandbox.run("while True:\n    pass", df, timeout=1)
+
+    run = asyncio.create_task(sandbox.run("while True:\n    pass", df, job_id="job-1"))
+    while not sandbox.cancel("job-1"):
+        await asyncio.sleep(0.05)
+    with pytest.raises(SandboxError, match="cancelled"):
+        await run
+
+    # A fresh worker answers the next run
+    outcome = await sandbox.run("result = len(df)", df)
+    assert outcome.result == "3"
+    assert sandbox.stats()["timeouts"] == 1 and sandbox.stats()["cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_waiting_for_a_worker_does_not_use_up_the_timeout(sandbox):
+    df = frame()
+    assert (await sandbox.run("result = 1", df)).result == "1"
+
+    worker = sandbox._workers[0]
+    worker.busy = True
+    asyncio.get_running_loop().call_later(1.5, setattr, worker, "busy", False)
+    outcome = await sandbox.run("result = len(df)", df, timeout=1)
+    assert outcome.result == "3" and sandbox.stats()["timeouts"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_replacements_are_retried_and_acquire_is_bounded(monkeypatch):
+    sandbox = CodeSandbox(SandboxConfig(workers=1, start_method="spawn", timeout_seconds=30,
+                                        acquire_timeout_seconds=1))
+    monkeypatch.setattr(code_sandbox_module, "_SPAWN_BACKOFF_SECONDS", 0)
+    try:
+        df = frame()
+        await sandbox.run("result = 1", df)
+        spawn = sandbox._spawn
+
+        def failing_spawn():
+            raise SandboxError("Sandbox worker failed to start")
+
+        monkeypatch.setattr(sandbox, "_spawn", failing_spawn)
+        with pytest.raises(SandboxError, match="timed out"):
+            await sandbox.run("while True:\n    pass", df, timeout=1)
+        with pytest.raises(SandboxError, match="No sandbox worker"):
+            await sandbox.run("result = 1", df)
+        assert sandbox.stats()["spawn_failures"] >= 3 and sandbox.stats()["workers"] == []
+
+        # The pool is topped up again once workers can start
+        monkeypatch.setattr(sandbox, "_spawn", spawn)
+        sandbox.config.acquire_timeout_seconds = 30
+        assert (await sandbox.run("result = len(df)", df)).result == "3"
+    finally:
+        sandbox.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_jobs_go_to_the_worker_holding_the_dataset(tmp_path):
+    sandbox = CodeSandbox(SandboxConfig(workers=2, start_method="spawn", timeout_seconds=30))
+    try:
+        paths = []
+        for name in ("a.csv", "b.csv"):
+            paths.append(str(tmp_path / name))
+            frame().to_csv(paths[-1], index=False)
+
+        pids = {}
+        for path in paths + paths:
+            df = LazyDataset([path]).load(["dev", "size"])
+            outcome = await sandbox.run("result = df['size'].sum()", df)
+            assert outcome.result == "6.5"
+            worker = next(w for w in sandbox.stats()["workers"] if os.path.abspath(path) in w["datasets"])
+            pids.setdefault(path, set()).add(worker["pid"])
+
+        stats = sandbox.stats()
+        # Loaded by the workers themselves, each dataset on its own worker
+        assert stats["frames_shipped"] == 0
+        assert all(len(p) == 1 for p in pids.values()) and pids[paths[0]] != pids[paths[1]]
+        assert stats["affinity_hits"] == 2 and stats["affinity_misses"] == 2 and stats["hit_rate"] == 0.5
+        assert stats["resident_bytes"] > 0
+
+        # A frame derived from the load is sent, not reloaded
+        df = LazyDataset([paths[0]]).load()
+        outcome = await sandbox.run("result = len(df)", df.sort_values("size"))
+        assert outcome.result == "3" and sandbox.stats()["frames_shipped"] == 1
+    finally:
+        sandbox.shutdown()
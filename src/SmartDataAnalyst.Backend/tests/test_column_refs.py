@@ -0,0 +1,34 @@
+from utils.column_refs import code_columns, plan_columns
+
+COLUMNS = ["Model Name", "Developer", "year", "amount", "region"]
+
+
+def test_code_columns_finds_named_columns():
+    assert code_columns("result = df['amount'].sum()", COLUMNS) == {"amount"}
+    assert code_columns("result = df[df.year > 2020][['Developer', 'amount']]", COLUMNS) == {"year", "Developer", "amount"}
+    assert code_columns("result = df.groupby('region')['amount'].mean()", COLUMNS) == {"region", "amount"}
+    assert code_columns("result = df.query('`Model Name` == \"x\" and year > 1')['amount']", COLUMNS) == {"Model Name", "year", "amount"}
+    assert code_columns("result = df.loc[df['year'] == 2022, 'region'].nunique()", COLUMNS) == {"year", "region"}
+    assert code_columns("result = len(df[df['year'] > 2020])", COLUMNS) == {"year"}
+
+
+def test_code_columns_gives_up_on_whole_frame_use():
+    assert code_columns("result = df.describe()", COLUMNS) is None
+    assert code_columns("result = df[df['year'] > 2020]", COLUMNS) is None
+    assert code_columns("result = list(df.columns)", COLUMNS) is None
+    assert code_columns("result = df.groupby('region').sum()", COLUMNS) is None
+    assert code_columns("result = df[", COLUMNS) is None
+
+
+def test_plan_columns():
+    rows_plan = {"action": "rows", "rows_filter": "`year` == 2022", "target_columns": ["Model Name"]}
+    assert plan_columns(rows_plan, COLUMNS) == ["Model Name", "year"]
+    quoted = {"action": "rows", "rows_filter": "'Developer' == 'OpenAI'", "target_columns": ["amount"]}
+    assert plan_columns(quoted, COLUMNS) == ["Developer", "amount"]
+    # Empty target_columns returns whole rows
+    assert plan_columns({"action": "rows", "rows_filter": "year == 2022", "target_columns": []}, COLUMNS) is None
+
+    code_plan = {"action": "code", "code": "result = df['amount'].max()"}
+    assert plan_columns(code_plan, COLUMNS, code=code_plan["code"]) == ["amount"]
+    assert plan_columns({"action": "answer", "explain": "n/a"}, COLUMNS) == []
+    assert plan_columns({"action": "other"}, COLUMNS) is None
@@ -0,0 +1,79 @@
+import os
+import pandas as pd
+import pyarrow as pa
+from services import columnar_store
+from services.columnar_store import (
+    append_columnar, columnar_path, convert_to_columnar, extend_zone_map, is_columnar_fresh, load_dataset,
+    load_zone_map, read_columnar, read_columnar_batches, save_schema, write_columnar
+)
+from services.lazy_dataset import LazyDataset
+
+
+def test_load_converts_missing_copy(tmp_path):
+    path = str(tmp_path / "models.csv")
+    pd.DataFrame({"Model": ["a", "b"], "Params": [1.5, 7.0], "Year": [2021, 2022]}).to_csv(path, index=False)
+
+    df = load_dataset(path)
+
+    assert os.path.exists(columnar_path(path))
+    assert list(df.columns) == ["Model", "Params", "Year"]
+    assert df["Year"].dtype == "int64"
+    assert df["Params"].tolist() == [1.5, 7.0]
+
+
+def test_stale_copy_is_rebuilt_from_csv(tmp_path):
+    path = str(tmp_path / "data.csv")
+    pd.DataFrame({"x": [1, 2]}).to_csv(path, index=False)
+    convert_to_columnar(path)
+
+    pd.DataFrame({"x": [1, 2, 3]}).to_csv(path, index=False)
+    os.utime(path, ns=(0, os.stat(columnar_path(path)).st_mtime_ns + 1_000_000))
+    assert not is_columnar_fresh(path)
+
+    assert len(load_dataset(path)) == 3
+
+
+def test_mixed_object_column_is_stored_as_text(tmp_path):
+    path = str(tmp_path / "mixed.csv")
+    df = pd.DataFrame({"v": [1, "x", None]})
+
+    write_columnar(path, df)
+    table = read_columnar(path)
+
+    assert table.column("v").to_pylist() == ["1", "x", None]
+
+
+def test_zone_map_skips_batches_that_cannot_match(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar_store.config, "batch_rows", 2)
+    path = str(tmp_path / "models.csv")
+    pd.DataFrame({"year": [2020, 2020, 2021, 2021, 2022, 2022], "params": ["1", "2", "3", "4", "5", "6"]}).to_csv(path, index=False)
+
+    zones = load_zone_map(path)
+    assert [z["rows"] for z in zones] == [2, 2, 2]
+    assert zones[2]["stats"]["year"]["min"] == 2022
+
+    df = read_columnar_batches(path, [2], ["params"])
+    assert df.index.tolist() == [4, 5]
+    assert df["params"].tolist() == [5, 6]
+
+    dataset = LazyDataset([path])
+    pruned = dataset.load(["year", "params"], rows_filter="year == 2021")
+    assert pruned.index.tolist() == [2, 3]
+    assert pruned.query("year == 2021")["params"].tolist() == [3, 4]
+    assert LazyDataset([path], rows_filter="`year` > 2020").load(["params"])["params"].tolist() == [3, 4, 5, 6]
+
+
+def test_zone_map_of_appended_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar_store.config, "batch_rows", 2)
+    path, new_path = str(tmp_path / "a.csv"), str(tmp_path / "b.csv")
+    pd.DataFrame({"x": [1, 2, 3]}).to_csv(path, index=False)
+    load_zone_map(path)
+
+    pd.DataFrame({"x": [1, 2, 3, 9]}).to_csv(new_path, index=False)
+    save_schema(new_path, {"x": "int"})
+    append_columnar(path, new_path, pa.table({"x": [9]}))
+
+    zones = extend_zone_map(path, new_path)
+    assert [z["rows"] for z in zones] == [2, 1, 1]
+    assert zones[-1]["stats"]["x"]["max"] == 9
+    assert load_zone_map(new_path) == zones
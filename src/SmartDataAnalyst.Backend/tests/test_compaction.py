@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from services.lazy_dataset import LazyDataset
+from utils.compaction import compact_dataframe
+
+
+def test_compaction_keeps_values_and_shrinks_frame():
+    n = 10_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "year": rng.integers(2000, 2024, n),
+        "nullable": pd.array(rng.integers(0, 100, n), dtype="Int64"),
+        "big": rng.integers(0, 2**40, n),
+        "half": rng.integers(0, 8, n) / 2,
+        "noisy": rng.random(n),
+        "use_case": rng.choice(["Image Generation", "Chatbot", "Code"], n),
+        "name": [f"model-{i}" for i in range(n)],
+    })
+
+    out = compact_dataframe(df)
+
+    # Numeric dtypes are kept; only text changes representation
+    for col in ("year", "nullable", "big", "half", "noisy"):
+        assert out[col].dtype == df[col].dtype
+    assert isinstance(out["use_case"].dtype, pd.ArrowDtype)
+    assert isinstance(out["name"].dtype, pd.ArrowDtype)
+
+    for col in df.columns:
+        assert out[col].astype(object).tolist() == df[col].astype(object).tolist()
+
+    report = out.attrs["compaction"]
+    assert report["bytes_after"] < report["bytes_before"]
+    assert set(report["columns"]) == {"use_case", "name"}
+
+
+def test_query_and_str_ops_still_work():
+    df = compact_dataframe(pd.DataFrame({
+        "Primary Use Case": ["Image Generation", "Chatbot"] * 5,
+        "Model Name": [f"m{i}" for i in range(10)],
+        "Parameters (Billions)": [0.5, 7.0] * 5,
+    }))
+
+    rows = df.query("`Primary Use Case` == 'Image Generation' and `Parameters (Billions)` < 1")
+    assert len(rows) == 5
+    assert df["Model Name"].str.startswith("m1").sum() == 1
+
+
+def test_arithmetic_on_loaded_frames_matches_pandas(tmp_path):
+    path = str(tmp_path / "orders.csv")
+    pd.DataFrame({
+        "qty": [100, 120],
+        "price": [16777216.5, 1677721658222.5],
+        "region": ["north", "south"],
+    }).to_csv(path, index=False)
+
+    df = LazyDataset([path]).load()
+    assert df["qty"].mul(df["qty"]).tolist() == [10000, 14400]
+    assert df["price"].sum() == 16777216.5 + 1677721658222.5
+    counts = df[df["region"] == "north"].groupby("region").size()
+    assert counts.to_dict() == {"north": 1}
@@ -0,0 +1,65 @@
+from services.columnar_store import dialect_path, load_dialect, read_csv_file
+from utils.csv_dialect import sniff_dialect
+
+
+def test_comma_with_header():
+    dialect = sniff_dialect(b"Model Name,Release Year\nGPT,2020\n\"Llama, 2\",2023\n")
+    assert dialect.delimiter == ","
+    assert dialect.has_header
+    assert dialect.decimal == "."
+
+
+def test_semicolon_with_decimal_comma():
+    dialect = sniff_dialect("Stadt;Preis\nKöln;1,50\nBonn;2,75\n".encode("utf-8"))
+    assert dialect.delimiter == ";"
+    assert dialect.decimal == ","
+    assert dialect.encoding == "utf-8"
+
+
+def test_latin1_and_tab_delimited():
+    dialect = sniff_dialect("name\tcity\nJosé\tSão Paulo\nAna\tMálaga\n".encode("latin-1"))
+    assert dialect.delimiter == "\t"
+    assert dialect.encoding.lower().replace("_", "-") not in ("utf-8", "ascii")
+
+
+def test_headerless_numeric_file():
+    dialect = sniff_dialect(b"1,2.5,3\n4,5.5,6\n7,8.5,9\n")
+    assert not dialect.has_header
+    assert dialect.field_count == 3
+
+
+def test_thousands_comma_is_not_a_decimal_comma():
+    dialect = sniff_dialect(b"city\tsales\nKoeln\t12,500\nBonn\t3,250\nEssen\t7.5\n")
+    assert dialect.delimiter == "\t"
+    assert dialect.decimal == "."
+
+    # A "." thousands separator settles it
+    dialect = sniff_dialect(b"city;sales\nKoeln;12.500,5\nBonn;3,250\n")
+    assert dialect.decimal == ","
+
+
+def test_numeric_header_of_years_is_a_header():
+    dialect = sniff_dialect(b"2021;2022;2023\n10;20;30\n15;25;35\n")
+    assert dialect.delimiter == ";"
+    assert dialect.has_header
+
+    # Data rows of the same shape are still headerless
+    assert not sniff_dialect(b"2021;10\n2022;20\n2023;30\n").has_header
+
+
+def test_sidecar_is_reused_for_later_reads(tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text("item;price\na;1,5\nb;2,5\n")
+
+    dialect = load_dialect(str(path))
+    assert dialect.delimiter == ";" and dialect.decimal == ","
+    assert (tmp_path / "prices.csv.dialect.json").exists()
+    assert dialect_path(str(path)).endswith(".dialect.json")
+
+    df = read_csv_file(str(path))
+    assert list(df.columns) == ["item", "price"]
+    assert df["price"].tolist() == [1.5, 2.5]
+
+    headerless = tmp_path / "raw.csv"
+    headerless.write_text("1,2\n3,4\n")
+    assert list(read_csv_file(str(headerless)).columns) == ["column_1", "column_2"]
@@ -0,0 +1,77 @@
+import os
+import pandas as pd
+from services.dataset_cache import DatasetCache, LOADERS
+
+
+def write_csv(path, rows):
+    pd.DataFrame({"x": list(range(rows)), "y": ["a"] * rows}).to_csv(path, index=False)
+
+
+def test_hit_after_first_load(tmp_path):
+    path = str(tmp_path / "data.csv")
+    write_csv(path, 10)
+    cache = DatasetCache(max_bytes=10 * 1024 * 1024)
+
+    first = cache.get(path)
+    second = cache.get(path)
+
+    assert first is second
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_rewritten_file_is_reloaded(tmp_path):
+    path = str(tmp_path / "data.csv")
+    write_csv(path, 10)
+    cache = DatasetCache(max_bytes=10 * 1024 * 1024)
+    cache.get(path)
+
+    write_csv(path, 20)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+
+    df = cache.get(path)
+    assert len(df) == 20
+    # The stale version is dropped, not kept alongside the new one
+    assert cache.stats()["entries"] == 1
+
+
+def test_lru_eviction_respects_byte_budget(tmp_path):
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / f"data_{i}.csv")
+        write_csv(path, 1000)
+        paths.append(path)
+
+    one_frame = int(LOADERS["raw"](paths[0]).memory_usage(deep=True).sum())
+    cache = DatasetCache(max_bytes=one_frame * 2)
+
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])  # refresh -> paths[1] is now least recently used
+    cache.get(paths[2])
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["current_bytes"] <= cache.max_bytes
+
+    cache.get(paths[0])
+    assert cache.stats()["hits"] == 2
+
+
+
+def test_get_columns_caches_each_column(tmp_path):
+    path = str(tmp_path / "data.csv")
+    pd.DataFrame({"x": ["1", "2"], "y": ["a", "b"], "z": [1.5, 2.5]}).to_csv(path, index=False)
+    cache = DatasetCache(max_bytes=10 * 1024 * 1024)
+
+    df = cache.get_columns(path, ["z", "x"])
+    assert list(df.columns) == ["z", "x"]
+    assert df["x"].tolist() == [1, 2]
+    assert cache.stats()["misses"] == 2
+
+    # Only y is read now; x comes from the cache
+    df = cache.get_columns(path, ["x", "y"])
+    assert df["y"].tolist() == ["a", "b"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+    assert len(cache.get_columns(path, [])) == 2
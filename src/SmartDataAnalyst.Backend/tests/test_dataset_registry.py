@@ -0,0 +1,139 @@
+import os
+import pandas as pd
+from core.config import DatasetRegistryConfig
+from services.columnar_store import convert_to_columnar, columnar_path
+from services.dataset_registry import DatasetRegistry, hash_file
+
+
+def _stage(registry, filename, df):
+    staged = registry.staging_path(filename)
+    df.to_csv(staged, index=False)
+    return staged, hash_file(staged), os.path.getsize(staged)
+
+
+def test_identical_reupload_is_a_noop(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+    df = pd.DataFrame({"x": [1, 2, 3]})
+
+    first = registry.register("a.csv", *_stage(registry, "a.csv", df))
+    staged, sha, size = _stage(registry, "a.csv", df)
+    second = registry.register("a.csv", staged, sha, size)
+
+    assert first.is_new_content
+    assert second.is_unchanged and not second.is_new_content
+    assert second.version.path == first.version.path
+    assert not os.path.exists(staged)
+
+
+def test_same_content_under_new_name_reuses_artifacts(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+    df = pd.DataFrame({"x": [1, 2, 3]})
+
+    first = registry.register("a.csv", *_stage(registry, "a.csv", df))
+    convert_to_columnar(first.version.path)
+    registry.update_info(first.version, {"columns": ["x"]})
+
+    second = registry.register("b.csv", *_stage(registry, "b.csv", df))
+
+    assert not second.is_new_content and not second.is_unchanged
+    assert second.version.version_id == first.version.version_id
+    assert os.path.exists(columnar_path(second.version.path))
+    assert second.version.info == {"columns": ["x"]}
+
+
+def test_changed_content_creates_new_current_version(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+
+    first = registry.register("a.csv", *_stage(registry, "a.csv", pd.DataFrame({"x": [1]})))
+    second = registry.register("a.csv", *_stage(registry, "a.csv", pd.DataFrame({"x": [2]})))
+
+    assert second.is_new_content
+    assert second.version.path != first.version.path
+    assert registry.resolve("a.csv").version_id == second.version.version_id
+    assert registry.resolve("a.csv", first.version.version_id).path == first.version.path
+
+    # The manifest survives a restart
+    reloaded = DatasetRegistry(root=str(tmp_path))
+    assert len(reloaded.versions("a.csv")) == 2
+
+
+def test_legacy_upload_is_adopted_in_place(tmp_path):
+    legacy = tmp_path / "old.csv"
+    pd.DataFrame({"x": [1]}).to_csv(legacy, index=False)
+    registry = DatasetRegistry(root=str(tmp_path))
+
+    version = registry.resolve("old.csv")
+
+    assert version.path == str(legacy)
+    assert version.sha256 == hash_file(str(legacy))
+    assert registry.resolve("missing.csv") is None
+
+
+def test_reupload_during_ingest_keeps_the_stored_file(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+    df = pd.DataFrame({"x": [1, 2, 3]})
+
+    first = registry.register("a.csv", *_stage(registry, "a.csv", df))
+    registry.register("a.csv", *_stage(registry, "a.csv", pd.DataFrame({"x": [9]})))
+    mtime = os.stat(first.version.path).st_mtime_ns
+    # Back to the first content before its Arrow copy was written
+    staged, sha, size = _stage(registry, "a.csv", df)
+    again = registry.register("a.csv", staged, sha, size)
+
+    assert again.is_new_content and again.version.path == first.version.path
+    assert os.stat(first.version.path).st_mtime_ns == mtime and not os.path.exists(staged)
+
+
+def test_superseded_versions_beyond_retention_are_deleted(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path), config=DatasetRegistryConfig(keep_versions=2))
+    versions = []
+    for i in range(4):
+        result = registry.register("a.csv", *_stage(registry, "a.csv", pd.DataFrame({"x": [i]})))
+        convert_to_columnar(result.version.path)
+        versions.append(result.version)
+    # Same content as the newest version, under another name: shares nothing with the pruned ones
+    registry.register("b.csv", *_stage(registry, "b.csv", pd.DataFrame({"x": [3]})))
+
+    kept = {v.version_id for v in registry.versions("a.csv")}
+    assert kept == {versions[2].version_id, versions[3].version_id}
+    for old in versions[:2]:
+        assert not os.path.exists(os.path.dirname(old.path))
+        assert registry.resolve("a.csv", old.version_id) is None
+    assert os.path.exists(columnar_path(versions[2].path))
+    assert registry.resolve("a.csv").version_id == versions[3].version_id
+
+
+def test_pending_upload_becomes_current_only_when_activated(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+    first = registry.register("a.csv", *_stage(registry, "a.csv", pd.DataFrame({"x": [1]}))).version
+
+    failed = registry.register("a.csv", *_stage(registry, "a.csv", pd.DataFrame({"x": [2]})), activate=False)
+    assert failed.is_pending
+    assert registry.resolve("a.csv").version_id == first.version_id
+
+    # A failed ingest leaves the previous version current and drops the files
+    registry.discard(failed.version)
+    assert registry.resolve("a.csv").version_id == first.version_id
+    assert not os.path.exists(failed.version.path)
+    assert [v.version_id for v in registry.versions("a.csv")] == [first.version_id]
+
+    done = registry.register("a.csv", *_stage(registry, "a.csv", pd.DataFrame({"x": [3]})), activate=False)
+    registry.update_info(done.version, {"columns": ["x"]})
+    registry.activate(done.version)
+    current = registry.resolve("a.csv")
+    assert current.version_id == done.version.version_id
+    assert current.info == {"columns": ["x"]}
+
+    # Discarding the current version is a no-op
+    registry.discard(current)
+    assert registry.resolve("a.csv").version_id == current.version_id
+
+
+def test_first_pending_upload_is_not_resolvable(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+    pending = registry.register("b.csv", *_stage(registry, "b.csv", pd.DataFrame({"x": [1]})), activate=False)
+    assert registry.resolve("b.csv") is None
+
+    registry.discard(pending.version)
+    assert registry.versions("b.csv") == []
+    assert DatasetRegistry(root=str(tmp_path)).resolve("b.csv") is None
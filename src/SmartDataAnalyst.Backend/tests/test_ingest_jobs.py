@@ -0,0 +1,84 @@
+import os
+import pandas as pd
+import pytest
+from core.config import IngestConfig, IngestJobConfig
+from services.columnar_store import is_columnar_fresh, load_schema
+from services.ingest_jobs import IngestJobManager
+from utils.csv_dialect import CsvDialect
+
+
+@pytest.fixture
+def manager():
+    manager = IngestJobManager(IngestJobConfig(max_workers=1, start_method="spawn"))
+    yield manager
+    manager.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_worker_and_reports_progress(tmp_path, manager):
+    path = str(tmp_path / "big.csv")
+    pd.DataFrame({"id": range(1000), "v": ["x"] * 1000}).to_csv(path, index=False)
+    events, finished = [], []
+
+    async def on_progress(job):
+        events.append((job.stage, job.rows_parsed, job.bytes_read))
+
+    async def on_done(job):
+        finished.append(job.status)
+
+    job, done = manager.submit(
+        "big.csv", "v1", path, CsvDialect(), os.path.getsize(path),
+        IngestConfig(chunk_rows=300, chunked_threshold_bytes=0),
+        on_progress=on_progress, on_done=on_done,
+    )
+    await done
+
+    assert job.status == "done" and finished == ["done"]
+    assert job.result["profile"]["rows"] == 1000
+    assert manager.get(job.job_id).to_dict()["bytes_read"] == os.path.getsize(path)
+    assert is_columnar_fresh(path) and load_schema(path) is not None
+    stages = [stage for stage, _, _ in events]
+    assert "profiling" in stages and "writing" in stages
+    assert max(rows for _, rows, _ in events) == 1000
+
+
+@pytest.mark.asyncio
+async def test_failed_job_reports_error(tmp_path, manager):
+    job, done = manager.submit("missing.csv", "v1", str(tmp_path / "missing.csv"), CsvDialect(), 10)
+    await done
+
+    assert job.status == "failed"
+    assert job.error
+
+
+@pytest.mark.asyncio
+async def test_dead_worker_fails_its_job_and_pool_recovers(tmp_path, manager):
+    path = str(tmp_path / "data.csv")
+    pd.DataFrame({"id": range(10)}).to_csv(path, index=False)
+
+    job, done = manager.submit("data.csv", "v1", path, CsvDialect(), os.path.getsize(path))
+    for process in list(manager._pool._processes.values()):
+        process.kill()
+    await done
+    assert job.status == "failed" and "died" in job.error
+
+    job, done = manager.submit("data.csv", "v1", path, CsvDialect(), os.path.getsize(path))
+    await done
+    assert job.status == "done" and job.result["profile"]["rows"] == 10
+
+
+@pytest.mark.asyncio
+async def test_concurrent_ingest_of_same_version_shares_one_job(tmp_path, manager):
+    path = str(tmp_path / "data.csv")
+    pd.DataFrame({"id": range(10)}).to_csv(path, index=False)
+
+    first, first_done = manager.submit("data.csv", "v1", path, CsvDialect(), os.path.getsize(path))
+    second, second_done = manager.submit("data.csv", "v1", path, CsvDialect(), os.path.getsize(path))
+    assert second is first and second_done is first_done
+    await first_done
+    assert first.status == "done"
+
+    # Once finished, the version can be ingested again
+    third, third_done = manager.submit("data.csv", "v1", path, CsvDialect(), os.path.getsize(path))
+    assert third is not first
+    await third_done
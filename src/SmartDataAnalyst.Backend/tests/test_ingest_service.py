@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from core.config import IngestConfig
+from services.columnar_store import read_columnar, read_csv_file
+from services.ingest_service import DatasetProfile, ingest_csv_chunked
+from utils.csv_dialect import CsvDialect
+
+
+def test_chunked_ingest_matches_full_read(tmp_path):
+    path = str(tmp_path / "big.csv")
+    n = 1050
+    df = pd.DataFrame({
+        "id": np.arange(n),
+        "score": np.where(np.arange(n) == 700, np.nan, np.arange(n) * 0.5),
+        # int-looking in the first chunks, text later on
+        "code": [str(i) if i < 900 else f"X{i}" for i in range(n)],
+        "count": [i if i != 1020 else None for i in range(n)],
+    })
+    df.to_csv(path, index=False)
+
+    result = ingest_csv_chunked(path, CsvDialect(), IngestConfig(chunk_rows=100))
+    stored = read_columnar(path).to_pandas()
+    full = read_csv_file(path)
+
+    assert result.profile["rows"] == n
+    assert len(result.preview) == 5
+    assert list(stored.columns) == list(full.columns)
+    for col in full.columns:
+        assert stored[col].dtype == full[col].dtype, col
+
+    columns = {c["name"]: c for c in result.profile["columns"]}
+    assert columns["id"]["min"] == 0 and columns["id"]["max"] == n - 1
+    assert columns["score"]["nulls"] == 1
+    assert columns["count"]["dtype"] == "float64"
+    assert columns["code"]["dtype"] == "object" and columns["code"]["min"] is None
+
+
+def test_profile_drops_unnamed_and_empty_rows(tmp_path):
+    path = str(tmp_path / "idx.csv")
+    with open(path, "w") as f:
+        f.write(",a,b\n0,1,x\n1,,\n2,3,y\n")
+
+    result = ingest_csv_chunked(path, CsvDialect(), IngestConfig(chunk_rows=2))
+
+    assert result.columns == ["a", "b"]
+    assert result.profile["rows"] == 2
+
+
+def test_profile_update_from_frame():
+    profile = DatasetProfile()
+    profile.update(pd.DataFrame({"x": [3, 1, 2], "y": ["a", None, "b"]}))
+
+    summary = profile.to_dict()
+    assert summary["rows"] == 3
+    assert summary["columns"][0] == {"name": "x", "dtype": "int64", "nulls": 0, "min": 1, "max": 3}
+    assert summary["columns"][1]["nulls"] == 1
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+import pytest
+from core import llm_client
+from core.config import LLMCacheConfig
+from services.llm_cache import LLMCacheMiss, LLMResponseCache
+
+
+def test_eviction_keeps_recently_used_responses(tmp_path):
+    cache = LLMResponseCache(LLMCacheConfig(mode="record", path=str(tmp_path / "llm.sqlite3"),
+                                            max_entries=2, max_bytes=1024))
+    k1, k2, k3 = (LLMResponseCache.key({"prompt": p}) for p in ("one", "two", "three"))
+    assert k1 == LLMResponseCache.key({"prompt": "one"})
+    cache.put(k1, "answer 1")
+    cache.put(k2, "answer 2")
+    assert cache.get(k1) == "answer 1"
+
+    # k2 is the least recently used
+    cache.put(k3, "answer 3")
+    assert cache.get(k2) is None and cache.get(k3) == "answer 3"
+    cache.put(LLMResponseCache.key({"prompt": "big"}), "x" * 1020)
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["evictions"] == 3 and stats["current_bytes"] == 1020
+    cache.close()
+
+    # Responses survive a restart
+    cache = LLMResponseCache(LLMCacheConfig(mode="replay", path=str(tmp_path / "llm.sqlite3")))
+    assert cache.get(LLMResponseCache.key({"prompt": "big"})) == "x" * 1020
+    with pytest.raises(LLMCacheMiss):
+        cache.get(k1)
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_ask_llm_records_then_replays(tmp_path, monkeypatch):
+    calls = []
+
+    def create(**request):
+        calls.append(request)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"reply {len(calls)}"))])
+
+    async def get_client():
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    path = str(tmp_path / "llm.sqlite3")
+    monkeypatch.setattr(llm_client, "get_client", get_client)
+    monkeypatch.setattr(llm_client, "llm_cache", LLMResponseCache(LLMCacheConfig(mode="record", path=path)))
+    assert await llm_client.ask_llm("prompt") == "reply 1"
+    assert await llm_client.ask_llm("prompt") == "reply 1"
+    assert await llm_client.ask_llm("other prompt") == "reply 2"
+    assert len(calls) == 2
+
+    monkeypatch.setattr(llm_client, "llm_cache", LLMResponseCache(LLMCacheConfig(mode="replay", path=path)))
+    assert await llm_client.ask_llm("prompt") == "reply 1"
+    with pytest.raises(LLMCacheMiss):
+        await llm_client.ask_llm("new prompt")
+    assert len(calls) == 2
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from services.columnar_store import load_normalized_dataset, load_schema, schema_path
+from utils.normalizer import apply_schema, is_normalized, normalize_dataframe, normalize_with_schema
+
+
+def sample_frame():
+    return pd.DataFrame({
+        "Model Name": [" GPT ", "Llama", "", None],
+        "Parameters (Billions)": ["175", "70", " ", "7"],
+        "Cost": ["1,000.5", "2.5", None, "3"],
+        "Release Date": ["2020-06-11", "2023-07-18", None, "2023-02-24"],
+        "Release Year": [2020, 2023, 2023, 2023],
+        "Score": [0.5, np.nan, 0.7, 0.9],
+    })
+
+
+def test_schema_round_trip_matches_normalize():
+    df = sample_frame()
+    normalized, schema = normalize_with_schema(df)
+
+    assert schema == {
+        "Model Name": "text",
+        "Parameters (Billions)": "int",
+        "Cost": "float",
+        "Release Date": "datetime",
+        "Release Year": "int",
+        "Score": "float",
+    }
+    pd.testing.assert_frame_equal(apply_schema(df, schema), normalized)
+    pd.testing.assert_frame_equal(normalize_dataframe(df), normalized)
+    assert is_normalized(normalized)
+
+
+def test_int_schema_falls_back_when_later_values_are_fractional():
+    df = pd.DataFrame({"x": ["1", "2", "2.5"]})
+    converted = apply_schema(df, {"x": "int"})
+    assert converted["x"].tolist() == [1.0, 2.0, 2.5]
+
+
+def test_normalized_load_writes_and_reuses_sidecar(tmp_path, monkeypatch):
+    path = str(tmp_path / "models.csv")
+    sample_frame().to_csv(path, index=False)
+
+    first = load_normalized_dataset(path)
+    assert load_schema(path)["Parameters (Billions)"] == "int"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("schema should not be inferred again")
+
+    monkeypatch.setattr("services.columnar_store.normalize_with_schema", fail)
+    second = load_normalized_dataset(path)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert schema_path(path).endswith(".schema.json")
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+from tests.legacy_normalizer import normalize_dataframe as legacy_normalize
+from utils.normalizer import normalize_dataframe, normalize_with_schema
+
+
+def assert_same(df: pd.DataFrame):
+    expected = legacy_normalize(df)
+    actual = normalize_dataframe(df)
+    assert list(actual.columns) == list(expected.columns)
+    for col in df.columns:
+        pd.testing.assert_series_equal(actual[col], expected[col], check_names=True, obj=col)
+
+
+def test_integer_like_columns():
+    assert_same(pd.DataFrame({
+        "plain": ["1", "2", "3"],
+        "negative": ["-5", "10", "-0"],
+        "thousands": ["1,000", "2,500", "300"],
+        "padded": [" 7 ", "8", "  "],
+        "native": [1, 2, 3],
+        "lone_minus": ["-", "1", "2"],
+    }))
+
+
+def test_float_like_columns():
+    assert_same(pd.DataFrame({
+        "decimal": ["1.5", "2", "3.25"],
+        "special": ["nan", "inf", "-1e3"],
+        "native": [0.5, np.nan, 1.5],
+        "mixed_text": ["1.5", "abc", "2"],
+    }))
+
+
+def test_date_columns():
+    assert_same(pd.DataFrame({
+        "iso": ["2020-01-05", "2021-12-31", None],
+        "day_first": ["13/01/2020", "05/06/2020", "01/02/2021"],
+        "dotted": ["01.02.2020", "2020.03.04", "05.06.2021"],
+        "bad": ["2020-13-45", "2020-01-01", "x"],
+    }))
+
+
+def test_text_and_empty_columns():
+    assert_same(pd.DataFrame({
+        "text": [" GPT ", "Llama", "", None],
+        "commas": ["a,b", ",", "c", "d"],
+        "all_null": [None, None, None, None],
+        "objects": [1, "a", " ", 2.5],
+        "whitespace": ["\t", " ", "\n", "x"],
+    }))
+
+
+def test_timestamp_columns():
+    assert_same(pd.DataFrame({
+        "seconds": [1_600_000_000, 1_600_000_100, 1_600_000_200],
+        "millis": [1_600_000_000_000, 1_600_000_100_000, 1_600_000_200_000],
+    }))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_wide_frames(seed):
+    rng = np.random.default_rng(seed)
+    n = 200
+    makers = [
+        lambda: rng.integers(-1000, 1000, n).astype(str),
+        lambda: np.char.mod("%.3f", rng.normal(size=n)),
+        lambda: rng.choice(["alpha", "beta", " gamma ", "", "  "], n),
+        lambda: rng.choice(["2020-01-01", "2021-06-30", "1999-12-31"], n),
+        lambda: rng.integers(0, 10, n),
+        lambda: np.where(rng.random(n) < 0.3, np.nan, rng.random(n)),
+    ]
+    columns = {f"c{i}": makers[rng.integers(len(makers))]() for i in range(40)}
+    df = pd.DataFrame(columns)
+    # Sprinkle missing values into the string columns
+    for col in df.columns:
+        if df[col].dtype == object:
+            df.loc[rng.random(n) < 0.1, col] = None
+    assert_same(df)
+
+
+def test_parallel_matches_serial_on_wide_frame():
+    rng = np.random.default_rng(7)
+    n = 100
+    df = pd.DataFrame({
+        f"c{i}": (rng.integers(0, 100, n).astype(str) if i % 3 == 0
+                  else rng.choice([" a ", "b", ""], n) if i % 3 == 1
+                  else rng.random(n))
+        for i in range(90)
+    })
+
+    serial, serial_schema = normalize_with_schema(df, parallel=False)
+    parallel, parallel_schema = normalize_with_schema(df, parallel=True)
+
+    assert serial_schema == parallel_schema
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert_same(df)
+
+
+def test_duplicate_column_names_keep_position():
+    df = pd.DataFrame([["1", "x"], ["2", "y"]], columns=["a", "a"])
+    out = normalize_dataframe(df, parallel=True)
+    assert list(out.columns) == ["a", "a"]
+    assert str(out.iloc[:, 0].dtype) == "Int64"
+    assert out.iloc[:, 1].tolist() == ["x", "y"]
@@ -0,0 +1,82 @@
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from core.config import PlanCacheConfig
+from services.lazy_dataset import LazyDataset
+from services.plan_cache import SemanticPlanCache, question_literals, schema_fingerprint
+
+VOCAB = ["top", "5", "models", "by", "size", "largest", "biggest", "average", "year", "per", "developer"]
+
+
+def embed(text):
+    # Bag of words, with "largest" and "biggest" as synonyms
+    words = text.replace("biggest", "largest").split()
+    return np.array([words.count(w) for w in VOCAB], dtype=float)
+
+
+def test_paraphrase_reuses_plan_on_same_schema():
+    cache = SemanticPlanCache(PlanCacheConfig(similarity_threshold=0.9, max_entries=2), embed=embed)
+    plan = {"action": "rows", "code": "", "rows_filter": "size > 1", "target_columns": ["model"], "extra": 1}
+
+    assert cache.lookup("top 5 largest models by size", "s1")[0] is None
+    cache.add("Top 5 largest models by size?", "s1", plan)
+
+    found, _ = cache.lookup("top 5 biggest models by size", "s1")
+    assert found == {k: v for k, v in plan.items() if k != "extra"}
+    found["rows_filter"] = "changed"
+    assert cache.lookup("top 5 biggest models by size", "s1")[0]["rows_filter"] == "size > 1"
+
+    # Another schema, or a different question, is a miss
+    assert cache.lookup("top 5 biggest models by size", "s2")[0] is None
+    assert cache.lookup("average year per developer", "s1")[0] is None
+
+    cache.add("average year per developer", "s1", {"action": "answer", "code": "result = 1"})
+    cache.add("average size per developer", "s1", {"action": "answer", "code": "result = 2"})
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 3 and stats["hit_rate"] == 0.4
+
+
+def test_questions_with_other_literals_never_share_a_plan():
+    assert question_literals("Top 5 models by OpenAI in 2022") == ("2022", "5", "openai")
+    assert question_literals("Show 'Chatbot' models, top five") == ("chatbot", "five")
+
+    # The stub embedder ignores numbers and names: only the literals differ
+    cache = SemanticPlanCache(PlanCacheConfig(similarity_threshold=0.9),
+                              embed=lambda text: embed(re.sub(r"\d", "", text)))
+    cache.add("top 5 largest models", "s1", {"action": "rows", "code": "", "rows_filter": None})
+    cache.add("largest models in 2022", "s1", {"action": "rows", "code": "", "rows_filter": "year == 2022"})
+
+    assert cache.lookup("top 10 largest models", "s1")[0] is None
+    assert cache.lookup("largest models in 2023", "s1")[0] is None
+    assert cache.lookup("top 5 largest Google models", "s1")[0] is None
+    assert cache.lookup("largest models in 2022?", "s1")[0]["rows_filter"] == "year == 2022"
+    stats = cache.stats()
+    assert stats["literal_mismatches"] == 3 and stats["hits"] == 1
+
+
+def test_real_embeddings_match_paraphrases_only():
+    pytest.importorskip("sentence_transformers")
+    cache = SemanticPlanCache(PlanCacheConfig(similarity_threshold=0.8))
+    if cache.embed("probe") is None:
+        pytest.skip(f"embedding model unavailable: {cache.unavailable}")
+
+    cache.add("What are the 5 largest models by parameter count?", "s1", {"action": "rows", "code": ""})
+    found, _ = cache.lookup("Which 5 models have the most parameters?", "s1")
+    assert found == {"action": "rows", "code": ""}
+    assert cache.lookup("Which 10 models have the most parameters?", "s1")[0] is None
+    assert cache.lookup("How many models were released per year?", "s1")[0] is None
+
+
+def test_schema_fingerprint(tmp_path):
+    df = pd.DataFrame({"model": ["a", "b"], "size": [1.0, 2.0]})
+    assert schema_fingerprint(df) == schema_fingerprint(df.copy())
+    assert schema_fingerprint(df) != schema_fingerprint(df.astype({"size": "int64"}))
+
+    path = str(tmp_path / "a.csv")
+    df.to_csv(path, index=False)
+    other = str(tmp_path / "b.csv")
+    df.rename(columns={"size": "params"}).to_csv(other, index=False)
+    assert schema_fingerprint(LazyDataset([path])) == schema_fingerprint(LazyDataset([path], rows_filter="size > 1"))
+    assert schema_fingerprint(LazyDataset([path])) != schema_fingerprint(LazyDataset([other]))
@@ -0,0 +1,53 @@
+import pandas as pd
+from utils.pruning import column_stats, compile_filter, merge_stats
+
+
+def _stats():
+    a = column_stats(pd.DataFrame({
+        "Release Year": [2019, 2020],
+        "name": ["alpha", "beta"],
+        "when": pd.to_datetime(["2024-01-01", "2024-01-31"]),
+        "score": [None, None],
+    }))
+    b = column_stats(pd.DataFrame({
+        "Release Year": [2021, 2022],
+        "name": ["gamma", "delta"],
+        "when": pd.to_datetime(["2024-02-01", "2024-02-10"]),
+        "score": [1.0, None],
+    }))
+    return a, b
+
+
+def test_simple_comparisons_prune_by_min_max():
+    a, _ = _stats()
+    assert compile_filter("`Release Year` == 2020")(a)
+    assert not compile_filter("`Release Year` > 2020")(a)
+    assert not compile_filter("2021 <= `Release Year`")(a)
+    assert compile_filter("name in ['beta', 'zeta']")(a)
+    assert not compile_filter("name == 'gamma'")(a)
+    assert not compile_filter("when >= '2024-02-01'")(a)
+
+
+def test_boolean_combinations():
+    a, _ = _stats()
+    assert not compile_filter("`Release Year` > 2020 and name == 'alpha'")(a)
+    assert compile_filter("`Release Year` > 2020 or name == 'alpha'")(a)
+    assert not compile_filter("(`Release Year` > 2020) & (name == 'alpha')")(a)
+    assert compile_filter("(`Release Year` > 2020) | (name == 'alpha')")(a)
+
+
+def test_unknown_shapes_never_prune():
+    a, _ = _stats()
+    for expr in ["name.str.contains('x')", "`Release Year` > @limit", "score > name", "name > 5", "not a valid ("]:
+        assert compile_filter(expr)(a), expr
+
+
+def test_all_null_columns_and_merged_stats():
+    a, b = _stats()
+    assert not compile_filter("score > 0")(a)
+    assert compile_filter("score != 1")(a)
+
+    merged = merge_stats(a, b)
+    assert merged["Release Year"]["min"] == 2019 and merged["Release Year"]["max"] == 2022
+    assert merged["score"]["nulls"] == 3
+    assert compile_filter("score > 0")(merged)
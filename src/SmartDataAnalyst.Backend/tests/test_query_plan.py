@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+from services.lazy_dataset import LazyDataset
+from services.query_plan import Op, QueryBackendSettings, QueryPlan
+
+
+def test_optimizer_pushes_down_and_fuses():
+    plan = (QueryPlan()
+            .select(["name", "year"])
+            .filter("year > 2020")
+            .sort(["year"], ascending=False)
+            .filter("year > 2020")
+            .limit(2))
+    optimized = plan.optimized()
+
+    assert optimized.ops == (
+        Op("filter", ("year > 2020",)),
+        Op("select", ("name", "year")),
+        Op("topk", ((("year", False),), 2)),
+    )
+    assert optimized.required_columns(["name", "year", "size"]) == ["name", "year"]
+    # Filters never move past a groupby
+    grouped = QueryPlan().groupby(["dev"], {"size": "sum"}).filter("size > 1").optimized()
+    assert [op.kind for op in grouped.ops] == ["groupby", "filter"]
+    assert QueryPlan().filter("year > 2020").required_columns(["name", "year"]) is None
+
+
+def test_collect_matches_eager(tmp_path):
+    path = str(tmp_path / "models.csv")
+    df = pd.DataFrame({
+        "name": ["a", "b", "c", "d", "e"],
+        "dev": ["X", "Y", "X", "X", "Y"],
+        "year": [2019, 2021, 2022, 2023, 2020],
+        "size": [1.0, 7.0, 3.0, 5.0, 2.0],
+    })
+    df.to_csv(path, index=False)
+    dataset = LazyDataset([path])
+
+    plans = [
+        QueryPlan().filter("year >= 2020").select(["name", "size"]),
+        QueryPlan().filter("dev == 'X'").sort(["size"], ascending=False).limit(2).select(["name"]),
+        QueryPlan().filter("year > 2019").groupby(["dev"], {"size": "sum"}).sort(["dev"]),
+    ]
+    for plan in plans:
+        lazy = plan.collect(dataset).reset_index(drop=True)
+        eager = plan.collect_eager(dataset.load()).reset_index(drop=True)
+        pd.testing.assert_frame_equal(lazy, eager)
+
+
+def test_from_llm_plan_and_settings(tmp_path):
+    plan = QueryPlan.from_llm_plan({"action": "rows", "rows_filter": "year == 2022", "target_columns": ["name"]})
+    assert plan.ops == (Op("filter", "year == 2022"), Op("select", ("name",)))
+    assert QueryPlan.from_llm_plan({"action": "code", "code": "df.head()"}) is None
+
+    settings = QueryBackendSettings(root=str(tmp_path))
+    assert settings.get("models.csv") == "pandas"
+    settings.set("models.csv", "lazy")
+    assert QueryBackendSettings(root=str(tmp_path)).get("models.csv") == "lazy"
+    with pytest.raises(ValueError):
+        settings.set("models.csv", "spark")
@@ -0,0 +1,111 @@
+import datetime
+import decimal
+import json
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from services.columnar_store import columnar_path, convert_to_columnar, load_dataset, load_normalized_dataset, load_schema
+from services.ingest_service import ingest_upload
+from services import readers
+from services.readers import UnsupportedFormatError, check_readable, detect_format, open_batches
+from utils.csv_dialect import CsvDialect
+
+
+def _frame():
+    return pd.DataFrame({
+        "id": [1, 2, 3],
+        "price": [1.5, None, 3.0],
+        "when": pd.to_datetime(["2024-01-01 10:00", "2024-01-02 00:00", "2024-01-03 00:00"]),
+        "name": ["a", "b", None],
+    })
+
+
+def test_detects_format_by_magic_before_extension(tmp_path):
+    path = str(tmp_path / "export.csv")
+    pq.write_table(pa.Table.from_pandas(_frame()), path)
+    assert detect_format(path) == "parquet"
+
+    path = str(tmp_path / "rows.jsonl")
+    _frame().to_json(path, orient="records", lines=True)
+    assert detect_format(path) == "jsonl"
+
+    path = str(tmp_path / "plain.dat")
+    _frame().to_csv(path, index=False)
+    assert detect_format(path) == "csv"
+
+
+def test_parquet_upload_keeps_types_through_normalization(tmp_path):
+    path = str(tmp_path / "sales.parquet")
+    pq.write_table(pa.Table.from_pandas(_frame()), path, row_group_size=2)
+
+    info = ingest_upload(path, CsvDialect(), os.path.getsize(path))
+    df = load_normalized_dataset(path)
+
+    assert info["profile"]["rows"] == 3
+    assert info["columns"] == ["id", "price", "when", "name"]
+    assert df["when"].dtype == "datetime64[ns]"
+    assert df["price"].tolist()[0] == 1.5
+
+
+def test_date_decimal_and_nested_columns_are_ingested(tmp_path):
+    path = str(tmp_path / "typed.parquet")
+    pq.write_table(pa.table({
+        "day": pa.array([datetime.date(2024, 1, 2), None, datetime.date(2024, 3, 4)]),
+        "amount": pa.array([decimal.Decimal("1.50"), None, decimal.Decimal("1000.25")], pa.decimal128(10, 2)),
+        "tags": pa.array([["a", "b"], [], None]),
+        "meta": pa.array([{"k": 1}, {"k": 2}, None]),
+    }), path)
+
+    ingest_upload(path, CsvDialect(), os.path.getsize(path))
+
+    assert load_schema(path) == {"day": "datetime", "amount": "float", "tags": "text", "meta": "text"}
+    df = load_normalized_dataset(path)
+    assert df["day"].dtype == "datetime64[ns]" and df["day"].isna().tolist() == [False, True, False]
+    assert df["amount"].dtype == "float64" and df["amount"].sum() == 1001.75
+    assert df["tags"].tolist()[:2] == ['["a", "b"]', "[]"]
+    assert [json.loads(v) for v in df["meta"].tolist()[:2]] == [{"k": 1}, {"k": 2}]
+
+
+def test_arrow_file_is_linked_as_the_columnar_copy(tmp_path):
+    path = str(tmp_path / "data.arrow")
+    table = pa.Table.from_pandas(_frame(), preserve_index=False)
+    with pa.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+
+    convert_to_columnar(path)
+
+    assert os.stat(columnar_path(path)).st_ino == os.stat(path).st_ino
+    assert load_dataset(path)["id"].tolist() == [1, 2, 3]
+
+
+def test_jsonl_with_mixed_types_is_read(tmp_path):
+    path = str(tmp_path / "events.ndjson")
+    with open(path, "w") as f:
+        f.write('{"code": 1, "v": 0.5}\n{"code": "X2", "v": 1.5}\n')
+
+    table = open_batches(path).read_all()
+
+    assert table.column("code").to_pylist() == ["1", "X2"]
+    assert table.column("v").to_pylist() == [0.5, 1.5]
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    path = str(tmp_path / "data.csv")
+    pd.DataFrame({"x": [1]}).to_csv(path, index=False)
+    with pytest.raises(UnsupportedFormatError):
+        open_batches(path, fmt="orc")
+
+
+def test_missing_excel_engine_is_caught_before_ingest(tmp_path, monkeypatch):
+    path = str(tmp_path / "report.xlsx")
+    with open(path, "wb") as f:
+        f.write(b"PK\x03\x04" + b"\0" * 32)
+    monkeypatch.setattr(readers.importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(UnsupportedFormatError, match="openpyxl"):
+        check_readable(path)
+
+    csv_path = str(tmp_path / "data.csv")
+    pd.DataFrame({"x": [1]}).to_csv(csv_path, index=False)
+    assert check_readable(csv_path) == "csv"
@@ -0,0 +1,52 @@
+import pandas as pd
+from core.config import SecondaryIndexConfig
+from services.lazy_dataset import LazyDataset
+from services.secondary_indexes import SecondaryIndexes
+from services import lazy_dataset
+from utils.secondary_index import HashIndex, SortedIndex, build_index, filter_usage, lookup
+
+
+def test_hash_and_sorted_lookups():
+    use_case = pd.Series(["Chat", "Image Generation", None, "Image Generation", "Code"])
+    year = pd.Series([2021, 2022, 2022, 2020, 2023])
+    released = pd.to_datetime(pd.Series(["2021-01-01", None, "2022-06-01", "2020-03-01", "2023-02-01"]))
+    indexes = {
+        "Primary Use Case": [HashIndex(use_case)],
+        "year": [SortedIndex(year)],
+        "released": [SortedIndex(released)],
+    }
+
+    assert lookup("`Primary Use Case` == 'Image Generation'", indexes).tolist() == [1, 3]
+    assert lookup("`Primary Use Case` in ['Chat', 'Code']", indexes).tolist() == [0, 4]
+    assert lookup("year > 2021", indexes).tolist() == [1, 2, 4]
+    assert lookup("2021 <= year < 2023", indexes).tolist() == [0, 1, 2]
+    assert lookup("released >= '2022-01-01'", indexes).tolist() == [2, 4]
+    assert lookup("`Primary Use Case` == 'Image Generation' and year >= 2022", indexes).tolist() == [1]
+    assert lookup("(year == 2020) | (`Primary Use Case` == 'Code')", indexes).tolist() == [3, 4]
+    # Unindexed parts of an "and" leave a superset; an "or" needs every branch
+    assert lookup("year == 2022 and other > 1", indexes).tolist() == [1, 2]
+    assert lookup("year == 2022 or other > 1", indexes) is None
+    assert lookup("year == 'x'", indexes) is None
+    assert build_index(use_case, "sorted") is None
+
+
+def test_filter_usage():
+    assert filter_usage("`A B` == 'x' and c > 1 and d != 2") == [("A B", "hash"), ("c", "sorted")]
+
+
+def test_index_is_built_after_repeated_filters(tmp_path, monkeypatch):
+    indexes = SecondaryIndexes(SecondaryIndexConfig(min_filter_count=2))
+    monkeypatch.setattr(lazy_dataset, "secondary_indexes", indexes)
+    path = str(tmp_path / "models.csv")
+    pd.DataFrame({"Developer": ["A", "B", "A", "C"], "year": [2020, 2021, 2022, 2023]}).to_csv(path, index=False)
+
+    first = LazyDataset([path], rows_filter="Developer == 'A'")
+    assert indexes.stats()["builds"] == 0
+    second = LazyDataset([path], rows_filter="Developer == 'A'")
+    assert [i["column"] for i in indexes.stats()["indexes"]] == ["Developer"]
+    assert indexes.stats()["lookups"] == 1
+
+    for dataset in (first, second):
+        assert dataset.load(["year"])["year"].tolist() == [2020, 2022]
+    assert second.load(rows_filter="Developer == 'C'").query("Developer == 'C'")["year"].tolist() == []
+    assert dataset.head(1)["Developer"].tolist() == ["A"]
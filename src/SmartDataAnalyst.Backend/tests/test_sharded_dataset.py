@@ -0,0 +1,85 @@
+import os
+import pandas as pd
+from services.dataset_registry import DatasetRegistry, hash_file
+from services.ingest_service import ingest_upload
+from services.sharded_dataset import ShardedDatasetRegistry, ShardMismatchError, open_sharded, prune_shards, shard_filename
+from utils.csv_dialect import CsvDialect
+from utils.normalizer import is_normalized
+import pytest
+
+
+def _add_shard(registry, shards, name, df):
+    filename = shard_filename("sales", name)
+    staged = registry.staging_path(name)
+    df.to_csv(staged, index=False)
+    version = registry.register(filename, staged, hash_file(staged), os.path.getsize(staged)).version
+    registry.update_info(version, ingest_upload(version.path, CsvDialect(), version.size))
+    return shards.add_shard("sales", name, version)
+
+
+def test_shards_load_as_one_table_and_prune_by_filter(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+    shards = ShardedDatasetRegistry(root=str(tmp_path))
+    for year in (2021, 2022, 2023):
+        _add_shard(registry, shards, f"part-{year}.csv", pd.DataFrame({"year": [year] * 3, "amount": ["1,000", "2", "3"]}))
+
+    df = open_sharded(shards, "sales").load()
+    assert len(df) == 9
+    assert is_normalized(df)
+    assert df["amount"].sum() == 3 * 1005
+
+    kept = prune_shards(shards.shards("sales"), "year >= 2022")
+    assert sorted(s.name for s in kept) == ["part-2022.csv", "part-2023.csv"]
+    assert open_sharded(shards, "sales", "year == 2022").load()["year"].tolist() == [2022] * 3
+    assert open_sharded(shards, "sales", "year == 1999").load().empty
+
+    # Manifest survives a restart and its version tracks the shard set
+    version_id = shards.version_id("sales")
+    reloaded = ShardedDatasetRegistry(root=str(tmp_path))
+    assert reloaded.version_id("sales") == version_id
+    _add_shard(registry, reloaded, "part-2021.csv", pd.DataFrame({"year": [2021], "amount": ["9"]}))
+    assert reloaded.version_id("sales") != version_id
+    assert len(open_sharded(reloaded, "sales").load()) == 7
+
+
+def test_shard_with_other_columns_is_rejected(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+    shards = ShardedDatasetRegistry(root=str(tmp_path))
+    _add_shard(registry, shards, "a.csv", pd.DataFrame({"x": [1]}))
+
+    with pytest.raises(ShardMismatchError):
+        _add_shard(registry, shards, "b.csv", pd.DataFrame({"y": [1]}))
+
+
+def test_shard_with_other_column_kinds_is_rejected(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+    shards = ShardedDatasetRegistry(root=str(tmp_path))
+    _add_shard(registry, shards, "a.csv", pd.DataFrame({"x": [1, 2], "when": ["2024-01-01", "2024-02-01"]}))
+
+    with pytest.raises(ShardMismatchError, match="x: text"):
+        _add_shard(registry, shards, "b.csv", pd.DataFrame({"x": ["a", "b"], "when": ["2024-03-01", "2024-04-01"]}))
+
+    # Decimals next to integers load as one numeric column
+    _add_shard(registry, shards, "c.csv", pd.DataFrame({"x": [1.5, 2.5], "when": ["2024-05-01", "2024-06-01"]}))
+    assert sorted(s.name for s in shards.shards("sales")) == ["a.csv", "c.csv"]
+
+
+def test_open_sharded_loads_only_requested_columns(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path))
+    shards = ShardedDatasetRegistry(root=str(tmp_path))
+    for year in (2021, 2022):
+        _add_shard(registry, shards, f"part-{year}.csv",
+                   pd.DataFrame({"year": [year] * 2, "amount": ["1,000", "2"], "note": ["a", "b"]}))
+
+    dataset = open_sharded(shards, "sales", "year == 2022")
+    assert len(dataset.paths) == 1
+    assert dataset.columns == ["year", "amount", "note"]
+
+    df = dataset.load(["amount"])
+    assert list(df.columns) == ["amount"]
+    assert df["amount"].tolist() == [1000, 2]
+    assert is_normalized(df)
+    assert dataset.head(1)["note"].tolist() == ["a"]
+
+    everything = open_sharded(shards, "sales").load()
+    assert len(everything) == 4
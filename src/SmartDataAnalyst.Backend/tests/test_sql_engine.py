@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+from services.lazy_dataset import LazyDataset
+from services.sql_engine import SqlError, run_sql
+
+pytest.importorskip("duckdb")
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / "models.csv")
+    pd.DataFrame({
+        "Model": ["a", "b", "c", "d"],
+        "Parameters": ["1,000", "7", " 70 ", ""],
+        "Released": ["2021-01-05", "2022-03-01", "2022-07-19", "2023-11-30"],
+    }).to_csv(path, index=False)
+    # First load stores the schema the SQL view applies
+    LazyDataset([path]).load()
+    return path
+
+
+def test_sql_sees_normalized_values(dataset):
+    df = run_sql(LazyDataset([dataset]), "SELECT sum(Parameters) AS total, count(Parameters) AS n FROM df")
+    assert df.to_dict(orient="records") == [{"total": 1077, "n": 3}]
+
+    df = run_sql(LazyDataset([dataset]), "SELECT Model FROM df WHERE year(Released) = 2022 ORDER BY Model;")
+    assert df["Model"].tolist() == ["b", "c"]
+
+
+def test_sql_respects_rows_filter_and_frames(dataset):
+    filtered = LazyDataset([dataset], rows_filter="Model != 'a'")
+    assert run_sql(filtered, "SELECT count(*) AS n FROM df")["n"].tolist() == [3]
+    assert run_sql(pd.DataFrame({"x": [1, 2]}), "SELECT max(x) AS m FROM df")["m"].tolist() == [2]
+
+
+def test_only_single_select_is_allowed(dataset):
+    with pytest.raises(SqlError):
+        run_sql(LazyDataset([dataset]), "DROP VIEW df")
+    with pytest.raises(SqlError):
+        run_sql(LazyDataset([dataset]), "SELECT 1; SELECT 2")
+    with pytest.raises(SqlError):
+        run_sql(LazyDataset([dataset]), f"SELECT * FROM read_csv('{dataset}')")
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import io
+import os
+import pytest
+from fastapi import UploadFile
+from core.config import IngestConfig, UploadConfig
+from services.columnar_store import read_columnar
+from services.ingest_service import ingest_csv_chunked
+from services.upload_service import stream_upload_to_disk, UploadTooLargeError
+from utils.compression import CompressionError, compress
+
+
+def make_upload(data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="data.csv")
+
+
+@pytest.mark.asyncio
+async def test_streams_in_chunks_and_hashes(tmp_path):
+    data = b"a,b\n" + b"1,2\n" * 1000
+    path = str(tmp_path / "data.csv")
+    config = UploadConfig(chunk_bytes=64, max_bytes=0)
+
+    result = await stream_upload_to_disk(make_upload(data), path, config)
+
+    assert result.size == len(data)
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert result.dialect.encoding == "utf-8"
+    assert result.dialect.delimiter == ","
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_aborts_and_keeps_existing_file(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_bytes(b"old,content\n")
+    config = UploadConfig(chunk_bytes=16, max_bytes=100)
+
+    with pytest.raises(UploadTooLargeError):
+        await stream_upload_to_disk(make_upload(b"x" * 1000), str(path), config)
+
+    assert path.read_bytes() == b"old,content\n"
+    assert not os.path.exists(str(path) + ".part")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", ["gzip", "bz2", "zstd"])
+async def test_compressed_upload_is_stored_as_sent_and_readable(tmp_path, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    plain = b"id;amount\n" + b"".join(b"%d;%d,5\n" % (i, i) for i in range(5000))
+    data = compress(plain, compression)
+    path = str(tmp_path / "data.csv")
+    config = UploadConfig(chunk_bytes=256, max_bytes=0)
+
+    result = await stream_upload_to_disk(make_upload(data), path, config)
+
+    assert result.size == len(data)
+    assert result.raw_size == len(plain)
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert result.dialect.compression == compression
+    assert result.dialect.delimiter == ";"
+    assert result.dialect.decimal == ","
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+    ingest = ingest_csv_chunked(path, result.dialect, IngestConfig(chunk_rows=700))
+    assert ingest.profile["rows"] == 5000
+    assert read_columnar(path).column("amount").to_pylist()[:2] == [0.5, 1.5]
+
+
+@pytest.mark.asyncio
+async def test_decompressed_size_is_limited(tmp_path):
+    data = gzip.compress(b"a,b\n" + b"1,2\n" * 100_000)
+    config = UploadConfig(chunk_bytes=1024, max_bytes=64 * 1024)
+
+    with pytest.raises(UploadTooLargeError):
+        await stream_upload_to_disk(make_upload(data), str(tmp_path / "bomb.csv"), config)
+
+
+@pytest.mark.asyncio
+async def test_truncated_compressed_upload_is_rejected(tmp_path):
+    data = gzip.compress(b"a,b\n" + b"1,2\n" * 1000)
+    path = tmp_path / "data.csv"
+
+    with pytest.raises(CompressionError):
+        await stream_upload_to_disk(make_upload(data[:len(data) // 2]), str(path), UploadConfig(max_bytes=0))
+
+    assert not path.exists()
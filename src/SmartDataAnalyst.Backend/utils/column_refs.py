@@ -0,0 +1,166 @@
+import ast
+
+from utils.pruning import filter_columns
+
+# Name the dataset has in generated code
+FRAME_NAME = "df"
+
+# df.<method>(...) calls that return some of df's rows with all its
+# columns, so only a later column selection decides what is read
+_ROW_METHODS = {"query", "sort_values", "sort_index", "head", "tail", "nlargest", "nsmallest", "sample"}
+# Grouped results that need no column besides the group keys
+_GROUP_TERMINALS = {"size", "ngroups", "groups", "indices"}
+
+
+def _string_list(node) -> list[str] | None:
+    """["a"] for "a", ["a", "b"] for ["a", "b"], otherwise None."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, (ast.List, ast.Tuple)) and node.elts and all(
+        isinstance(e, ast.Constant) and isinstance(e.value, str) for e in node.elts
+    ):
+        return [e.value for e in node.elts]
+    return None
+
+
+def _frame_use_is_projectable(name: ast.Name, parents: dict, known: set) -> bool:
+    """
+    Whether this use of `df` only touches columns it names: the chain of
+    row selections, sorting and grouping starting at `df` has to end in a
+    selection of named columns (or in row-only facts like len(df)).
+    """
+    node, grouped = name, False
+    while True:
+        parent = parents.get(node)
+
+        if isinstance(parent, ast.Subscript) and parent.value is node:
+            if _string_list(parent.slice) is not None:
+                return True
+            if grouped:
+                return False
+            # df[mask]: a row selection, keep following the chain
+            node = parent
+            continue
+
+        if isinstance(parent, ast.Attribute) and parent.value is node:
+            attr = parent.attr
+            outer = parents.get(parent)
+            if attr in known:
+                return True
+            if grouped:
+                if attr in _GROUP_TERMINALS:
+                    return True
+                # .agg({"col": "sum"}) only reads the columns it names
+                return attr == "agg" and isinstance(outer, ast.Call) and outer.func is parent \
+                    and len(outer.args) == 1 and isinstance(outer.args[0], ast.Dict)
+            if attr in ("index", "empty"):
+                return True
+            if attr == "shape":
+                return isinstance(outer, ast.Subscript) and isinstance(outer.slice, ast.Constant) \
+                    and outer.slice.value == 0
+            if attr == "loc" and isinstance(outer, ast.Subscript):
+                key = outer.slice
+                if isinstance(key, ast.Tuple) and len(key.elts) == 2:
+                    return _string_list(key.elts[1]) is not None
+                node = outer
+                continue
+            if attr in _ROW_METHODS | {"groupby"} and isinstance(outer, ast.Call) and outer.func is parent:
+                grouped = grouped or attr == "groupby"
+                node = outer
+                continue
+            return False
+
+        if isinstance(parent, ast.Call) and node in parent.args \
+                and isinstance(parent.func, ast.Name) and parent.func.id == "len":
+            return not grouped
+
+        if isinstance(parent, ast.Assign) and parent.value is node and all(
+            isinstance(t, ast.Name) and t.id == FRAME_NAME for t in parent.targets
+        ):
+            # df = df[mask]: later uses of df are checked on their own
+            return True
+
+        return False
+
+
+def code_columns(code: str, columns: list) -> set[str] | None:
+    """
+    Dataset columns generated pandas code reads, or None when it may read
+    columns it does not name (df.describe(), df.columns, passing df around)
+    or cannot be parsed. Columns are found as string literals (df["a"],
+    groupby("a"), df[["a", "b"]]), attributes (df.a) and names inside
+    query()/eval() strings.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    known = set(columns)
+    parents = {child: node for node in ast.walk(tree) for child in ast.iter_child_nodes(node)}
+    used = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == FRAME_NAME and isinstance(node.ctx, ast.Load):
+            if not _frame_use_is_projectable(node, parents, known):
+                return None
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            if node.value in known:
+                used.add(node.value)
+        elif isinstance(node, ast.Attribute) and node.attr in known:
+            used.add(node.attr)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                and node.func.attr in ("query", "eval") and node.args:
+            expr = node.args[0]
+            if not (isinstance(expr, ast.Constant) and isinstance(expr.value, str)):
+                return None
+            names = filter_columns(expr.value)
+            if names is None:
+                return None
+            used |= names & known
+    return used
+
+
+def _quoted_strings(expr: str) -> set[str]:
+    """String literals of a filter expression (backticked names included)."""
+    try:
+        tree = ast.parse(expr.replace("`", "'").strip(), mode="eval")
+    except SyntaxError:
+        return set()
+    return {n.value for n in ast.walk(tree) if isinstance(n, ast.Constant) and isinstance(n.value, str)}
+
+
+def plan_columns(plan: dict, columns: list, code: str | None = None) -> list | None:
+    """
+    Columns needed to carry out an LLM plan (action, rows_filter,
+    target_columns, code), in dataset order, or None when the plan may
+    need every column. `code` is the plan's code as it will be executed.
+    """
+    known = set(columns)
+    needed = set()
+
+    rows_filter = plan.get("rows_filter")
+    if rows_filter:
+        names = filter_columns(rows_filter)
+        if names is None:
+            return None
+        # 'Column Name' == ... is accepted too (see Agent_v16.clean_filter)
+        needed |= (names | _quoted_strings(rows_filter)) & known
+
+    action = plan.get("action")
+    if action == "rows":
+        target = plan.get("target_columns") or []
+        if not isinstance(target, list) or not target:
+            # No target columns: whole rows are returned
+            return None
+        needed |= set(target) & known
+    elif action in ("code", "answer"):
+        if code:
+            used = code_columns(code, columns)
+            if used is None:
+                return None
+            needed |= used
+    else:
+        return None
+
+    return [col for col in columns if col in needed]
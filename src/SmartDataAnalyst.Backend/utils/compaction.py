@@ -0,0 +1,69 @@
+import pandas as pd
+import pyarrow as pa
+
+from core.config import CompactionConfig
+
+COMPACTION_ATTR = "compaction"
+
+config = CompactionConfig()
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _compact_text(series: pd.Series) -> pd.Series:
+    """
+    Text -> Arrow-backed strings (no per-cell Python objects). Values,
+    comparisons and groupby results are unchanged; numeric columns and
+    categoricals are left alone because narrower dtypes change the
+    results of arithmetic (integer wraparound, float32 rounding) and
+    categoricals add unobserved groups.
+    """
+    if len(series) == 0:
+        return series
+    try:
+        arr = pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed Python objects: leave as is
+        return series
+    return pd.Series(
+        pd.arrays.ArrowExtensionArray(arr),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def compact_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink a frame's in-memory footprint without changing what code run
+    on it computes: text columns become Arrow-backed strings, every other
+    column keeps its dtype. A report with bytes before/after and
+    per-column dtype changes is kept in df.attrs["compaction"].
+    """
+    before = frame_bytes(df)
+    columns = []
+    changes = {}
+
+    for i in range(len(df.columns)):
+        series = df.iloc[:, i]
+        if series.dtype == "object":
+            compacted = _compact_text(series)
+        else:
+            compacted = series
+
+        if compacted.dtype != series.dtype:
+            changes[str(df.columns[i])] = {"from": str(series.dtype), "to": str(compacted.dtype)}
+        columns.append(compacted)
+
+    out = pd.DataFrame(dict(enumerate(columns)), index=df.index, copy=False)
+    out.columns = df.columns
+    out.attrs.update(df.attrs)
+
+    after = frame_bytes(out)
+    out.attrs[COMPACTION_ATTR] = {
+        "bytes_before": before,
+        "bytes_after": after,
+        "columns": changes,
+    }
+    return out
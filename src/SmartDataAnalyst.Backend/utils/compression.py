@@ -0,0 +1,138 @@
+import bz2
+import gzip
+import zlib
+from typing import BinaryIO, Iterator
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for .zst uploads
+    zstandard = None
+
+# Leading bytes of each supported container, as pandas names it
+MAGIC_BYTES = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+# Upper bound on one decompressed piece, so a tiny chunk of a highly
+# compressed stream cannot expand into a huge buffer at once
+MAX_PIECE_BYTES = 1024 * 1024
+ZSTD_INPUT_SLICE = 16 * 1024
+
+
+class CompressionError(Exception):
+    """Raised for unsupported or corrupt compressed input."""
+
+
+def detect_compression(head: bytes) -> str | None:
+    """'gzip', 'bz2' or 'zstd' from the first bytes of a file, else None."""
+    for name, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise CompressionError("zstd input needs the 'zstandard' package")
+
+
+class StreamDecompressor:
+    """
+    Incremental decompressor fed with raw chunks as they arrive.
+    Handles concatenated members/frames (e.g. appended gzip members) and
+    yields the output in pieces of at most `max_piece` bytes (zstd: the
+    output of one 16 KiB input slice).
+    """
+
+    def __init__(self, compression: str, max_piece: int = MAX_PIECE_BYTES):
+        if compression not in MAGIC_BYTES:
+            raise CompressionError(f"Unsupported compression: {compression}")
+        if compression == "zstd":
+            _require_zstandard()
+        self.compression = compression
+        self.max_piece = max_piece
+        self._obj = self._new_object()
+        self._in_member = False
+
+    def _new_object(self):
+        if self.compression == "gzip":
+            return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        if self.compression == "bz2":
+            return bz2.BZ2Decompressor()
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    def _step(self, data: bytes) -> tuple[bytes, bytes, bool]:
+        """(output, input not consumed yet, whether more output may be buffered)."""
+        try:
+            if self.compression == "gzip":
+                out = self._obj.decompress(data, self.max_piece)
+                return out, self._obj.unconsumed_tail, len(out) == self.max_piece
+            if self.compression == "bz2":
+                out = self._obj.decompress(data, self.max_piece)
+                return out, b"", not self._obj.needs_input and not self._obj.eof
+            # zstd's decompressobj has no output limit; feed small slices
+            return self._obj.decompress(data[:ZSTD_INPUT_SLICE]), data[ZSTD_INPUT_SLICE:], False
+        except (zlib.error, OSError, EOFError) as e:
+            raise CompressionError(f"Corrupt {self.compression} stream: {e}") from e
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise CompressionError(f"Corrupt zstd stream: {e}") from e
+            raise
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        """Decompress the next raw chunk, yielding plain pieces."""
+        pending = data
+        while True:
+            if pending:
+                self._in_member = True
+            out, pending, more = self._step(pending)
+            if out:
+                yield out
+
+            if self._obj.eof:
+                # Next member/frame of a concatenated stream, if any
+                # (unused_data holds every input byte past the member end)
+                pending = self._obj.unused_data
+                self._obj = self._new_object()
+                self._in_member = False
+                if pending:
+                    continue
+                return
+            if not pending and not more:
+                return
+
+    def finish(self):
+        """Raise when the stream stopped in the middle of a member/frame."""
+        if self._in_member:
+            raise CompressionError(f"Truncated {self.compression} stream")
+
+
+def open_decompressed(filepath: str) -> BinaryIO:
+    """Open a possibly compressed file for reading its plain bytes."""
+    with open(filepath, "rb") as f:
+        compression = detect_compression(f.read(4))
+    if compression == "gzip":
+        return gzip.open(filepath, "rb")
+    if compression == "bz2":
+        return bz2.open(filepath, "rb")
+    if compression == "zstd":
+        _require_zstandard()
+        return zstandard.open(filepath, "rb")
+    return open(filepath, "rb")
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    """
+    One self-contained member/frame. Appending it to a file of the same
+    format yields a valid concatenated stream.
+    """
+    if compression == "gzip":
+        return gzip.compress(data)
+    if compression == "bz2":
+        return bz2.compress(data)
+    if compression == "zstd":
+        _require_zstandard()
+        return zstandard.ZstdCompressor().compress(data)
+    raise CompressionError(f"Unsupported compression: {compression}")
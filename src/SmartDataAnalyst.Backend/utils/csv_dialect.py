@@ -0,0 +1,212 @@
+import codecs
+import csv
+import re
+from dataclasses import dataclass, asdict
+
+import chardet
+
+from utils.compression import detect_compression, open_decompressed
+
+DELIMITERS = [",", ";", "\t", "|"]
+MAX_SAMPLE_LINES = 200
+
+_NUMBER_DOT = re.compile(r"^[+-]?\d+(\.\d+)?([eE][+-]?\d+)?$")
+_NUMBER_COMMA = re.compile(r"^[+-]?\d+,\d+$")
+_INTEGER = re.compile(r"^[+-]?\d+$")
+# Values where "," can only be a decimal separator: not followed by exactly
+# three digits ("12,500" may be twelve thousand five hundred), after a
+# leading zero, or after "." thousands separators ("1.250,5")
+_DECIMAL_COMMA = re.compile(r"^[+-]?(\d+,(\d{1,2}|\d{4,})|0,\d+|\d{1,3}(\.\d{3})+,\d+)$")
+
+
+@dataclass
+class CsvDialect:
+    """
+    Everything needed to parse a CSV in one go. Stored next to the upload
+    so later reads reuse it instead of guessing again.
+    """
+    encoding: str = "utf-8"
+    delimiter: str = ","
+    quotechar: str = '"'
+    decimal: str = "."
+    has_header: bool = True
+    field_count: int = 0
+    # gzip/bz2/zstd when the stored file is compressed (decoded on read)
+    compression: str | None = None
+
+    def read_csv_kwargs(self) -> dict:
+        """Keyword arguments for pd.read_csv."""
+        kwargs = {
+            "encoding": self.encoding,
+            "sep": self.delimiter,
+            "quotechar": self.quotechar,
+            "decimal": self.decimal,
+        }
+        if self.compression:
+            kwargs["compression"] = self.compression
+        if self.has_header:
+            kwargs["header"] = 0
+        else:
+            kwargs["header"] = None
+            kwargs["names"] = [f"column_{i + 1}" for i in range(self.field_count)]
+        return kwargs
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CsvDialect":
+        return cls(**data)
+
+
+def detect_encoding(sample: bytes) -> str:
+    """
+    Cheap checks first (BOM, strict UTF-8 decode); chardet only runs on a
+    small slice when the sample is not UTF-8.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16"
+
+    try:
+        # final=False tolerates a multi-byte character cut at the sample end
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    result = chardet.detect(sample[:16384])
+    return result["encoding"] or "latin-1"
+
+
+def _sample_lines(text: str) -> list[str]:
+    lines = text.splitlines()
+    # The last line of a sample is usually cut short
+    if len(lines) > 1 and not text.endswith(("\n", "\r")):
+        lines = lines[:-1]
+    return [ln for ln in lines[:MAX_SAMPLE_LINES] if ln.strip()]
+
+
+def _detect_quotechar(lines: list[str]) -> str:
+    text = "\n".join(lines)
+    if '"' not in text and re.search(r"(^|[,;\t|])'[^']*'([,;\t|]|$)", text, re.MULTILINE):
+        return "'"
+    return '"'
+
+
+def _parse_rows(lines: list[str], delimiter: str, quotechar: str) -> list[list[str]]:
+    try:
+        return list(csv.reader(lines, delimiter=delimiter, quotechar=quotechar))
+    except csv.Error:
+        return []
+
+
+def _detect_delimiter(lines: list[str], quotechar: str) -> tuple[str, list[list[str]]]:
+    """
+    Pick the delimiter that splits the sample into the most consistent
+    number of fields (ties go to the wider split, then list order).
+    """
+    best = (",", _parse_rows(lines, ",", quotechar))
+    best_score = (-1.0, 0)
+
+    for delimiter in DELIMITERS:
+        rows = _parse_rows(lines, delimiter, quotechar)
+        counts = [len(r) for r in rows]
+        if not counts:
+            continue
+        mode = max(set(counts), key=counts.count)
+        if mode < 2:
+            continue
+        score = (counts.count(mode) / len(counts), mode)
+        if score > best_score:
+            best, best_score = (delimiter, rows), score
+
+    return best
+
+
+def _is_number(value: str, decimal: str) -> bool:
+    value = value.strip()
+    if decimal == ",":
+        return bool(_NUMBER_COMMA.match(value)) or value.isdigit()
+    return bool(_NUMBER_DOT.match(value))
+
+
+def _detect_decimal(rows: list[list[str]], delimiter: str) -> str:
+    if delimiter == ",":
+        return "."
+    values = [v.strip() for r in rows[1:] for v in r]
+    comma = sum(1 for v in values if _DECIMAL_COMMA.match(v))
+    dot = sum(1 for v in values if re.match(r"^[+-]?\d+\.\d+$", v))
+    return "," if comma > dot else "."
+
+
+def _digits(value: str) -> int:
+    return len(value.strip().lstrip("+-"))
+
+
+def _looks_like(value: str, values: list[str], decimal: str) -> bool:
+    """Whether `value` fits a column of numbers: integers of the same width, or any number among decimals."""
+    if not _is_number(value, decimal):
+        return False
+    if not all(_INTEGER.match(v.strip()) for v in values):
+        return True
+    widths = [_digits(v) for v in values]
+    return bool(_INTEGER.match(value.strip())) and min(widths) <= _digits(value) <= max(widths)
+
+
+def _detect_header(rows: list[list[str]], decimal: str) -> bool:
+    """
+    No header only when the first row clearly matches the body: every
+    numeric column also has a number of the same shape in the first row.
+    Defaults to a header otherwise, so a header of years
+    ("2021;2022;2023") over other figures stays a header.
+    """
+    if len(rows) < 2:
+        return True
+
+    first, body = rows[0], rows[1:]
+    numeric_cols = {}
+    for i in range(len(first)):
+        values = [r[i] for r in body if i < len(r) and r[i].strip()]
+        if values and all(_is_number(v, decimal) for v in values):
+            numeric_cols[i] = values
+
+    if not numeric_cols:
+        return True
+    return not all(_looks_like(first[i], values, decimal) for i, values in numeric_cols.items())
+
+
+def sniff_dialect(sample: bytes) -> CsvDialect:
+    """
+    Settle encoding, delimiter, quoting, decimal separator and header
+    presence from a bounded byte sample.
+    """
+    encoding = detect_encoding(sample)
+    text = sample.decode(encoding, errors="ignore")
+    lines = _sample_lines(text)
+
+    quotechar = _detect_quotechar(lines)
+    delimiter, rows = _detect_delimiter(lines, quotechar)
+    decimal = _detect_decimal(rows, delimiter)
+    has_header = _detect_header(rows, decimal)
+    field_count = len(rows[0]) if rows else 0
+
+    return CsvDialect(
+        encoding=encoding,
+        delimiter=delimiter,
+        quotechar=quotechar,
+        decimal=decimal,
+        has_header=has_header,
+        field_count=field_count,
+    )
+
+
+def sniff_file(filepath: str, sample_bytes: int = 65536) -> CsvDialect:
+    """Sniff a stored file, looking inside it when it is compressed."""
+    with open(filepath, "rb") as f:
+        compression = detect_compression(f.read(4))
+    with open_decompressed(filepath) as f:
+        dialect = sniff_dialect(f.read(sample_bytes))
+    dialect.compression = compression
+    return dialect
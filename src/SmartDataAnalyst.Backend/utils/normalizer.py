@@ -1,12 +1,344 @@
+import datetime
+import decimal
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from core.config import NormalizerConfig
+
+# Marks a frame whose columns already went through normalization
+NORMALIZED_ATTR = "normalized"
+
+config = NormalizerConfig()
+_executor: ThreadPoolExecutor | None = None
+
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%m/%d/%Y",
+                "%Y/%m/%d", "%Y.%m.%d", "%d.%m.%Y")
+
+_NAN_STRINGS = ["nan", "+nan", "-nan"]
+_DATE_SHAPE = r"\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}"
+
+
+def _clean_column(series: pd.Series) -> pd.Series:
+    """
+    Replace empty or whitespace-only entries with NaN, then strip
+    whitespace and thousands separators from string values.
+    Uses a mask instead of a regex replace over every cell, and Arrow
+    string kernels when the column holds only strings.
+    """
+    if series.dtype != "object":
+        return series
+
+    try:
+        arr = pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed objects: .str turns non-strings into NaN like before
+        try:
+            stripped = series.str.strip()
+        except AttributeError:
+            # No strings at all (e.g. bytes): nothing to clean
+            return series
+        empty = stripped.eq("")
+        cleaned = stripped.str.replace(",", "", regex=False)
+        return cleaned.mask(empty, np.nan)
+
+    stripped = pc.utf8_trim_whitespace(arr)
+    empty = pc.equal(stripped, "").fill_null(False).to_numpy(zero_copy_only=False)
+    values = pc.replace_substring(stripped, ",", "").to_numpy(zero_copy_only=False)
+
+    # Missing cells keep their original marker (None stays None, as with .str)
+    missing = arr.is_null().to_numpy(zero_copy_only=False)
+    values[missing] = series.to_numpy()[missing]
+    values[empty] = np.nan
+    return pd.Series(values, index=series.index, name=series.name, dtype=object)
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _prepare_column(series: pd.Series) -> pd.Series:
+    """
+    Turn object columns of typed values (Parquet / Arrow uploads) into
+    real dtypes before cleaning: dates -> datetime64, decimals -> float64,
+    lists and structs -> JSON text. Everything else goes through
+    _clean_column.
+    """
+    if series.dtype != "object":
+        return series
+    sample = _sample_non_null(series, 1)
+    value = sample.iloc[0] if not sample.empty else None
+    if isinstance(value, datetime.date):
+        return pd.to_datetime(series, errors="coerce")
+    if isinstance(value, decimal.Decimal):
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+    if isinstance(value, (list, tuple, dict, np.ndarray)):
+        return series.map(lambda v: json.dumps(v, default=_json_default), na_action="ignore")
+    return _clean_column(series)
+
+
+def _to_numeric(series: pd.Series, integers: bool = False) -> pd.Series:
+    """
+    pd.to_numeric(errors="coerce") with an Arrow cast fast path for string
+    columns where every value parses; anything else goes through pandas.
+    `integers` tries an int64 cast before float64.
+    """
+    if series.dtype == "object":
+        try:
+            arr = pa.array(series, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arr = None
+
+        if arr is not None:
+            targets = (pa.int64(), pa.float64()) if integers else (pa.float64(),)
+            for target in targets:
+                try:
+                    values = pc.cast(arr, target).to_numpy(zero_copy_only=False)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    continue
+                return pd.Series(values, index=series.index, name=series.name)
+
+    return pd.to_numeric(series, errors="coerce")
+
+
+def _all_integers(values: pd.Series) -> bool:
+    return bool(values.str.fullmatch(r"-?\d+").all())
+
+
+def _all_floats(values: pd.Series) -> bool:
+    parsed = pd.to_numeric(values, errors="coerce")
+    # float("nan") parses, but to_numeric maps it to NaN
+    return bool((parsed.notna() | values.str.lower().isin(_NAN_STRINGS)).all())
+
+
+def _all_dates(values: pd.Series) -> bool:
+    # Cheap shape check before trying every format
+    if not values.str.fullmatch(_DATE_SHAPE).all():
+        return False
+    matched = pd.Series(False, index=values.index)
+    for fmt in DATE_FORMATS:
+        matched |= pd.to_datetime(values, format=fmt, errors="coerce").notna()
+        if matched.all():
+            return True
+    return bool(matched.all())
+
+
+def _sample_non_null(series: pd.Series, sample_size: int) -> pd.Series:
+    """
+    First `sample_size` non-null values, scanning a growing window from
+    the top instead of calling dropna() on the whole column.
+    """
+    window = sample_size * 4
+    while True:
+        head = series.iloc[:window].dropna()
+        if len(head) >= sample_size or window >= len(series):
+            return head.head(sample_size)
+        window *= 4
+
+
+def _normalize_column(series: pd.Series, sample_size: int) -> tuple[str, pd.Series]:
+    """
+    Infer the type of an already cleaned column from its first N non-null
+    values and convert it. Returns (kind, converted series) where kind is
+    one of: int, float, datetime_s, datetime_ms, datetime, text.
+    """
+    # Typed sources (Parquet, Arrow) already carry real timestamps
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime", series
+
+    # Gather sample values
+    non_null = _sample_non_null(series, sample_size).astype(str)
+
+    # ---- 1. Try pure integers ----
+    if _all_integers(non_null):
+        try:
+            return "int", _to_numeric(series, integers=True).astype("Int64")
+        except (TypeError, ValueError):
+            pass
+
+    # ---- 2. Try floats ----
+    if _all_floats(non_null):
+        try:
+            return "float", _to_numeric(series)
+        except (TypeError, ValueError):
+            pass
+
+    # ---- 3. Detect Unix timestamps (seconds or ms) ----
+    # Heuristic: numeric, large numbers
+    if pd.api.types.is_numeric_dtype(series):
+        max_val = series.max()
+        if pd.notna(max_val):
+            if 10_000_000 < max_val < 2_000_000_000:
+                # Likely seconds
+                try:
+                    return "datetime_s", pd.to_datetime(series, unit="s", errors="coerce")
+                except (TypeError, ValueError, OverflowError):
+                    pass
+
+            if 1_000_000_000_000 < max_val < 10_000_000_000_000:
+                # Likely milliseconds
+                try:
+                    return "datetime_ms", pd.to_datetime(series, unit="ms", errors="coerce")
+                except (TypeError, ValueError, OverflowError):
+                    pass
+
+    # ---- 4. Detect date strings ----
+    if _all_dates(non_null):
+        try:
+            return "datetime", pd.to_datetime(series, errors="coerce")
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    # ---- 5. Text fallback ----
+    # Keep as string (object)
+    return "text", series.astype(str)
+
+
+def _convert_column(series: pd.Series, kind: str) -> pd.Series:
+    """Convert an already cleaned column to a known kind (no inference)."""
+    if kind == "int":
+        try:
+            return _to_numeric(series, integers=True).astype("Int64")
+        except (TypeError, ValueError):
+            # Values past the inference sample were not whole numbers
+            return _to_numeric(series)
+    if kind == "float":
+        return _to_numeric(series)
+    if kind == "datetime_s":
+        return pd.to_datetime(series, unit="s", errors="coerce")
+    if kind == "datetime_ms":
+        return pd.to_datetime(series, unit="ms", errors="coerce")
+    if kind == "datetime":
+        return pd.to_datetime(series, errors="coerce")
+    return series.astype(str)
+
+
+def schema_violations(df: pd.DataFrame, schema: dict, max_examples: int = 5) -> dict:
+    """
+    Values of `df` that do not fit the stored column kinds, as
+    {column: [example values]}. Text columns accept anything.
+    """
+    violations = {}
+    for col, kind in schema.items():
+        if kind == "text" or col not in df.columns:
+            continue
+        cleaned = _prepare_column(df[col])
+        converted = _convert_column(cleaned, kind)
+        bad = converted.isna() & cleaned.notna()
+        if kind == "int" and not pd.api.types.is_integer_dtype(converted):
+            bad |= converted.notna() & (converted % 1 != 0)
+        if bad.any():
+            violations[col] = df[col][bad].head(max_examples).astype(str).tolist()
+    return violations
+
+
+def _worker_count() -> int:
+    if config.max_workers:
+        return config.max_workers
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_worker_count(), thread_name_prefix="normalize")
+    return _executor
+
+
+def _map_columns(df: pd.DataFrame, fn, parallel: bool | None) -> list:
+    """
+    Run fn(position, series) for every column, returning results in column
+    order. Wide frames are split into contiguous column groups, one task
+    per group, on a shared thread pool: Arrow kernels and numpy release the
+    GIL, and threads see the frame without pickling it.
+    """
+    n = len(df.columns)
+    workers = _worker_count()
+    if parallel is None:
+        parallel = n >= config.parallel_min_columns and workers > 1
+
+    def run_group(positions):
+        return [fn(i, df.iloc[:, i]) for i in positions]
+
+    if not parallel:
+        return run_group(range(n))
+
+    group_size = -(-n // workers)
+    groups = [range(start, min(start + group_size, n)) for start in range(0, n, group_size)]
+    results = []
+    for group_result in _get_executor().map(run_group, groups):
+        results.extend(group_result)
+    return results
 
-def normalize_dataframe(df: pd.DataFrame, sample_size: int = 10) -> pd.DataFrame:
+
+def _assemble(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """
+    Build the output frame from converted columns without copying them
+    again (no df.copy() up front, no block consolidation).
+    """
+    out = pd.DataFrame(dict(enumerate(columns)), index=df.index, copy=False)
+    out.columns = df.columns
+    out.attrs.update(df.attrs)
+    out.attrs[NORMALIZED_ATTR] = True
+    return out
+
+
+def normalize_with_schema(df: pd.DataFrame, sample_size: int = 10, parallel: bool | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Normalize `df` and also return the inferred schema ({column: kind})
+    so it can be stored and re-applied later with apply_schema.
+    `parallel` forces the thread pool on or off; by default it is used
+    for frames with at least NORMALIZE_PARALLEL_MIN_COLUMNS columns.
+    """
+    results = _map_columns(
+        df,
+        lambda i, series: _normalize_column(_prepare_column(series), sample_size),
+        parallel,
+    )
+    schema = {col: kind for col, (kind, _) in zip(df.columns, results)}
+    return _assemble(df, [converted for _, converted in results]), schema
+
+
+def apply_schema(df: pd.DataFrame, schema: dict, sample_size: int = 10, parallel: bool | None = None) -> pd.DataFrame:
+    """
+    Clean and convert `df` using a stored schema, skipping type inference.
+    Columns missing from the schema are inferred as usual.
+    """
+    def convert(i, series):
+        series = _prepare_column(series)
+        col = df.columns[i]
+        if col in schema:
+            return _convert_column(series, schema[col])
+        _, converted = _normalize_column(series, sample_size)
+        return converted
+
+    return _assemble(df, _map_columns(df, convert, parallel))
+
+
+def is_normalized(df: pd.DataFrame) -> bool:
+    return bool(df.attrs.get(NORMALIZED_ATTR))
+
+
+def normalize_dataframe(df: pd.DataFrame, sample_size: int = 10, parallel: bool | None = None) -> pd.DataFrame:
     """
     Universal intelligent DataFrame normalizer.
     Performs type inference using the first N non-null values of each column.
-    
+    Inference and cleaning use vectorized str accessors and
+    pd.to_numeric / pd.to_datetime rather than per-value Python calls.
+
     Rules:
     - Detects integers, floats, decimals inside string columns.
     - Detects Unix timestamps (seconds or milliseconds).
@@ -14,87 +346,5 @@ def normalize_dataframe(df: pd.DataFrame, sample_size: int = 10) -> pd.DataFrame
     - Cleans whitespace.
     - Replaces empty strings with NaN.
     """
-
-    df = df.copy()
-
-    # Replace empty or whitespace-only entries with NaN
-    df = df.replace(r"^\s*$", np.nan, regex=True)
-
-    for col in df.columns:
-        series = df[col]
-
-        # Clean string values
-        if series.dtype == "object":
-            series = series.str.strip().str.replace(",", "", regex=False)
-            df[col] = series
-
-        # Gather sample values
-        non_null = series.dropna().head(sample_size).astype(str)
-
-        # ---- 1. Try pure integers ----
-        if non_null.apply(lambda x: x.isdigit() or (x.startswith("-") and x[1:].isdigit())).all():
-            try:
-                df[col] = pd.to_numeric(series, errors="coerce").astype("Int64")
-                continue
-            except:
-                pass
-
-        # ---- 2. Try floats ----
-        def is_float(x: str) -> bool:
-            try:
-                float(x)
-                return True
-            except:
-                return False
-
-        if non_null.apply(is_float).all():
-            try:
-                df[col] = pd.to_numeric(series, errors="coerce")
-                continue
-            except:
-                pass
-
-        # ---- 3. Detect Unix timestamps (seconds or ms) ----
-        # Heuristic: numeric, large numbers
-        if pd.api.types.is_numeric_dtype(series):
-            max_val = series.max()
-            if pd.notna(max_val):
-                if 10_000_000 < max_val < 2_000_000_000:
-                    # Likely seconds
-                    try:
-                        df[col] = pd.to_datetime(series, unit="s", errors="coerce")
-                        continue
-                    except:
-                        pass
-
-                if 1_000_000_000_000 < max_val < 10_000_000_000_000:
-                    # Likely milliseconds
-                    try:
-                        df[col] = pd.to_datetime(series, unit="ms", errors="coerce")
-                        continue
-                    except:
-                        pass
-
-        # ---- 4. Detect date strings ----
-        def is_date(x: str) -> bool:
-            for fmt in ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%m/%d/%Y",
-                        "%Y/%m/%d", "%Y.%m.%d", "%d.%m.%Y"):
-                try:
-                    datetime.strptime(x, fmt)
-                    return True
-                except:
-                    pass
-            return False
-
-        if non_null.apply(is_date).all():
-            try:
-                df[col] = pd.to_datetime(series, errors="coerce")
-                continue
-            except:
-                pass
-
-        # ---- 5. Text fallback ----
-        # Keep as string (object)
-        df[col] = series.astype(str)
-
+    df, _ = normalize_with_schema(df, sample_size, parallel)
     return df
@@ -0,0 +1,256 @@
+import ast
+import operator
+import re
+from typing import Callable
+
+import pandas as pd
+
+# pandas query() lets column names with spaces be written as `Name`
+_BACKTICK = re.compile(r"`([^`]*)`")
+
+_FLIPPED = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "==": "==", "!=": "!="}
+_OPS = {
+    ast.Eq: "==", ast.NotEq: "!=", ast.Lt: "<", ast.LtE: "<=",
+    ast.Gt: ">", ast.GtE: ">=", ast.In: "in", ast.NotIn: "not in",
+}
+_COMPARE = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+def _to_json_scalar(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if hasattr(value, "item") else value
+
+
+def _series_stats_kind(series: pd.Series) -> str | None:
+    if pd.api.types.is_bool_dtype(series):
+        return None
+    if pd.api.types.is_numeric_dtype(series):
+        return "number"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime"
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series) \
+            or isinstance(series.dtype, pd.CategoricalDtype):
+        return "text"
+    return None
+
+
+def column_stats(df: pd.DataFrame) -> dict:
+    """
+    {column: {"kind", "min", "max", "nulls", "rows"}} for a (normalized)
+    frame. min/max are JSON-friendly (timestamps as ISO strings) and None
+    when the column has no comparable values.
+    """
+    stats = {}
+    rows = len(df)
+    for i, col in enumerate(df.columns):
+        series = df.iloc[:, i]
+        kind = _series_stats_kind(series)
+        entry = {"kind": kind, "min": None, "max": None, "nulls": int(series.isna().sum()), "rows": rows}
+        if kind is not None and entry["nulls"] < rows:
+            try:
+                values = series.dropna()
+                if kind == "text":
+                    values = values.astype(str)
+                entry["min"] = _to_json_scalar(values.min())
+                entry["max"] = _to_json_scalar(values.max())
+            except TypeError:
+                entry["kind"] = None
+        stats[str(col)] = entry
+    return stats
+
+
+def merge_stats(a: dict, b: dict) -> dict:
+    """Combine column_stats of two row ranges of the same columns."""
+    merged = {}
+    for col in a.keys() | b.keys():
+        if col not in a or col not in b:
+            merged[col] = dict(a.get(col) or b[col], kind=None)
+            continue
+        x, y = a[col], b[col]
+        # An all-null side says nothing about the column's type
+        if x["nulls"] == x["rows"]:
+            kind = y["kind"]
+        elif y["nulls"] == y["rows"]:
+            kind = x["kind"]
+        else:
+            kind = x["kind"] if x["kind"] == y["kind"] else None
+        entry = {
+            "kind": kind,
+            "nulls": x["nulls"] + y["nulls"],
+            "rows": x["rows"] + y["rows"],
+            "min": None,
+            "max": None,
+        }
+        if entry["kind"] is not None:
+            mins = [v for v in (x["min"], y["min"]) if v is not None]
+            maxs = [v for v in (x["max"], y["max"]) if v is not None]
+            entry["min"] = min(mins) if mins else None
+            entry["max"] = max(maxs) if maxs else None
+        merged[col] = entry
+    return merged
+
+
+def _literal(node):
+    """Python value of a literal node, or raise ValueError."""
+    value = ast.literal_eval(node)
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return value
+
+
+def _coerce(value, kind: str):
+    """Bring a filter literal into the domain of the stored min/max."""
+    if kind == "number" and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if kind == "text" and isinstance(value, str):
+        return value
+    if kind == "datetime" and isinstance(value, str):
+        return pd.Timestamp(value)
+    raise TypeError
+
+
+def _bounds(entry: dict):
+    lo, hi = entry["min"], entry["max"]
+    if entry["kind"] == "datetime" and lo is not None:
+        lo, hi = pd.Timestamp(lo), pd.Timestamp(hi)
+    return lo, hi
+
+
+def _compare_may_match(entry: dict | None, op: str, value) -> bool:
+    """Whether any row with these stats can satisfy `column <op> value`."""
+    if entry is None:
+        return True
+    if entry["nulls"] == entry["rows"]:
+        # Only nulls: NaN != x is the one comparison that holds
+        return op in ("!=", "not in")
+    if entry["kind"] is None or op == "not in":
+        return True
+
+    try:
+        values = [_coerce(v, entry["kind"]) for v in value] if op == "in" else _coerce(value, entry["kind"])
+    except (TypeError, ValueError):
+        return True
+
+    lo, hi = _bounds(entry)
+    if lo is None:
+        return True
+
+    try:
+        if op == "==":
+            return lo <= values <= hi
+        if op == "in":
+            return any(lo <= v <= hi for v in values)
+        if op == "!=":
+            return not (lo == hi == values and entry["nulls"] == 0)
+        if op in ("<", "<="):
+            return _COMPARE[op](lo, values)
+        return _COMPARE[op](hi, values)
+    except TypeError:
+        return True
+
+
+def _parse_filter(expr: str) -> tuple[ast.Expression | None, dict]:
+    """
+    (parsed expression or None on a syntax error, {placeholder: column})
+    with `backticked names` replaced by placeholder identifiers.
+    """
+    names = {}
+
+    def to_name(match):
+        key = f"__col{len(names)}__"
+        names[key] = match.group(1)
+        return key
+
+    try:
+        return ast.parse(_BACKTICK.sub(to_name, expr).strip(), mode="eval"), names
+    except SyntaxError:
+        return None, names
+
+
+def filter_columns(expr: str) -> set[str] | None:
+    """
+    Names a pandas query() expression refers to (columns, but also any
+    other identifier such as True), or None when it cannot be parsed.
+    """
+    tree, names = _parse_filter(expr)
+    if tree is None:
+        return None
+    return {names.get(node.id, node.id) for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+
+def filter_tree(expr: str):
+    """
+    Simplified form of a pandas query() expression for pruning and index
+    lookups: ("and", [parts]), ("or", [parts]), ("compare", column, op,
+    value) for a column compared with a literal, or None for anything
+    else (unparsable, functions, column against column, ...).
+    """
+    tree, names = _parse_filter(expr)
+    if tree is None:
+        return None
+
+    def column(node) -> str | None:
+        if isinstance(node, ast.Name):
+            return names.get(node.id, node.id)
+        return None
+
+    def build(node):
+        if isinstance(node, ast.BoolOp):
+            return ("and" if isinstance(node.op, ast.And) else "or", [build(v) for v in node.values])
+
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+            return ("and" if isinstance(node.op, ast.BitAnd) else "or", [build(node.left), build(node.right)])
+
+        if isinstance(node, ast.Compare):
+            parts = []
+            left = node.left
+            for op_node, right in zip(node.ops, node.comparators):
+                parts.append(_build_compare(column, left, _OPS.get(type(op_node)), right))
+                left = right
+            return parts[0] if len(parts) == 1 else ("and", parts)
+
+        return None
+
+    return build(tree.body)
+
+
+def _build_compare(column, left, op, right):
+    """("compare", ...) for one `a <op> b` where one side is a column and the other a literal."""
+    if op is None:
+        return None
+
+    col, literal_node = column(left), right
+    if col is None and op in _FLIPPED:
+        col, literal_node, op = column(right), left, _FLIPPED[op]
+    if col is None:
+        return None
+
+    try:
+        value = _literal(literal_node)
+    except (ValueError, SyntaxError, TypeError):
+        return None
+    if op in ("in", "not in") and not isinstance(value, list):
+        return None
+
+    return ("compare", col, op, value)
+
+
+def compile_filter(expr: str) -> Callable[[dict], bool]:
+    """
+    Turn a pandas query() expression into a check on column_stats output:
+    False only when no row described by the stats can match. Comparisons
+    of a column with literals, combined with and/or (&, |), are used;
+    anything else counts as "may match", so pruning is always safe.
+    """
+    def build(node) -> Callable[[dict], bool]:
+        if node is None:
+            return lambda stats: True
+        if node[0] == "compare":
+            _, col, op, value = node
+            return lambda stats: _compare_may_match(stats.get(col), op, value)
+        parts = [build(part) for part in node[1]]
+        combine = all if node[0] == "and" else any
+        return lambda stats: combine(p(stats) for p in parts)
+
+    return build(filter_tree(expr))
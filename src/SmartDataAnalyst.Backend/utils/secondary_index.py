@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+from utils.pruning import filter_tree
+
+EQUALITY_OPS = ("==", "in")
+RANGE_OPS = ("<", "<=", ">", ">=")
+# Rough per-key overhead of a hash index's dict entry
+_KEY_BYTES = 100
+_NO_ROWS = np.array([], dtype=np.int64)
+
+
+def _index_kind(series: pd.Series) -> str | None:
+    if pd.api.types.is_bool_dtype(series):
+        return None
+    if pd.api.types.is_numeric_dtype(series):
+        return "number"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime"
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series) \
+            or isinstance(series.dtype, pd.CategoricalDtype):
+        return "text"
+    return None
+
+
+def _coerce(value, kind: str):
+    """Filter literal in the column's domain, or raise TypeError."""
+    if kind == "number" and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if kind == "text" and isinstance(value, str):
+        return value
+    if kind == "datetime" and isinstance(value, str):
+        try:
+            return pd.Timestamp(value)
+        except ValueError:
+            raise TypeError
+    raise TypeError
+
+
+class HashIndex:
+    """Value -> row positions, for == and in filters. Nulls are not indexed."""
+
+    def __init__(self, series: pd.Series):
+        self.kind = _index_kind(series)
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        self._order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        starts = np.concatenate([[0], np.cumsum(counts)]) + int((codes < 0).sum())
+        self._slices = {value: (starts[i], starts[i + 1]) for i, value in enumerate(uniques)}
+        self.nbytes = self._order.nbytes + _KEY_BYTES * len(self._slices)
+
+    def positions(self, op: str, value) -> np.ndarray | None:
+        if op not in EQUALITY_OPS:
+            return None
+        try:
+            values = [_coerce(v, self.kind) for v in value] if op == "in" else [_coerce(value, self.kind)]
+        except TypeError:
+            return None
+        parts = [self._order[slice(*self._slices[v])] for v in values if v in self._slices]
+        return np.concatenate(parts) if parts else _NO_ROWS
+
+
+class SortedIndex:
+    """Sorted values with their row positions, for range (and ==) filters on numbers and dates."""
+
+    def __init__(self, series: pd.Series):
+        self.kind = _index_kind(series)
+        values = series.to_numpy()
+        present = np.flatnonzero(~series.isna().to_numpy())
+        order = np.argsort(values[present], kind="stable")
+        self._values = values[present][order]
+        self._positions = present[order]
+        self.nbytes = self._values.nbytes + self._positions.nbytes
+
+    def positions(self, op: str, value) -> np.ndarray | None:
+        if op not in RANGE_OPS + ("==",):
+            return None
+        try:
+            value = _coerce(value, self.kind)
+        except TypeError:
+            return None
+        if self.kind == "datetime":
+            value = np.datetime64(value)
+
+        left = np.searchsorted(self._values, value, side="left")
+        right = np.searchsorted(self._values, value, side="right")
+        if op == "==":
+            return self._positions[left:right]
+        if op == "<":
+            return self._positions[:left]
+        if op == "<=":
+            return self._positions[:right]
+        if op == ">":
+            return self._positions[right:]
+        return self._positions[left:]
+
+
+def build_index(series: pd.Series, kind: str):
+    """A "hash" or "sorted" index of a column, or None when the column does not suit it."""
+    column_kind = _index_kind(series)
+    if column_kind is None or (kind == "sorted" and column_kind == "text"):
+        return None
+    return HashIndex(series) if kind == "hash" else SortedIndex(series)
+
+
+def filter_usage(expr: str) -> list[tuple[str, str]]:
+    """(column, "hash" | "sorted") for each comparison in a filter that an index could answer."""
+    uses = []
+
+    def walk(node):
+        if node is None:
+            return
+        if node[0] == "compare":
+            _, col, op, _ = node
+            if op in EQUALITY_OPS:
+                uses.append((col, "hash"))
+            elif op in RANGE_OPS:
+                uses.append((col, "sorted"))
+            return
+        for part in node[1]:
+            walk(part)
+
+    walk(filter_tree(expr))
+    return uses
+
+
+def lookup(expr: str, indexes: dict) -> np.ndarray | None:
+    """
+    Sorted row positions that may match a pandas query() expression, from
+    {column: [index, ...]}, or None when the indexes cannot narrow it down.
+    Comparisons without a usable index are left out of an "and" (the
+    result is then a superset), so callers still apply the filter to the
+    rows returned.
+    """
+    def find(node) -> np.ndarray | None:
+        if node is None:
+            return None
+        if node[0] == "compare":
+            _, col, op, value = node
+            for index in indexes.get(col, ()):
+                found = index.positions(op, value)
+                if found is not None:
+                    return found
+            return None
+
+        found = [find(part) for part in node[1]]
+        if node[0] == "and":
+            known = [f for f in found if f is not None]
+            if not known:
+                return None
+            result = np.unique(known[0])
+            for other in known[1:]:
+                result = np.intersect1d(result, other, assume_unique=False)
+            return result
+        if any(f is None for f in found):
+            return None
+        return np.unique(np.concatenate(found)) if found else _NO_ROWS
+
+    result = find(filter_tree(expr))
+    return None if result is None else np.sort(result)